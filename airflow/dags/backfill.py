@@ -0,0 +1,244 @@
+"""Partitioned historical backfill: Postgres -> ClickHouse bronze
+
+The (updated_at, pk) key space of a source table, up to a snapshot taken
+at planning time, is cut into N partitions of roughly equal row count
+(one ordered index scan). Each partition is extracted with the same
+keyset query as the incremental DAGs, bounded above, and loaded batch by
+batch; its cursor is checkpointed in etl_backfill_partition after every
+batch, so a retried partition resumes where it stopped. Partitions are
+independent and run in parallel as mapped tasks (dag_backfill.py).
+
+When all partitions are done the source's etl_watermark is moved to the
+snapshot end if it is behind, so the incremental DAG carries on from
+there. Rows changed while the backfill runs may be loaded twice; bronze
+is append-only and silver keeps the latest version.
+"""
+from datetime import datetime
+import logging
+import math
+import time
+
+from psycopg2.extras import RealDictCursor
+
+from watermarks import EPOCH_UTC, KeysetCursor, advance_cursor, get_cursor, keyset_query
+
+LOGGER = logging.getLogger(__name__)
+
+# source -> (Postgres table, primary key, bronze table), as in the ETL DAGs
+SOURCES = {
+    "loans": ("loans", "loan_id", "loans_raw"),
+    "calls": ("calls", "call_id", "calls_raw"),
+    "payments": ("payments", "payment_id", "payments_raw"),
+    "messages": ("messages", "message_id", "messages_raw"),
+    "crm": ("crm", "crm_id", "crm_raw"),
+}
+
+PARTITION_DDL = """
+CREATE TABLE IF NOT EXISTS etl_backfill_partition (
+    backfill_id TEXT NOT NULL,
+    source TEXT NOT NULL,
+    partition_no INTEGER NOT NULL,
+    lower_updated_at TEXT NOT NULL,
+    lower_pk TEXT,
+    upper_updated_at TEXT NOT NULL,
+    upper_pk TEXT NOT NULL,
+    cursor_updated_at TEXT NOT NULL,
+    cursor_pk TEXT,
+    rows_loaded BIGINT NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending',
+    started_at TIMESTAMPTZ,
+    finished_at TIMESTAMPTZ,
+    rows_per_sec DOUBLE PRECISION,
+    PRIMARY KEY (backfill_id, source, partition_no)
+)
+"""
+
+
+def _text(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _bronze_value(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return "" if value is None else value
+
+
+def plan_partitions(connection, backfill_id, source, partitions):
+    """Split the source's key space into `partitions` ranges; idempotent per backfill_id."""
+    table, pk, _ = SOURCES[source]
+    with connection.cursor() as cursor:
+        cursor.execute(PARTITION_DDL)
+        cursor.execute(
+            "SELECT count(*) FROM etl_backfill_partition WHERE backfill_id = %s AND source = %s",
+            (backfill_id, source),
+        )
+        if cursor.fetchone()[0] == 0:
+            cursor.execute(f"SELECT count(*) FROM {table} WHERE updated_at IS NOT NULL")
+            total = cursor.fetchone()[0]
+            if total:
+                step = max(1, math.ceil(total / max(1, partitions)))
+                cursor.execute(
+                    f"""
+                    SELECT updated_at, pk FROM (
+                        SELECT updated_at, {pk} AS pk,
+                               row_number() OVER (ORDER BY updated_at, {pk}) AS rn
+                        FROM {table}
+                        WHERE updated_at IS NOT NULL
+                    ) ordered
+                    WHERE rn %% %s = 0 OR rn = %s
+                    ORDER BY rn
+                    """,
+                    (step, total),
+                )
+                lower = KeysetCursor(updated_at=EPOCH_UTC.isoformat())
+                for partition_no, (updated_at, key) in enumerate(cursor.fetchall()):
+                    upper = KeysetCursor(updated_at=_text(updated_at), pk=_text(key))
+                    cursor.execute(
+                        """
+                        INSERT INTO etl_backfill_partition (
+                            backfill_id, source, partition_no,
+                            lower_updated_at, lower_pk, upper_updated_at, upper_pk,
+                            cursor_updated_at, cursor_pk
+                        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                        ON CONFLICT DO NOTHING
+                        """,
+                        (backfill_id, source, partition_no, lower.updated_at, lower.pk,
+                         upper.updated_at, upper.pk, lower.updated_at, lower.pk),
+                    )
+                    lower = upper
+        cursor.execute(
+            """
+            SELECT partition_no FROM etl_backfill_partition
+            WHERE backfill_id = %s AND source = %s ORDER BY partition_no
+            """,
+            (backfill_id, source),
+        )
+        planned = [row[0] for row in cursor.fetchall()]
+    connection.commit()
+    LOGGER.info("Backfill %s for %s: %d partitions", backfill_id, source, len(planned))
+    return planned
+
+
+def run_partition(connection, clickhouse, backfill_id, source, partition_no, batch_size):
+    """Load one partition from its checkpoint to its upper bound; returns throughput stats."""
+    table, pk, bronze_table = SOURCES[source]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT cursor_updated_at, cursor_pk, upper_updated_at, upper_pk, rows_loaded, status
+            FROM etl_backfill_partition
+            WHERE backfill_id = %s AND source = %s AND partition_no = %s
+            """,
+            (backfill_id, source, partition_no),
+        )
+        cursor_ts, cursor_pk, upper_ts, upper_pk, rows_loaded, status = cursor.fetchone()
+        if status != "done":
+            cursor.execute(
+                """
+                UPDATE etl_backfill_partition SET status = 'running', started_at = COALESCE(started_at, NOW())
+                WHERE backfill_id = %s AND source = %s AND partition_no = %s
+                """,
+                (backfill_id, source, partition_no),
+            )
+    connection.commit()
+    if status == "done":
+        LOGGER.info("Partition %s of %s already done (%s rows)", partition_no, backfill_id, rows_loaded)
+        return {"partition_no": partition_no, "rows": 0, "seconds": 0.0, "rows_per_sec": None}
+
+    position = KeysetCursor(updated_at=cursor_ts, pk=cursor_pk)
+    upper = KeysetCursor(updated_at=upper_ts, pk=upper_pk)
+    loaded = 0
+    start = time.perf_counter()
+
+    while True:
+        query, params = keyset_query(table, pk, position, batch_size, upper=upper)
+        with connection.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+        connection.commit()
+        if not rows:
+            break
+
+        etl_ts = datetime.utcnow().isoformat()
+        columns = list(rows[0].keys())
+        clickhouse.execute(
+            f"INSERT INTO {bronze_table} ({', '.join(columns + ['_etl_loaded_at'])}) VALUES",
+            [tuple(_bronze_value(r.get(c)) for c in columns) + (etl_ts,) for r in rows],
+        )
+
+        position = KeysetCursor(updated_at=_text(rows[-1]["updated_at"]), pk=_text(rows[-1][pk]))
+        loaded += len(rows)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                UPDATE etl_backfill_partition
+                SET cursor_updated_at = %s, cursor_pk = %s, rows_loaded = rows_loaded + %s
+                WHERE backfill_id = %s AND source = %s AND partition_no = %s
+                """,
+                (position.updated_at, position.pk, len(rows), backfill_id, source, partition_no),
+            )
+        connection.commit()
+        elapsed = time.perf_counter() - start
+        LOGGER.info(
+            "Partition %s: %d rows so far, %.0f rows/sec (cursor %s)",
+            partition_no, loaded, loaded / elapsed if elapsed else 0.0, position,
+        )
+        if len(rows) < batch_size:
+            break
+
+    seconds = time.perf_counter() - start
+    rows_per_sec = loaded / seconds if seconds else None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            UPDATE etl_backfill_partition SET status = 'done', finished_at = NOW(), rows_per_sec = %s
+            WHERE backfill_id = %s AND source = %s AND partition_no = %s
+            """,
+            (rows_per_sec, backfill_id, source, partition_no),
+        )
+    connection.commit()
+    LOGGER.info(
+        "Partition %s of %s done: %d rows in %.1fs (%.0f rows/sec)",
+        partition_no, backfill_id, loaded, seconds, rows_per_sec or 0.0,
+    )
+    return {"partition_no": partition_no, "rows": loaded, "seconds": round(seconds, 3), "rows_per_sec": rows_per_sec}
+
+
+def finalize_backfill(connection, backfill_id, source, stats):
+    """Log throughput and move the incremental watermark up to the snapshot end if it is behind."""
+    stats = [s for s in stats or [] if s]
+    total_rows = sum(s["rows"] for s in stats)
+    busiest = max((s["seconds"] for s in stats), default=0.0)
+    for s in sorted(stats, key=lambda s: s["partition_no"]):
+        LOGGER.info("  partition %(partition_no)s: %(rows)s rows in %(seconds)ss (%(rows_per_sec)s rows/sec)", s)
+    LOGGER.info(
+        "Backfill %s for %s: %d rows, %.0f rows/sec overall",
+        backfill_id, source, total_rows, total_rows / busiest if busiest else 0.0,
+    )
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT upper_updated_at, upper_pk FROM etl_backfill_partition
+            WHERE backfill_id = %s AND source = %s
+            ORDER BY partition_no DESC LIMIT 1
+            """,
+            (backfill_id, source),
+        )
+        row = cursor.fetchone()
+    connection.commit()
+    if row is None:
+        return {"rows": total_rows, "watermark": None}
+
+    end = KeysetCursor(updated_at=row[0], pk=row[1])
+    current = get_cursor(connection, source)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT %s::timestamptz < %s::timestamptz", (current.updated_at, end.updated_at))
+        behind = cursor.fetchone()[0]
+    connection.commit()
+    if behind:
+        advance_cursor(connection, source, previous=current, new=end, rows_loaded=total_rows)
+    return {"rows": total_rows, "watermark": (end if behind else current).to_dict()}
@@ -0,0 +1,459 @@
+"""Change data capture: Postgres logical replication -> ClickHouse bronze
+
+An alternative to the 15-minute polling extract for the sources listed in
+PIPELINE_CDC_SOURCES. A long-running consumer reads a logical replication
+slot through psycopg2's replication protocol support, buffers row changes
+per bronze table and flushes them in micro-batches (every
+PIPELINE_CDC_BATCH_ROWS rows or PIPELINE_CDC_FLUSH_INTERVAL_SEC seconds,
+always at a transaction boundary).
+
+After each flush the commit LSN is saved to etl_cdc_checkpoint and
+confirmed to the slot, so Postgres can recycle WAL up to it. A crash
+between the ClickHouse insert and the confirmation replays that batch:
+delivery is at-least-once, like a retried polling run.
+
+Output plugins: pgoutput (built into Postgres 10+, needs a publication,
+created on first start) or wal2json (format v2, needs the extension).
+Inserts and updates are appended to bronze as new row versions, the same
+as the polling extract; deletes and truncates are counted and logged only.
+
+Postgres needs wal_level=logical. On start the consumer switches every CDC
+source table to REPLICA IDENTITY FULL (needs table ownership): under the
+default identity an UPDATE carries no old row, so unchanged TOASTed
+columns (e.g. calls.transcript) could not be filled in and would reach
+bronze blank. A change that still lacks them fails the consumer rather
+than loading a blanked row version.
+
+Run it (inside the Airflow image, which has the connections configured):
+
+    python /opt/airflow/dags/cdc.py            # consume until stopped
+    python /opt/airflow/dags/cdc.py --dry-run  # decode and log, write nothing
+
+--dsn points it at any Postgres, e.g. a local one while testing.
+"""
+import argparse
+from dataclasses import dataclass, field
+from datetime import datetime
+import json
+import logging
+import select
+import signal
+import struct
+import time
+from typing import Dict, List, Optional, Tuple
+
+import psycopg2
+import psycopg2.errors
+from psycopg2.extras import REPLICATION_LOGICAL, LogicalReplicationConnection
+
+from pipeline_config import settings
+
+LOGGER = logging.getLogger(__name__)
+
+# Postgres source table -> ClickHouse bronze table, as in the ETL DAGs
+BRONZE_TABLES = {
+    "loans": "loans_raw",
+    "calls": "calls_raw",
+    "payments": "payments_raw",
+    "messages": "messages_raw",
+    "crm": "crm_raw",
+}
+
+CHECKPOINT_DDL = """
+CREATE TABLE IF NOT EXISTS etl_cdc_checkpoint (
+    slot TEXT PRIMARY KEY,
+    lsn TEXT NOT NULL,
+    rows_loaded BIGINT NOT NULL DEFAULT 0,
+    batches BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+)
+"""
+
+# Rows loaded per source, so each bronze DAG can tell whether its own
+# source changed since it last emitted its asset (assets.publish_bronze).
+SOURCE_ROWS_DDL = """
+CREATE TABLE IF NOT EXISTS etl_cdc_source_rows (
+    slot TEXT NOT NULL,
+    source TEXT NOT NULL,
+    rows_loaded BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (slot, source)
+)
+"""
+
+
+def lsn_to_int(lsn: str) -> int:
+    high, low = lsn.split("/")
+    return (int(high, 16) << 32) + int(low, 16)
+
+
+def int_to_lsn(value: int) -> str:
+    return f"{value >> 32:X}/{value & 0xFFFFFFFF:X}"
+
+
+@dataclass
+class Change:
+    op: str  # insert | update | delete | truncate
+    table: str
+    row: Dict[str, Optional[str]] = field(default_factory=dict)
+
+
+@dataclass
+class Commit:
+    lsn: int
+
+
+# ===========================================================
+# DECODERS
+# ===========================================================
+
+class PgOutputDecoder:
+    """Decoder for the binary pgoutput protocol (version 1)."""
+
+    def __init__(self):
+        # relation id -> (table name, column names)
+        self.relations: Dict[int, Tuple[str, List[str]]] = {}
+
+    @staticmethod
+    def _string(buf: bytes, pos: int) -> Tuple[str, int]:
+        end = buf.index(b"\0", pos)
+        return buf[pos:end].decode(), end + 1
+
+    @staticmethod
+    def _tuple(buf: bytes, pos: int) -> Tuple[List[Tuple[str, Optional[str]]], int]:
+        (count,) = struct.unpack_from("!h", buf, pos)
+        pos += 2
+        values = []
+        for _ in range(count):
+            kind = chr(buf[pos])
+            pos += 1
+            if kind == "t":
+                (length,) = struct.unpack_from("!i", buf, pos)
+                pos += 4
+                values.append((kind, buf[pos:pos + length].decode()))
+                pos += length
+            else:  # n = null, u = unchanged TOAST value
+                values.append((kind, None))
+        return values, pos
+
+    def _row(self, relid: int, values, old=None) -> Dict[str, Optional[str]]:
+        _, columns = self.relations[relid]
+        row = {}
+        for i, (name, (kind, value)) in enumerate(zip(columns, values)):
+            if kind == "u":
+                if old is None:
+                    raise ValueError(
+                        f"Unchanged TOAST column {name} of {self.relations[relid][0]} without an old row; "
+                        "the table needs REPLICA IDENTITY FULL"
+                    )
+                value = old[i][1]
+            row[name] = value
+        return row
+
+    def decode(self, payload: bytes, lsn: int):
+        kind = chr(payload[0])
+        pos = 1
+
+        if kind == "R":
+            (relid,) = struct.unpack_from("!I", payload, pos)
+            pos += 4
+            _, pos = self._string(payload, pos)  # namespace
+            name, pos = self._string(payload, pos)
+            pos += 1  # replica identity setting
+            (ncols,) = struct.unpack_from("!h", payload, pos)
+            pos += 2
+            columns = []
+            for _ in range(ncols):
+                pos += 1  # flags
+                column, pos = self._string(payload, pos)
+                pos += 8  # type oid, type modifier
+                columns.append(column)
+            self.relations[relid] = (name, columns)
+            return []
+
+        if kind == "C":
+            return [Commit(lsn=lsn)]
+
+        if kind in "IUD":
+            (relid,) = struct.unpack_from("!I", payload, pos)
+            pos += 4
+            table = self.relations[relid][0]
+            old = None
+            if kind in "UD" and chr(payload[pos]) in "KO":
+                old, pos = self._tuple(payload, pos + 1)
+            if kind == "D":
+                return [Change(op="delete", table=table, row=self._row(relid, old or []))]
+            new, pos = self._tuple(payload, pos + 1)  # skip the 'N' marker
+            op = "insert" if kind == "I" else "update"
+            return [Change(op=op, table=table, row=self._row(relid, new, old))]
+
+        if kind == "T":
+            (nrels,) = struct.unpack_from("!i", payload, pos)
+            relids = struct.unpack_from(f"!{nrels}I", payload, pos + 5)
+            return [Change(op="truncate", table=self.relations[r][0]) for r in relids if r in self.relations]
+
+        # B(egin), Y(type), O(rigin), M(essage): nothing to load
+        return []
+
+
+class Wal2JsonDecoder:
+    """Decoder for wal2json format-version 2 (one JSON object per change)."""
+
+    OPS = {"I": "insert", "U": "update", "D": "delete", "T": "truncate"}
+
+    def decode(self, payload, lsn: int):
+        message = json.loads(payload)
+        action = message.get("action")
+        if action == "C":
+            return [Commit(lsn=lsn)]
+        if action not in self.OPS:
+            return []
+        # Unchanged TOAST columns are left out of "columns" on updates; with
+        # REPLICA IDENTITY FULL the old row in "identity" still has them.
+        row = {}
+        for c in (message.get("identity") or []) + (message.get("columns") or []):
+            row[c["name"]] = None if c.get("value") is None else str(c["value"])
+        return [Change(op=self.OPS[action], table=message.get("table"), row=row)]
+
+
+# ===========================================================
+# CONSUMER
+# ===========================================================
+
+class BronzeBatch:
+    """Changes buffered per bronze table since the last flush."""
+
+    def __init__(self):
+        self.rows: Dict[str, List[Dict[str, Optional[str]]]] = {}
+        self.row_count = 0
+        self.skipped: Dict[str, int] = {}
+        self.commit_lsn: Optional[int] = None
+        self.started = time.monotonic()
+
+    def add(self, change: Change) -> None:
+        if change.op in ("insert", "update"):
+            self.rows.setdefault(BRONZE_TABLES[change.table], []).append(change.row)
+            self.row_count += 1
+        else:
+            key = f"{change.table}.{change.op}"
+            self.skipped[key] = self.skipped.get(key, 0) + 1
+
+    def age(self) -> float:
+        return time.monotonic() - self.started
+
+
+class CdcConsumer:
+
+    def __init__(self, dsn: str, sources, slot: str, plugin: str, dry_run: bool = False):
+        unknown = [s for s in sources if s not in BRONZE_TABLES]
+        if unknown:
+            raise ValueError(f"No bronze table for CDC sources: {unknown}")
+        if plugin not in ("pgoutput", "wal2json"):
+            raise ValueError(f"Unsupported output plugin: {plugin}")
+        self.dsn = dsn
+        self.sources = list(sources)
+        self.slot = slot
+        self.plugin = plugin
+        self.dry_run = dry_run
+        self.decoder = PgOutputDecoder() if plugin == "pgoutput" else Wal2JsonDecoder()
+        self.running = True
+        self._clickhouse = None
+
+    # --- setup ---------------------------------------------------------
+
+    def _control_connection(self):
+        connection = psycopg2.connect(self.dsn)
+        connection.autocommit = True
+        return connection
+
+    def prepare(self, control) -> int:
+        """Create checkpoint table, replica identity, publication and slot if needed; return the start LSN."""
+        with control.cursor() as cursor:
+            cursor.execute(CHECKPOINT_DDL)
+            cursor.execute(SOURCE_ROWS_DDL)
+            for source in self.sources:
+                cursor.execute(
+                    "SELECT relreplident FROM pg_class WHERE oid = %s::regclass", (f"public.{source}",)
+                )
+                if cursor.fetchone()[0] != "f":
+                    LOGGER.info("Setting REPLICA IDENTITY FULL on public.%s", source)
+                    cursor.execute(f"ALTER TABLE public.{source} REPLICA IDENTITY FULL")
+            if self.plugin == "pgoutput":
+                cursor.execute("SELECT 1 FROM pg_publication WHERE pubname = %s", (self.slot,))
+                if cursor.fetchone() is None:
+                    tables = ", ".join(f"public.{s}" for s in self.sources)
+                    cursor.execute(f"CREATE PUBLICATION {self.slot} FOR TABLE {tables}")
+            cursor.execute("SELECT lsn FROM etl_cdc_checkpoint WHERE slot = %s", (self.slot,))
+            row = cursor.fetchone()
+        return lsn_to_int(row[0]) if row else 0
+
+    def _replication_options(self):
+        if self.plugin == "pgoutput":
+            return {"proto_version": "1", "publication_names": self.slot}
+        return {
+            "format-version": "2",
+            "add-tables": ",".join(f"public.{s}" for s in self.sources),
+        }
+
+    # --- flushing ------------------------------------------------------
+
+    def _clickhouse_client(self):
+        if self._clickhouse is None:
+            from airflow.sdk.bases.hook import BaseHook
+            from clickhouse_driver import Client as ClickHouseClient
+
+            conn = BaseHook.get_connection("clickhouse_default")
+            self._clickhouse = ClickHouseClient(
+                host=conn.host, port=conn.port or 9000,
+                user=conn.login or "default", password=conn.password or "",
+                database=conn.schema or "compliance",
+            )
+        return self._clickhouse
+
+    def _load(self, bronze_table, rows) -> None:
+        etl_ts = datetime.utcnow().isoformat()
+        # A batch can span a schema change, so group rows by column set.
+        groups: Dict[tuple, list] = {}
+        for row in rows:
+            groups.setdefault(tuple(row), []).append(row)
+        for columns, group in groups.items():
+            names = list(columns) + ["_etl_loaded_at"]
+            self._clickhouse_client().execute(
+                f"INSERT INTO {bronze_table} ({', '.join(names)}) VALUES",
+                [tuple("" if r[c] is None else r[c] for c in columns) + (etl_ts,) for r in group],
+            )
+
+    def flush(self, batch: BronzeBatch, control, replication_cursor) -> None:
+        if batch.commit_lsn is None:
+            return
+        start = time.perf_counter()
+        if not self.dry_run:
+            for bronze_table, rows in batch.rows.items():
+                self._load(bronze_table, rows)
+            lsn = int_to_lsn(batch.commit_lsn)
+            with control.cursor() as cursor:
+                cursor.execute(
+                    """
+                    INSERT INTO etl_cdc_checkpoint (slot, lsn, rows_loaded, batches, updated_at)
+                    VALUES (%s, %s, %s, 1, NOW())
+                    ON CONFLICT (slot) DO UPDATE SET
+                        lsn = EXCLUDED.lsn,
+                        rows_loaded = etl_cdc_checkpoint.rows_loaded + EXCLUDED.rows_loaded,
+                        batches = etl_cdc_checkpoint.batches + 1,
+                        updated_at = EXCLUDED.updated_at
+                    """,
+                    (self.slot, lsn, batch.row_count),
+                )
+                for source, bronze_table in BRONZE_TABLES.items():
+                    if batch.rows.get(bronze_table):
+                        cursor.execute(
+                            """
+                            INSERT INTO etl_cdc_source_rows (slot, source, rows_loaded, updated_at)
+                            VALUES (%s, %s, %s, NOW())
+                            ON CONFLICT (slot, source) DO UPDATE SET
+                                rows_loaded = etl_cdc_source_rows.rows_loaded + EXCLUDED.rows_loaded,
+                                updated_at = EXCLUDED.updated_at
+                            """,
+                            (self.slot, source, len(batch.rows[bronze_table])),
+                        )
+            replication_cursor.send_feedback(flush_lsn=batch.commit_lsn)
+        LOGGER.info(
+            "CDC flush lsn=%s rows=%s tables=%s skipped=%s in %.2fs%s",
+            int_to_lsn(batch.commit_lsn),
+            batch.row_count,
+            {t: len(r) for t, r in batch.rows.items()},
+            batch.skipped,
+            time.perf_counter() - start,
+            " (dry run)" if self.dry_run else "",
+        )
+
+    # --- main loop -----------------------------------------------------
+
+    def run(self, max_seconds: Optional[float] = None) -> None:
+        control = self._control_connection()
+        start_lsn = self.prepare(control)
+
+        replication = psycopg2.connect(self.dsn, connection_factory=LogicalReplicationConnection)
+        cursor = replication.cursor()
+        try:
+            cursor.create_replication_slot(self.slot, slot_type=REPLICATION_LOGICAL, output_plugin=self.plugin)
+            LOGGER.info("Created replication slot %s (%s)", self.slot, self.plugin)
+        except psycopg2.errors.DuplicateObject:
+            pass
+        cursor.start_replication(
+            slot_name=self.slot,
+            decode=self.plugin == "wal2json",
+            start_lsn=start_lsn,
+            options=self._replication_options(),
+        )
+        LOGGER.info("Streaming %s from slot %s at %s", self.sources, self.slot, int_to_lsn(start_lsn))
+
+        deadline = time.monotonic() + max_seconds if max_seconds else None
+        batch = BronzeBatch()
+        in_transaction = False
+        try:
+            while self.running and (deadline is None or time.monotonic() < deadline):
+                message = cursor.read_message()
+                if message is None:
+                    if not in_transaction and batch.commit_lsn is not None and (
+                        batch.age() >= settings.cdc_flush_interval_sec
+                    ):
+                        self.flush(batch, control, cursor)
+                        batch = BronzeBatch()
+                    select.select([cursor], [], [], settings.cdc_flush_interval_sec)
+                    continue
+
+                in_transaction = True
+                for event in self.decoder.decode(message.payload, message.data_start):
+                    if isinstance(event, Commit):
+                        batch.commit_lsn = event.lsn
+                        in_transaction = False
+                    elif event.table in BRONZE_TABLES:
+                        batch.add(event)
+
+                if not in_transaction and (
+                    batch.row_count >= settings.cdc_batch_rows
+                    or batch.age() >= settings.cdc_flush_interval_sec
+                ):
+                    self.flush(batch, control, cursor)
+                    batch = BronzeBatch()
+
+            if not in_transaction:
+                self.flush(batch, control, cursor)
+        finally:
+            replication.close()
+            control.close()
+
+    def stop(self, *_args) -> None:
+        self.running = False
+
+
+def default_dsn() -> str:
+    from airflow.sdk.bases.hook import BaseHook
+
+    return BaseHook.get_connection("postgres_compliance").get_uri()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream Postgres changes into ClickHouse bronze tables")
+    parser.add_argument("--dsn", help="Postgres DSN (default: the postgres_compliance Airflow connection)")
+    parser.add_argument("--sources", default=",".join(settings.cdc_sources), help="comma-separated source tables")
+    parser.add_argument("--slot", default=settings.cdc_slot)
+    parser.add_argument("--plugin", default=settings.cdc_plugin, choices=["pgoutput", "wal2json"])
+    parser.add_argument("--max-seconds", type=float, help="stop after this long (for tests)")
+    parser.add_argument("--dry-run", action="store_true", help="decode and log batches without loading")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s [%(name)s] %(message)s")
+    sources = [s.strip() for s in args.sources.split(",") if s.strip()]
+    if not sources:
+        parser.error("no CDC sources (set PIPELINE_CDC_SOURCES or --sources)")
+
+    consumer = CdcConsumer(args.dsn or default_dsn(), sources, args.slot, args.plugin, dry_run=args.dry_run)
+    signal.signal(signal.SIGTERM, consumer.stop)
+    signal.signal(signal.SIGINT, consumer.stop)
+    consumer.run(max_seconds=args.max_seconds)
+
+
+if __name__ == "__main__":
+    main()
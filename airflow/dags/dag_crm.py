@@ -1,5 +1,5 @@
 """CRM ETL DAG: PostgreSQL -> ClickHouse bronze layer"""
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timedelta
 import logging
 
 from airflow import DAG
@@ -12,11 +12,15 @@ from airflow.providers.postgres.hooks.postgres import PostgresHook
 from psycopg2.extras import RealDictCursor
 from clickhouse_driver import Client as ClickHouseClient
 
+from assets import BRONZE_ASSETS, publish_bronze
+from pipeline_config import settings
+from watermarks import KeysetCursor, advance_cursor, get_cursor, keyset_query
+
 LOGGER = logging.getLogger(__name__)
-EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
 SOURCE_NAME  = "crm"
 SOURCE_TABLE = "crm"
 BRONZE_TABLE = "crm_raw"
+PRIMARY_KEY  = "crm_id"
 # Fixed: use actual column names from the crm table
 REQUIRED_COLUMNS = ["crm_id", "customer_id", "interaction_type", "updated_at"]
 COERCION_RULES   = [{"kind": "str", "field": "crm_id"}]
@@ -62,28 +66,24 @@ def _serialize(value):
     return value
 
 
-def get_watermark(**_kwargs) -> str:
-    watermark_raw = Variable.get(f"watermark_{SOURCE_NAME}", default_var=EPOCH_UTC.isoformat())
+def get_watermark(**_kwargs) -> dict:
+    connection = get_postgres_connection()
     try:
-        watermark_dt = datetime.fromisoformat(watermark_raw.replace("Z", "+00:00"))
-        if watermark_dt.tzinfo is None:
-            watermark_dt = watermark_dt.replace(tzinfo=timezone.utc)
-    except ValueError:
-        watermark_dt = EPOCH_UTC
-    return watermark_dt.isoformat()
+        return get_cursor(connection, SOURCE_NAME).to_dict()
+    finally:
+        connection.close()
 
 
 def extract_from_postgres(**kwargs):
-    watermark    = kwargs["ti"].xcom_pull(task_ids="get_watermark")
-    watermark_dt = datetime.fromisoformat(watermark.replace("Z", "+00:00"))
-    if watermark_dt.tzinfo is None:
-        watermark_dt = watermark_dt.replace(tzinfo=timezone.utc)
-    query = (f"SELECT * FROM {SOURCE_TABLE} WHERE updated_at > %s "
-             "ORDER BY updated_at ASC LIMIT 50000")
+    if SOURCE_NAME in settings.cdc_sources:
+        LOGGER.info("%s is loaded into bronze by CDC (cdc.py); skipping poll", SOURCE_NAME)
+        return []
+    position = KeysetCursor.from_dict(kwargs["ti"].xcom_pull(task_ids="get_watermark"))
+    query, params = keyset_query(SOURCE_TABLE, PRIMARY_KEY, position, settings.extract_batch_size)
     connection = get_postgres_connection()
     try:
         with connection.cursor(cursor_factory=RealDictCursor) as cursor:
-            cursor.execute(query, (watermark_dt,))
+            cursor.execute(query, params)
             rows = cursor.fetchall()
             return [{k: _serialize(v) for k, v in row.items()} for row in rows]
     finally:
@@ -105,7 +105,7 @@ def load_to_bronze(**kwargs):
     rows = kwargs["ti"].xcom_pull(task_ids="extract_from_postgres") or []
     if not rows:
         LOGGER.info("No rows to load for %s", SOURCE_NAME)
-        return {"rows_written": 0, "max_updated_at": None}
+        return {"rows_written": 0, "max_updated_at": None, "cursor": None}
     import datetime as _dt
     def safe(v):
         if isinstance(v, (_dt.datetime, _dt.date)):
@@ -120,16 +120,32 @@ def load_to_bronze(**kwargs):
                    [tuple(safe(r.get(c)) for c in available) for r in enriched])
     max_updated_at = max((r["updated_at"] for r in enriched if r.get("updated_at")), default=None)
     LOGGER.info("Loaded %d rows into %s", len(enriched), BRONZE_TABLE)
-    return {"rows_written": len(enriched), "max_updated_at": max_updated_at}
+    # Rows arrive in (updated_at, pk) order, so the last one is the new cursor.
+    last = KeysetCursor(updated_at=str(rows[-1]["updated_at"]), pk=str(rows[-1][PRIMARY_KEY]))
+    return {"rows_written": len(enriched), "max_updated_at": max_updated_at, "cursor": last.to_dict()}
 
 
 def update_watermark(**kwargs):
-    load_result    = kwargs["ti"].xcom_pull(task_ids="load_to_bronze") or {}
-    max_updated_at = load_result.get("max_updated_at")
-    if not max_updated_at:
+    ti          = kwargs["ti"]
+    load_result = ti.xcom_pull(task_ids="load_to_bronze") or {}
+    if not load_result.get("cursor"):
         LOGGER.info("No rows loaded for %s; watermark unchanged", SOURCE_NAME)
         return
-    Variable.set(f"watermark_{SOURCE_NAME}", str(max_updated_at))
+    connection = get_postgres_connection()
+    try:
+        advance_cursor(
+            connection,
+            SOURCE_NAME,
+            previous=KeysetCursor.from_dict(ti.xcom_pull(task_ids="get_watermark")),
+            new=KeysetCursor.from_dict(load_result["cursor"]),
+            rows_loaded=load_result["rows_written"],
+        )
+    finally:
+        connection.close()
+
+
+def publish_bronze_asset(**kwargs):
+    publish_bronze(SOURCE_NAME, kwargs["ti"].xcom_pull(task_ids="load_to_bronze"), get_postgres_connection)
 
 
 default_args = {
@@ -154,4 +170,6 @@ with dag:
     t3 = PythonOperator(task_id="validate_extract",      python_callable=validate_extract)
     t4 = PythonOperator(task_id="load_to_bronze",        python_callable=load_to_bronze)
     t5 = PythonOperator(task_id="update_watermark",      python_callable=update_watermark)
-    t1 >> t2 >> t3 >> t4 >> t5
\ No newline at end of file
+    t6 = PythonOperator(task_id="publish_bronze_asset",  python_callable=publish_bronze_asset,
+                        outlets=[BRONZE_ASSETS[SOURCE_NAME]])
+    t1 >> t2 >> t3 >> t4 >> t5 >> t6
@@ -0,0 +1,120 @@
+"""Gold refresh DAG: silver -> ClickHouse gold views -> Redis
+
+Runs once every silver asset it reads has been updated since its last run,
+and at least hourly so a source with no new rows cannot hold gold back.
+Either way nothing is refreshed while any source's silver gate is failing.
+Gold DDL and refresh INSERTs are run by gold_orchestrator.py.
+"""
+from datetime import datetime, timedelta
+import logging
+
+from airflow import DAG
+from airflow.exceptions import AirflowException
+from airflow.models import Variable
+from airflow.sdk.bases.hook import BaseHook
+from airflow.utils.email import send_email
+from airflow.providers.standard.operators.python import PythonOperator, ShortCircuitOperator
+from airflow.timetables.assets import AssetOrTimeSchedule
+from airflow.timetables.trigger import CronTriggerTimetable
+from clickhouse_driver import Client as ClickHouseClient
+
+from assets import SILVER_ASSETS
+from gold_events import GOLD_TABLES_BY_SOURCE, publish_gold_refresh
+from gold_materializer import GOLD_TABLES, materialize_gold
+from gold_orchestrator import run_gold_sql
+from pipeline_config import settings
+from silver_gate import failing_gates
+
+LOGGER = logging.getLogger(__name__)
+
+
+def on_failure_alert(context):
+    dag_id   = context.get("dag").dag_id if context.get("dag") else "unknown_dag"
+    task_id  = context.get("task_instance").task_id if context.get("task_instance") else "unknown_task"
+    message  = (f"ETL failure\nDAG: {dag_id}\nTask: {task_id}\n"
+                f"Exception: {context.get('exception')}")
+    alert_emails = Variable.get("alert_emails", default_var="")
+    if alert_emails:
+        recipients = [e.strip() for e in alert_emails.split(",") if e.strip()]
+        if recipients:
+            send_email(to=recipients, subject=f"[Airflow] Failure: {dag_id}.{task_id}", html_content=message)
+    slack_webhook = Variable.get("slack_webhook_url", default_var="")
+    if slack_webhook:
+        try:
+            import requests
+            requests.post(slack_webhook, json={"text": message}, timeout=10)
+        except Exception:
+            LOGGER.exception("Failed to send Slack alert")
+
+
+def get_clickhouse_client():
+    conn = BaseHook.get_connection("clickhouse_default")
+    return ClickHouseClient(
+        host=conn.host,
+        port=conn.port or 9000,
+        user=conn.login or "default",
+        password=conn.password or "",
+        database=conn.schema or "compliance",
+    )
+
+
+def check_silver_gates(**kwargs):
+    failing = failing_gates(SILVER_ASSETS)
+    for source, reason in failing.items():
+        LOGGER.error("Silver gate for %s not passing (%s); skipping gold refresh", source, reason)
+    return not failing
+
+
+def ensure_gold_views(**kwargs):
+    sql_path = "/opt/airflow/dags/transforms/gold_views.sql"
+    with open(sql_path) as f:
+        sql = f.read()
+    try:
+        return run_gold_sql(sql, get_clickhouse_client, settings.gold_max_parallel)
+    except Exception as e:
+        raise AirflowException(f"Gold SQL execution failed : {str(e)}")
+
+
+def cache_gold_to_redis(**kwargs):
+    client = get_clickhouse_client()
+    try:
+        results = materialize_gold(client, list(GOLD_TABLES))
+    finally:
+        client.disconnect()
+    LOGGER.info("Gold cached into Redis: %s", results)
+    return results
+
+
+def notify_gold_refresh(**kwargs):
+    # Every rebuilt gold table, not only the ones cached in Redis: the API
+    # also caches responses it builds from ClickHouse gold directly.
+    tables = sorted({t for source_tables in GOLD_TABLES_BY_SOURCE.values() for t in source_tables})
+    return publish_gold_refresh("silver", tables)
+
+
+default_args = {
+    "owner": "airflow",
+    "retries": 3,
+    "retry_delay": timedelta(minutes=5),
+    "on_failure_callback": on_failure_alert,
+}
+
+dag = DAG(
+    dag_id="etl_gold_refresh",
+    default_args=default_args,
+    schedule=AssetOrTimeSchedule(
+        timetable=CronTriggerTimetable("0 * * * *", timezone="UTC"),
+        assets=SILVER_ASSETS["loans"] & SILVER_ASSETS["calls"] & SILVER_ASSETS["payments"],
+    ),
+    start_date=datetime(2026, 2, 20),
+    catchup=False,
+    max_active_runs=1,
+    tags=["gold"],
+)
+
+with dag:
+    t0 = ShortCircuitOperator(task_id="check_silver_gates", python_callable=check_silver_gates)
+    t1 = PythonOperator(task_id="ensure_gold_views",     python_callable=ensure_gold_views)
+    t2 = PythonOperator(task_id="cache_gold_to_redis",   python_callable=cache_gold_to_redis)
+    t3 = PythonOperator(task_id="notify_gold_refresh",   python_callable=notify_gold_refresh)
+    t0 >> t1 >> t2 >> t3
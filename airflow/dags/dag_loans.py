@@ -1,6 +1,6 @@
-"""Loans ETL DAG: PostgreSQL -> ClickHouse bronze layer"""
+"""Loans ETL DAG: PostgreSQL -> ClickHouse bronze, then bronze -> silver on its asset"""
 import datetime as dt
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timedelta
 import logging
 import uuid
 
@@ -9,16 +9,21 @@ from airflow.exceptions import AirflowException
 from airflow.models import Variable
 from airflow.sdk.bases.hook import BaseHook
 from airflow.utils.email import send_email
-from airflow.providers.standard.operators.python import PythonOperator
+from airflow.providers.standard.operators.python import PythonOperator, ShortCircuitOperator
 from airflow.providers.postgres.hooks.postgres import PostgresHook
 from psycopg2.extras import RealDictCursor
 from clickhouse_driver import Client as ClickHouseClient
 
+from assets import BRONZE_ASSETS, SILVER_ASSETS, publish_bronze
+from pipeline_config import run_clickhouse_http, settings
+from silver_gate import check_silver_gate
+from watermarks import KeysetCursor, advance_cursor, get_cursor, keyset_query
+
 LOGGER = logging.getLogger(__name__)
-EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
 SOURCE_NAME  = "loans"
 SOURCE_TABLE = "loans"
 BRONZE_TABLE = "loans_raw"
+PRIMARY_KEY  = "loan_id"
 REQUIRED_COLUMNS = ["loan_id", "borrower_id", "principal_amount", "updated_at"]
 COERCION_RULES   = [{"kind": "float", "field": "principal_amount"}]
 
@@ -66,28 +71,24 @@ def _serialize(value):
     return value
 
 
-def get_watermark(**_kwargs) -> str:
-    watermark_raw = Variable.get(f"watermark_{SOURCE_NAME}", default_var=EPOCH_UTC.isoformat())
+def get_watermark(**_kwargs) -> dict:
+    connection = get_postgres_connection()
     try:
-        watermark_dt = datetime.fromisoformat(watermark_raw.replace("Z", "+00:00"))
-        if watermark_dt.tzinfo is None:
-            watermark_dt = watermark_dt.replace(tzinfo=timezone.utc)
-    except ValueError:
-        watermark_dt = EPOCH_UTC
-    return watermark_dt.isoformat()
+        return get_cursor(connection, SOURCE_NAME).to_dict()
+    finally:
+        connection.close()
 
 
 def extract_from_postgres(**kwargs):
-    watermark    = kwargs["ti"].xcom_pull(task_ids="get_watermark")
-    watermark_dt = datetime.fromisoformat(watermark.replace("Z", "+00:00"))
-    if watermark_dt.tzinfo is None:
-        watermark_dt = watermark_dt.replace(tzinfo=timezone.utc)
-    query = (f"SELECT * FROM {SOURCE_TABLE} WHERE updated_at > %s "
-             "ORDER BY updated_at ASC LIMIT 50000")
+    if SOURCE_NAME in settings.cdc_sources:
+        LOGGER.info("%s is loaded into bronze by CDC (cdc.py); skipping poll", SOURCE_NAME)
+        return []
+    position = KeysetCursor.from_dict(kwargs["ti"].xcom_pull(task_ids="get_watermark"))
+    query, params = keyset_query(SOURCE_TABLE, PRIMARY_KEY, position, settings.extract_batch_size)
     connection = get_postgres_connection()
     try:
         with connection.cursor(cursor_factory=RealDictCursor) as cursor:
-            cursor.execute(query, (watermark_dt,))
+            cursor.execute(query, params)
             rows = cursor.fetchall()
             return [{k: _serialize(v) for k, v in row.items()} for row in rows]
     finally:
@@ -117,7 +118,7 @@ def load_to_bronze(**kwargs):
     rows = kwargs["ti"].xcom_pull(task_ids="extract_from_postgres") or []
     if not rows:
         LOGGER.info("No rows to load for %s", SOURCE_NAME)
-        return {"rows_written": 0, "max_updated_at": None}
+        return {"rows_written": 0, "max_updated_at": None, "cursor": None}
     import datetime as _dt
     def safe(v):
         if isinstance(v, (_dt.datetime, _dt.date)):
@@ -133,138 +134,56 @@ def load_to_bronze(**kwargs):
                    [tuple(safe(r.get(c)) for c in available) for r in enriched])
     max_updated_at = max((r["updated_at"] for r in enriched if r.get("updated_at")), default=None)
     LOGGER.info("Loaded %d rows into %s", len(enriched), BRONZE_TABLE)
-    return {"rows_written": len(enriched), "max_updated_at": max_updated_at}
+    # Rows arrive in (updated_at, pk) order, so the last one is the new cursor.
+    last = KeysetCursor(updated_at=str(rows[-1]["updated_at"]), pk=str(rows[-1][PRIMARY_KEY]))
+    return {"rows_written": len(enriched), "max_updated_at": max_updated_at, "cursor": last.to_dict()}
 
 
 def update_watermark(**kwargs):
-    load_result    = kwargs["ti"].xcom_pull(task_ids="load_to_bronze") or {}
-    max_updated_at = load_result.get("max_updated_at")
-    if not max_updated_at:
+    ti          = kwargs["ti"]
+    load_result = ti.xcom_pull(task_ids="load_to_bronze") or {}
+    if not load_result.get("cursor"):
         LOGGER.info("No rows loaded for %s; watermark unchanged", SOURCE_NAME)
         return
-    Variable.set(f"watermark_{SOURCE_NAME}", str(max_updated_at))
+    connection = get_postgres_connection()
+    try:
+        advance_cursor(
+            connection,
+            SOURCE_NAME,
+            previous=KeysetCursor.from_dict(ti.xcom_pull(task_ids="get_watermark")),
+            new=KeysetCursor.from_dict(load_result["cursor"]),
+            rows_loaded=load_result["rows_written"],
+        )
+    finally:
+        connection.close()
 
 
 def run_silver_transform(**kwargs):
-    import requests
     sql_path = "/opt/airflow/dags/transforms/silver_loans.sql"
     with open(sql_path) as f:
         sql = f.read()
-    resp = requests.post("http://clickhouse:8123/?database=compliance", data=sql)
+    resp = run_clickhouse_http(sql)
     if resp.status_code != 200:
         raise AirflowException(f"ClickHouse silver_loans failed: {resp.text}")
     LOGGER.info("Silver loans transform completed")
-def ensure_gold_views(**kwargs):
 
-    sql_path = "/opt/airflow/dags/transforms/gold_views.sql"
 
+def silver_gate(**kwargs):
     client = get_clickhouse_client()
-
     try:
+        return check_silver_gate(SOURCE_NAME, client, kwargs.get("ti"))
+    finally:
+        client.disconnect()
 
-        with open(sql_path) as f:
-            sql = f.read()
-
-        # Remove comment blocks
-        import re
-
-        sql = re.sub(
-            r"/\*.*?\*/",
-            "",
-            sql,
-            flags=re.DOTALL
-        )
-
-        statements = [
-
-            stmt.strip()
-
-            for stmt in sql.split(";")
-
-            if stmt.strip()   # ⭐ VERY IMPORTANT
-
-        ]
-
-        for statement in statements:
-
-            LOGGER.info(
-                "Executing Gold SQL:\n%s",
-                statement[:150]
-            )
-
-            client.execute(statement)
-
-        LOGGER.info(
-            "Gold tables + views ensured successfully"
-        )
-
-    except Exception as e:
-
-        raise AirflowException(
-            f"Gold SQL execution failed : {str(e)}"
-        )
-import redis
-import json
-def serialize_value(value):
-
-    if isinstance(
-
-        value,
-
-        (dt.date,
-         dt.datetime)
-
-    ):
-
-        return value.isoformat()
-
-    return value
-def serialize_rows(rows):
-
-    return [
-
-        [
-
-            serialize_value(v)
-
-            for v in row
-
-        ]
-
-        for row in rows
-
-    ]
-
-def cache_gold_to_redis(**kwargs):
-
-    client = get_clickhouse_client()
-
-    r = redis.Redis(
-
-        host="redis",
-        port=6379,
-        decode_responses=True
-
-    )
-
-    rows = client.execute("""
-
-        SELECT *
-        FROM manager_branch_summary
-
-    """)
 
-    rows = serialize_rows(rows)
+def publish_bronze_asset(**kwargs):
+    publish_bronze(SOURCE_NAME, kwargs["ti"].xcom_pull(task_ids="load_to_bronze"), get_postgres_connection)
 
-    r.set(
 
-        "gold:manager_branch_summary",
+def publish_silver_asset(**kwargs):
+    LOGGER.info("Silver %s passed the gate; emitting silver asset", SOURCE_NAME)
 
-        json.dumps(rows)
 
-    )
-
-    print("Gold cached into Redis.")
 default_args = {
     "owner": "airflow",
     "retries": 3,
@@ -287,7 +206,22 @@ with dag:
     t3 = PythonOperator(task_id="validate_extract",      python_callable=validate_extract)
     t4 = PythonOperator(task_id="load_to_bronze",        python_callable=load_to_bronze)
     t5 = PythonOperator(task_id="update_watermark",      python_callable=update_watermark)
-    t6 = PythonOperator(task_id="silver_transform",      python_callable=run_silver_transform)
-    t7 = PythonOperator(task_id="ensure_gold_views",     python_callable=ensure_gold_views,)
-    t8 = PythonOperator(task_id="cache_gold_to_redis",   python_callable=cache_gold_to_redis)
-    t1 >> t2 >> t3 >> t4 >> t5 >> t6 >> t7 >> t8
\ No newline at end of file
+    t6 = PythonOperator(task_id="publish_bronze_asset",  python_callable=publish_bronze_asset,
+                        outlets=[BRONZE_ASSETS[SOURCE_NAME]])
+    t1 >> t2 >> t3 >> t4 >> t5 >> t6
+
+silver_dag = DAG(
+    dag_id="etl_loans_bronze_to_silver",
+    default_args=default_args,
+    schedule=[BRONZE_ASSETS[SOURCE_NAME]],
+    start_date=datetime(2026, 2, 20),
+    catchup=False,
+    tags=["silver", "loans"],
+)
+
+with silver_dag:
+    s1 = PythonOperator(task_id="silver_transform",      python_callable=run_silver_transform)
+    s2 = ShortCircuitOperator(task_id="silver_gate",     python_callable=silver_gate)
+    s3 = PythonOperator(task_id="publish_silver_asset",  python_callable=publish_silver_asset,
+                        outlets=[SILVER_ASSETS[SOURCE_NAME]])
+    s1 >> s2 >> s3
@@ -0,0 +1,46 @@
+"""Gold refresh events: tell the serving API which gold tables changed"""
+from datetime import datetime, timezone
+import json
+import logging
+
+from pipeline_config import get_redis
+
+LOGGER = logging.getLogger(__name__)
+
+# Must match api/cache.py GOLD_REFRESH_CHANNEL
+GOLD_REFRESH_CHANNEL = "gold:refreshed"
+
+# Gold tables fed by each silver source
+GOLD_TABLES_BY_SOURCE = {
+    "loans": [
+        "lender_portfolio_summary",
+        "agent_assigned_loans",
+        "manager_branch_summary",
+        "hr_agent_performance_daily",
+    ],
+    "calls": [
+        "agent_assigned_loans",
+        "manager_branch_summary",
+        "hr_agent_performance_daily",
+    ],
+    "payments": [
+        "lender_portfolio_summary",
+        "manager_branch_summary",
+        "hr_agent_performance_daily",
+    ],
+}
+
+
+def publish_gold_refresh(source, tables=None):
+    tables = list(tables if tables is not None else GOLD_TABLES_BY_SOURCE.get(source, []))
+    if not tables:
+        LOGGER.info("No gold tables mapped for source=%s; nothing to publish", source)
+        return 0
+    event = {
+        "source": source,
+        "tables": tables,
+        "refreshed_at": datetime.now(timezone.utc).isoformat(),
+    }
+    receivers = get_redis().publish(GOLD_REFRESH_CHANNEL, json.dumps(event))
+    LOGGER.info("Published gold refresh for %s tables=%s receivers=%s", source, tables, receivers)
+    return receivers
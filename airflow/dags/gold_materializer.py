@@ -0,0 +1,174 @@
+"""Gold -> Redis materializer: per-entity hashes behind an atomic version pointer
+
+Layout (must match api/cache.py read_gold_entity):
+    gold:<table>:version                  -> current version id
+    gold:<table>:<version>:<entity...>    -> HASH
+
+Tables with a `field` column store one JSON row per hash field (e.g. one
+field per aging bucket under a lender); the others store the row's columns
+directly. Only tables the API reads from Redis (api/cache.py read_gold_*)
+are materialized.
+"""
+import datetime as dt
+import json
+import logging
+
+from pipeline_config import get_redis, settings
+
+LOGGER = logging.getLogger(__name__)
+
+GOLD_BATCH_SIZE = settings.gold_batch_size
+GOLD_KEY_TTL_SEC = settings.gold_key_ttl_sec
+
+GOLD_TABLES = {
+    "manager_branch_summary": {"entity": ["branch_id", "report_date"], "field": None},
+    # Summed over raw rows, like the API's ClickHouse fallback, so every path
+    # computes collection efficiency as the same row-weighted mean.
+    "lender_portfolio_summary": {
+        "entity": ["lender_id"],
+        "field": "loan_aging_bucket",
+        "aggregates": {
+            "total_loans_count": "sum(total_loans_count)",
+            "total_principal_disbursed": "sum(total_principal_disbursed)",
+            "npa_count": "sum(npa_count)",
+            "npa_amount": "sum(npa_amount)",
+            "total_collected_today": "sum(total_collected_today)",
+            "collection_efficiency_sum": "sum(collection_efficiency_pct)",
+            "collection_efficiency_rows": "count()",
+        },
+    },
+}
+
+LEGACY_KEYS = ["gold:manager_branch_summary"]
+
+# Previously materialized but never read by the API; their last version is
+# removed on the next run.
+RETIRED_TABLES = ["agent_assigned_loans", "hr_agent_performance_daily"]
+
+
+def _serialize(value):
+    if isinstance(value, (dt.date, dt.datetime)):
+        return value.isoformat()
+    if value is None:
+        return ""
+    return value
+
+
+def _version_key(table):
+    return f"gold:{table}:version"
+
+
+def _entity_key(table, version, entity_values):
+    return ":".join([f"gold:{table}", version] + [str(v) for v in entity_values])
+
+
+def _table_columns(client, table):
+    rows = client.execute(
+        """
+        SELECT name
+        FROM system.columns
+        WHERE database = currentDatabase() AND table = %(table)s
+        ORDER BY position
+        """,
+        {"table": table},
+    )
+    return [row[0] for row in rows]
+
+
+def _drop_version(r, table, version):
+    if not version:
+        return 0
+    dropped = 0
+    batch = []
+    for key in r.scan_iter(match=f"gold:{table}:{version}:*", count=GOLD_BATCH_SIZE):
+        batch.append(key)
+        if len(batch) >= GOLD_BATCH_SIZE:
+            dropped += r.unlink(*batch)
+            batch = []
+    if batch:
+        dropped += r.unlink(*batch)
+    return dropped
+
+
+def materialize_table(client, r, table, batch_size=GOLD_BATCH_SIZE):
+    spec = GOLD_TABLES[table]
+    columns = _table_columns(client, table)
+    if not columns:
+        LOGGER.warning("Gold table %s not found; skipping", table)
+        return {"table": table, "rows": 0, "entities": 0}
+
+    if spec.get("aggregates"):
+        keys = spec["entity"] + ([spec["field"]] if spec["field"] else [])
+        columns = keys + list(spec["aggregates"])
+        select = ", ".join(keys + [f"{expr} AS {name}" for name, expr in spec["aggregates"].items()])
+        query = f"SELECT {select} FROM {table} GROUP BY {', '.join(keys)} ORDER BY {', '.join(spec['entity'])}"
+    else:
+        query = f"SELECT {', '.join(columns)} FROM {table} FINAL ORDER BY {', '.join(spec['entity'])}"
+
+    entity_idx = [columns.index(c) for c in spec["entity"]]
+    field_idx = columns.index(spec["field"]) if spec["field"] else None
+    version = dt.datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
+
+    rows_iter = client.execute_iter(query, settings={"max_block_size": batch_size})
+
+    pipe = r.pipeline(transaction=False)
+    pending = 0
+    rows_written = 0
+    entities = 0
+    last_key = None
+
+    for row in rows_iter:
+        values = [_serialize(v) for v in row]
+        key = _entity_key(table, version, [values[i] for i in entity_idx])
+
+        if field_idx is None:
+            pipe.hset(key, mapping=dict(zip(columns, values)))
+        else:
+            pipe.hset(
+                key,
+                str(values[field_idx]),
+                json.dumps(dict(zip(columns, values)), separators=(",", ":"), default=str),
+            )
+
+        if key != last_key:
+            pipe.expire(key, GOLD_KEY_TTL_SEC)
+            entities += 1
+            last_key = key
+
+        rows_written += 1
+        pending += 1
+        if pending >= batch_size:
+            pipe.execute()
+            pending = 0
+
+    if pending:
+        pipe.execute()
+
+    # Readers switch to the new version in one step; then the old one goes.
+    old_version = r.getset(_version_key(table), version)
+    dropped = _drop_version(r, table, old_version)
+
+    LOGGER.info(
+        "Materialized %s version=%s rows=%s entities=%s dropped_old_keys=%s",
+        table,
+        version,
+        rows_written,
+        entities,
+        dropped,
+    )
+    return {"table": table, "version": version, "rows": rows_written, "entities": entities}
+
+
+def materialize_gold(client, tables=None, batch_size=GOLD_BATCH_SIZE):
+    r = get_redis()
+    results = [
+        materialize_table(client, r, table, batch_size=batch_size)
+        for table in (tables or list(GOLD_TABLES))
+    ]
+    r.delete(*LEGACY_KEYS)
+    for table in RETIRED_TABLES:
+        old_version = r.get(_version_key(table))
+        if old_version:
+            _drop_version(r, table, old_version)
+            r.delete(_version_key(table))
+    return results
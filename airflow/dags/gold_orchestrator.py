@@ -0,0 +1,303 @@
+"""Gold build: gold_views.sql as a dependency graph, run in parallel
+
+The file is split into statements by a small scanner that understands
+comments and quoted strings. Each statement is classified by what it
+writes (CREATE TABLE/VIEW/MATERIALIZED VIEW name, an MV's TO table,
+INSERT INTO name) and what it reads (FROM/JOIN names). A statement
+depends on every earlier statement that writes something it reads or
+writes, so table -> MV -> backfill INSERT keep their file order while
+unrelated chains run side by side on a bounded pool of ClickHouse
+clients (the native client is not thread-safe, so one per worker).
+
+CREATE statements are skipped when the object exists and its normalized
+SQL checksum matches the one recorded in gold_object_checksum. A changed
+view or materialized view is dropped and recreated (an MV with TO holds
+no data of its own); a changed table is left alone and reported, since
+recreating it would drop its data. INSERTs are the refresh itself and
+always run.
+"""
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+import hashlib
+import logging
+import queue
+import re
+import time
+from typing import Optional
+
+from pipeline_config import settings
+
+LOGGER = logging.getLogger(__name__)
+
+CHECKSUM_DDL = """
+CREATE TABLE IF NOT EXISTS gold_object_checksum
+(
+    object String,
+    kind String,
+    checksum String,
+    applied_at DateTime DEFAULT now()
+)
+ENGINE = ReplacingMergeTree(applied_at)
+ORDER BY object
+"""
+
+_IDENT = r"[`\"]?[\w.]+[`\"]?"
+_CREATE_RE = re.compile(
+    rf"^\s*CREATE\s+(?:OR\s+REPLACE\s+)?(TABLE|MATERIALIZED\s+VIEW|VIEW)\s+(?:IF\s+NOT\s+EXISTS\s+)?({_IDENT})",
+    re.IGNORECASE,
+)
+_INSERT_RE = re.compile(rf"^\s*INSERT\s+INTO\s+(?:TABLE\s+)?({_IDENT})", re.IGNORECASE)
+_TO_RE = re.compile(rf"\bTO\s+({_IDENT})", re.IGNORECASE)
+_READ_RE = re.compile(rf"\b(?:FROM|JOIN)\s+({_IDENT})(?!\s*\()", re.IGNORECASE)
+
+
+@dataclass
+class GoldStatement:
+    index: int
+    sql: str
+    kind: str                   # table | view | materialized_view | insert | other
+    target: Optional[str]       # object created or inserted into
+    writes: set = field(default_factory=set)
+    reads: set = field(default_factory=set)
+    depends_on: set = field(default_factory=set)
+
+    @property
+    def checksum(self):
+        return hashlib.sha256(" ".join(self.sql.split()).encode()).hexdigest()
+
+    @property
+    def label(self):
+        return f"#{self.index} {self.kind} {self.target or '?'}"
+
+
+def _name(identifier):
+    return identifier.strip('`"').lower()
+
+
+def split_statements(sql):
+    """Split on top-level ';'. Returns (text, code) pairs: comments removed,
+    and in `code` string literal contents blanked as well."""
+    statements = []
+    text, code = [], []
+    i, n = 0, len(sql)
+    while i < n:
+        ch = sql[i]
+        if ch == "-" and sql.startswith("--", i):
+            end = sql.find("\n", i)
+            i = n if end == -1 else end
+            continue
+        if ch == "/" and sql.startswith("/*", i):
+            end = sql.find("*/", i + 2)
+            i = n if end == -1 else end + 2
+            text.append(" ")
+            code.append(" ")
+            continue
+        if ch in "'\"`":
+            j = i + 1
+            while j < n:
+                if sql[j] == "\\":
+                    j += 2
+                    continue
+                if sql[j] == ch:
+                    if j + 1 < n and sql[j + 1] == ch:  # doubled quote
+                        j += 2
+                        continue
+                    break
+                j += 1
+            literal = sql[i:j + 1]
+            text.append(literal)
+            # Identifiers stay visible to the parser; string contents do not.
+            code.append(literal if ch != "'" else "''")
+            i = j + 1
+            continue
+        if ch == ";":
+            statements.append(("".join(text).strip(), "".join(code).strip()))
+            text, code = [], []
+            i += 1
+            continue
+        text.append(ch)
+        code.append(ch)
+        i += 1
+    statements.append(("".join(text).strip(), "".join(code).strip()))
+    return [(t, c) for t, c in statements if t]
+
+
+def parse_statement(index, text, code):
+    create = _CREATE_RE.match(code)
+    if create:
+        kind = re.sub(r"\s+", "_", create.group(1).lower())
+        target = _name(create.group(2))
+        stmt = GoldStatement(index, text, kind, target, writes={target})
+        if kind == "materialized_view":
+            to_table = _TO_RE.search(code[create.end():])
+            if to_table:
+                # The MV feeds its TO table: later writers/readers of it wait for the MV.
+                stmt.writes.add(_name(to_table.group(1)))
+    else:
+        insert = _INSERT_RE.match(code)
+        if insert:
+            target = _name(insert.group(1))
+            stmt = GoldStatement(index, text, "insert", target, writes={target})
+        else:
+            stmt = GoldStatement(index, text, "other", None)
+    stmt.reads = {_name(m.group(1)) for m in _READ_RE.finditer(code)} - {stmt.target}
+    return stmt
+
+
+def build_gold_graph(sql):
+    """Parse gold SQL into statements with `depends_on` filled in."""
+    statements = [parse_statement(i, t, c) for i, (t, c) in enumerate(split_statements(sql))]
+    for stmt in statements:
+        touched = stmt.reads | stmt.writes
+        for earlier in statements[:stmt.index]:
+            # Unparseable statements act as barriers, as in a serial run.
+            if earlier.kind == "other" or stmt.kind == "other" or earlier.writes & touched:
+                stmt.depends_on.add(earlier.index)
+    return statements
+
+
+class ClickHousePool:
+    """At most `size` native clients, created on first use and handed out one per thread."""
+
+    def __init__(self, factory, size):
+        self._factory = factory
+        self._clients = queue.Queue()
+        for _ in range(size):
+            self._clients.put(None)  # a free slot without a client yet
+        self._created = []
+
+    def acquire(self):
+        client = self._clients.get()
+        if client is None:
+            try:
+                client = self._factory()
+            except Exception:
+                self._clients.put(None)
+                raise
+            self._created.append(client)
+        return client
+
+    def release(self, client):
+        self._clients.put(client)
+
+    def close(self):
+        for client in self._created:
+            try:
+                client.disconnect()
+            except Exception:
+                LOGGER.exception("Failed to disconnect ClickHouse client")
+
+
+def _existing_objects(client):
+    return {row[0].lower() for row in client.execute(
+        "SELECT name FROM system.tables WHERE database = currentDatabase()"
+    )}
+
+
+def _recorded_checksums(client):
+    client.execute(CHECKSUM_DDL)
+    return dict(client.execute("SELECT object, checksum FROM gold_object_checksum FINAL"))
+
+
+def _plan_action(stmt, existing, recorded):
+    """What to do with a statement: apply, record, skip, replace or drift."""
+    if stmt.kind not in ("table", "view", "materialized_view"):
+        return "apply"
+    if stmt.target.split(".")[-1] not in existing:
+        return "apply"
+    if recorded.get(stmt.target) == stmt.checksum:
+        return "skip"
+    if stmt.target not in recorded:
+        # Built before checksums were tracked: trust it and record the current definition.
+        return "record"
+    return "replace" if stmt.kind != "table" else "drift"
+
+
+def _run_statement(pool, stmt, action):
+    client = pool.acquire()
+    start = time.perf_counter()
+    try:
+        if action == "replace":
+            client.execute(f"DROP VIEW IF EXISTS {stmt.target}")
+        if action in ("apply", "replace"):
+            client.execute(stmt.sql)
+        if stmt.kind in ("table", "view", "materialized_view"):
+            client.execute(
+                "INSERT INTO gold_object_checksum (object, kind, checksum) VALUES",
+                [(stmt.target, stmt.kind, stmt.checksum)],
+            )
+    finally:
+        pool.release(client)
+    return time.perf_counter() - start
+
+
+def run_gold_sql(sql, client_factory, max_parallel=None):
+    """Build gold from `sql`; returns per-statement results. Raises on the first failure
+    after letting statements already running finish."""
+    statements = build_gold_graph(sql)
+    max_parallel = max(1, max_parallel or settings.gold_max_parallel)
+    pool = ClickHousePool(client_factory, max_parallel)
+    results = {}
+    started = time.perf_counter()
+    try:
+        client = pool.acquire()
+        try:
+            existing = _existing_objects(client)
+            recorded = _recorded_checksums(client)
+        finally:
+            pool.release(client)
+        actions = {s.index: _plan_action(s, existing, recorded) for s in statements}
+
+        pending = {s.index: set(s.depends_on) for s in statements}
+        by_index = {s.index: s for s in statements}
+        failure = None
+        with ThreadPoolExecutor(max_workers=max_parallel, thread_name_prefix="gold") as executor:
+            running = {}
+            while True:
+                ready = sorted(i for i, deps in pending.items() if not deps) if failure is None else []
+                for index in ready:
+                    del pending[index]
+                    stmt = by_index[index]
+                    action = actions[index]
+                    if action in ("skip", "drift"):
+                        if action == "drift":
+                            LOGGER.warning("%s changed in gold SQL but exists; migrate it manually", stmt.label)
+                        results[index] = {"statement": stmt.label, "status": action, "seconds": 0.0}
+                        for deps in pending.values():
+                            deps.discard(index)
+                    else:
+                        running[executor.submit(_run_statement, pool, stmt, action)] = stmt
+                if ready and not running:
+                    continue  # skips may have freed further statements
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stmt = running.pop(future)
+                    try:
+                        seconds = future.result()
+                    except Exception as exc:
+                        LOGGER.error("Gold %s failed: %s", stmt.label, exc)
+                        results[stmt.index] = {"statement": stmt.label, "status": "failed", "seconds": None}
+                        failure = failure or (stmt, exc)
+                        continue
+                    LOGGER.info("Gold %s %s in %.2fs", stmt.label, actions[stmt.index], seconds)
+                    results[stmt.index] = {
+                        "statement": stmt.label, "status": actions[stmt.index], "seconds": round(seconds, 3),
+                    }
+                    for deps in pending.values():
+                        deps.discard(stmt.index)
+    finally:
+        pool.close()
+
+    ordered = [results[i] for i in sorted(results)]
+    LOGGER.info(
+        "Gold build: %d statements (%d run, %d skipped) in %.2fs with %d workers",
+        len(statements), sum(r["status"] in ("apply", "replace", "record") for r in ordered),
+        sum(r["status"] == "skip" for r in ordered), time.perf_counter() - started, max_parallel,
+    )
+    if failure is not None:
+        stmt, exc = failure
+        not_run = len(statements) - len(results)
+        raise RuntimeError(f"Gold {stmt.label} failed ({not_run} dependent statements not run): {exc}") from exc
+    return ordered
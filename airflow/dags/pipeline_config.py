@@ -0,0 +1,98 @@
+"""Settings and shared clients for the ETL DAGs
+
+Only the dags folder is mounted into the Airflow containers, so the DAGs
+cannot import the repository's config.py; this module is their
+counterpart. Values are read from the environment once per worker
+process. Postgres and ClickHouse native credentials stay in Airflow
+connections (postgres_compliance, clickhouse_default).
+"""
+from dataclasses import dataclass
+import os
+import threading
+
+import redis
+
+
+@dataclass(frozen=True)
+class PipelineSettings:
+    redis_host: str = "redis"
+    redis_port: int = 6379
+    redis_db: int = 0
+    redis_socket_timeout_sec: float = 10.0
+    clickhouse_http_url: str = "http://clickhouse:8123"
+    clickhouse_database: str = "compliance"
+    clickhouse_http_timeout_sec: float = 600.0
+    extract_batch_size: int = 50000
+    gold_batch_size: int = 1000
+    # Old gold versions are unlinked right after the swap; the TTL only
+    # catches versions abandoned by a failed run.
+    gold_key_ttl_sec: int = 24 * 3600
+    # Concurrent gold DDL/INSERT statements (gold_orchestrator.py)
+    gold_max_parallel: int = 4
+    # Logical-replication CDC (cdc.py). Sources listed here are loaded into
+    # bronze by the CDC consumer, and their DAGs skip the polling extract.
+    cdc_sources: tuple = ()
+    cdc_slot: str = "etl_bronze_cdc"
+    cdc_plugin: str = "pgoutput"  # pgoutput | wal2json
+    cdc_batch_rows: int = 5000
+    cdc_flush_interval_sec: float = 5.0
+    # Partitioned backfill (dag_backfill.py)
+    backfill_partitions: int = 8
+    backfill_max_parallel: int = 8
+
+
+def load_settings():
+    return PipelineSettings(
+        redis_host=os.getenv("PIPELINE_REDIS_HOST", "redis"),
+        redis_port=int(os.getenv("PIPELINE_REDIS_PORT", "6379")),
+        redis_db=int(os.getenv("PIPELINE_REDIS_DB", "0")),
+        redis_socket_timeout_sec=float(os.getenv("PIPELINE_REDIS_SOCKET_TIMEOUT_SEC", "10")),
+        clickhouse_http_url=os.getenv("PIPELINE_CLICKHOUSE_HTTP_URL", "http://clickhouse:8123").rstrip("/"),
+        clickhouse_database=os.getenv("PIPELINE_CLICKHOUSE_DATABASE", "compliance"),
+        clickhouse_http_timeout_sec=float(os.getenv("PIPELINE_CLICKHOUSE_HTTP_TIMEOUT_SEC", "600")),
+        extract_batch_size=int(os.getenv("PIPELINE_EXTRACT_BATCH_SIZE", "50000")),
+        gold_batch_size=int(os.getenv("PIPELINE_GOLD_BATCH_SIZE", "1000")),
+        gold_key_ttl_sec=int(os.getenv("PIPELINE_GOLD_KEY_TTL_SEC", str(24 * 3600))),
+        gold_max_parallel=int(os.getenv("PIPELINE_GOLD_MAX_PARALLEL", "4")),
+        cdc_sources=tuple(s.strip() for s in os.getenv("PIPELINE_CDC_SOURCES", "").split(",") if s.strip()),
+        cdc_slot=os.getenv("PIPELINE_CDC_SLOT", "etl_bronze_cdc"),
+        cdc_plugin=os.getenv("PIPELINE_CDC_PLUGIN", "pgoutput"),
+        cdc_batch_rows=int(os.getenv("PIPELINE_CDC_BATCH_ROWS", "5000")),
+        cdc_flush_interval_sec=float(os.getenv("PIPELINE_CDC_FLUSH_INTERVAL_SEC", "5")),
+        backfill_partitions=int(os.getenv("PIPELINE_BACKFILL_PARTITIONS", "8")),
+        backfill_max_parallel=int(os.getenv("PIPELINE_BACKFILL_MAX_PARALLEL", "8")),
+    )
+
+
+settings = load_settings()
+
+_redis = None
+_redis_lock = threading.Lock()
+
+
+def get_redis():
+    """Process-wide Redis client, created on first use."""
+    global _redis
+    if _redis is None:
+        with _redis_lock:
+            if _redis is None:
+                _redis = redis.Redis(
+                    host=settings.redis_host,
+                    port=settings.redis_port,
+                    db=settings.redis_db,
+                    socket_timeout=settings.redis_socket_timeout_sec,
+                    decode_responses=True,
+                )
+    return _redis
+
+
+def run_clickhouse_http(sql):
+    """POST a SQL script to the ClickHouse HTTP interface."""
+    import requests
+
+    return requests.post(
+        f"{settings.clickhouse_http_url}/",
+        params={"database": settings.clickhouse_database},
+        data=sql,
+        timeout=settings.clickhouse_http_timeout_sec,
+    )
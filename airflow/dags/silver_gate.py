@@ -0,0 +1,69 @@
+"""Silver -> gold gate for the ETL DAGs
+
+Runs quality.validators' single-scan ClickHouse probe for a source's silver
+table. Used as a ShortCircuitOperator callable: a failing gate returns
+False, which skips publishing the silver asset. The outcome is also kept in
+the Airflow Variable `silver_gate_status_<source>`; the gold DAG checks it
+before every run (including its hourly fallback) and skips gold refresh,
+Redis materialization and the refresh event while any gate is failing, so
+the serving layer keeps the last good gold data.
+
+Thresholds can be overridden per source with the Airflow Variable
+`silver_gate_thresholds`, e.g. {"calls": {"max_null_rate": 0.05}}.
+"""
+from datetime import datetime, timezone
+import json
+import logging
+
+from airflow.models import Variable
+
+from quality.validators import run_silver_gate
+
+LOGGER = logging.getLogger(__name__)
+
+
+def gate_thresholds(source):
+    raw = Variable.get("silver_gate_thresholds", default_var="{}")
+    try:
+        return json.loads(raw).get(source) or {}
+    except (ValueError, AttributeError):
+        LOGGER.warning("Ignoring invalid silver_gate_thresholds Variable: %r", raw)
+        return {}
+
+
+def check_silver_gate(source, client, ti=None):
+    result = run_silver_gate(source, client, gate_thresholds(source))
+    if ti is not None:
+        ti.xcom_push(key="silver_gate", value={
+            "table": result.table,
+            "passed": result.passed,
+            "metrics": {k: (v if isinstance(v, (int, float)) or v is None else str(v)) for k, v in result.metrics.items()},
+            "failures": result.failures,
+        })
+    if result.passed:
+        LOGGER.info("Silver gate passed for %s: %s", result.table, result.metrics)
+    else:
+        LOGGER.error("Silver gate FAILED for %s; skipping gold refresh: %s", result.table, "; ".join(result.failures))
+    Variable.set(f"silver_gate_status_{source}", json.dumps({
+        "table": result.table,
+        "passed": result.passed,
+        "failures": result.failures,
+        "checked_at": datetime.now(timezone.utc).isoformat(),
+    }))
+    return result.passed
+
+
+def failing_gates(sources):
+    """source -> reason for each source whose last recorded gate did not pass."""
+    failing = {}
+    for source in sources:
+        raw = Variable.get(f"silver_gate_status_{source}", default_var=None)
+        try:
+            status = json.loads(raw) if raw else None
+        except ValueError:
+            status = None
+        if status is None:
+            failing[source] = "no gate result recorded"
+        elif not status.get("passed"):
+            failing[source] = f"failed at {status.get('checked_at')}: {'; '.join(status.get('failures') or [])}"
+    return failing
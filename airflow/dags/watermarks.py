@@ -0,0 +1,114 @@
+"""Extract watermarks: a keyset cursor per source in Postgres
+
+Each source's position is the (updated_at, pk) of the last row loaded to
+bronze. Extracts read strictly after that pair in (updated_at, pk) order,
+so rows sharing a timestamp are never skipped and a batch LIMIT can split
+a timestamp group safely. The cursor lives in the etl_watermark table of
+the source database and is advanced with a compare-and-set after each
+loaded batch, so a retried or overlapping run cannot move it backwards.
+
+updated_at is kept as the text the extract produced; Postgres casts it
+back to the source column's own type when it is used as a bound.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timezone
+import logging
+from typing import Optional
+
+from airflow.models import Variable
+
+LOGGER = logging.getLogger(__name__)
+
+EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+WATERMARK_DDL = """
+CREATE TABLE IF NOT EXISTS etl_watermark (
+    source TEXT PRIMARY KEY,
+    updated_at TEXT NOT NULL,
+    pk TEXT,
+    rows_loaded BIGINT NOT NULL DEFAULT 0,
+    batches BIGINT NOT NULL DEFAULT 0,
+    advanced_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+)
+"""
+
+
+@dataclass(frozen=True)
+class KeysetCursor:
+    updated_at: str
+    # None only before the first keyset batch (fresh or migrated source)
+    pk: Optional[str] = None
+
+    def to_dict(self):
+        return {"updated_at": self.updated_at, "pk": self.pk}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(updated_at=data["updated_at"], pk=data.get("pk"))
+
+
+def _legacy_watermark(source):
+    """Watermark from the old watermark_<source> Airflow Variable, if any."""
+    raw = Variable.get(f"watermark_{source}", default_var=None)
+    if not raw:
+        return EPOCH_UTC.isoformat()
+    try:
+        value = datetime.fromisoformat(raw.replace("Z", "+00:00"))
+    except ValueError:
+        return EPOCH_UTC.isoformat()
+    return value.isoformat()
+
+
+def get_cursor(connection, source):
+    with connection.cursor() as cursor:
+        cursor.execute(WATERMARK_DDL)
+        cursor.execute("SELECT updated_at, pk FROM etl_watermark WHERE source = %s", (source,))
+        row = cursor.fetchone()
+    connection.commit()
+    if row:
+        return KeysetCursor(updated_at=row[0], pk=row[1])
+    # First run on the table: carry on from the Variable watermark, if any.
+    return KeysetCursor(updated_at=_legacy_watermark(source))
+
+
+def keyset_query(table, pk_column, position, batch_size, upper=None):
+    """SELECT for the next batch after `position` (and up to `upper`, inclusive), plus its parameters."""
+    if position.pk is None:
+        conditions, params = ["updated_at > %s"], [position.updated_at]
+    else:
+        conditions, params = [f"(updated_at, {pk_column}) > (%s, %s)"], [position.updated_at, position.pk]
+    if upper is not None:
+        conditions.append(f"(updated_at, {pk_column}) <= (%s, %s)")
+        params += [upper.updated_at, upper.pk]
+    query = (f"SELECT * FROM {table} WHERE {' AND '.join(conditions)} "
+             f"ORDER BY updated_at ASC, {pk_column} ASC LIMIT {int(batch_size)}")
+    return query, tuple(params)
+
+
+def advance_cursor(connection, source, previous, new, rows_loaded):
+    """Move the cursor from `previous` to `new` in one statement; fails if it moved meanwhile."""
+    with connection.cursor() as cursor:
+        cursor.execute(WATERMARK_DDL)
+        cursor.execute(
+            """
+            INSERT INTO etl_watermark (source, updated_at, pk, rows_loaded, batches, advanced_at)
+            VALUES (%s, %s, %s, %s, 1, NOW())
+            ON CONFLICT (source) DO UPDATE SET
+                updated_at  = EXCLUDED.updated_at,
+                pk          = EXCLUDED.pk,
+                rows_loaded = etl_watermark.rows_loaded + EXCLUDED.rows_loaded,
+                batches     = etl_watermark.batches + 1,
+                advanced_at = EXCLUDED.advanced_at
+            WHERE etl_watermark.updated_at = %s
+              AND etl_watermark.pk IS NOT DISTINCT FROM %s
+            """,
+            (source, new.updated_at, new.pk, rows_loaded, previous.updated_at, previous.pk),
+        )
+        advanced = cursor.rowcount == 1
+    if not advanced:
+        connection.rollback()
+        raise RuntimeError(
+            f"Watermark for {source} moved since it was read (expected {previous}); not advancing to {new}"
+        )
+    connection.commit()
+    LOGGER.info("Watermark for %s advanced to %s (+%d rows)", source, new, rows_loaded)
@@ -1,36 +1,265 @@
-from starlette.middleware.base import BaseHTTPMiddleware
-from fastapi import Request
-from datetime import datetime
+from datetime import datetime, timezone
+import json
+import logging
+from logging.handlers import RotatingFileHandler
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
 
+from config import (
+    AUDIT_BATCH_SIZE,
+    AUDIT_FLUSH_INTERVAL_SEC,
+    AUDIT_LOG_BACKUPS,
+    AUDIT_LOG_MAX_BYTES,
+    AUDIT_LOG_PATH,
+    AUDIT_QUEUE_SIZE,
+    AUDIT_SINK,
+)
+from .cache import request_cache_info
+from .auth import token_cache
+from .routers._common import get_clickhouse_client
 
-class AuditLogMiddleware(BaseHTTPMiddleware):
+LOGGER = logging.getLogger(__name__)
 
-    # ⭐ REQUIRED
-    def __init__(self, app):
+AUDIT_COLUMNS = [
+    "ts",
+    "method",
+    "path",
+    "status",
+    "duration_ms",
+    "role",
+    "user_id",
+    "cache_hit",
+]
 
-        super().__init__(app)
 
+# ===========================================================
+# SINKS
+# ===========================================================
 
-    async def dispatch(
+class FileAuditSink:
 
-        self,
-        request: Request,
-        call_next
+    def __init__(self, path: str = AUDIT_LOG_PATH):
 
-    ):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
 
-        start = datetime.utcnow()
+        self.handler = RotatingFileHandler(
+            path,
+            maxBytes=AUDIT_LOG_MAX_BYTES,
+            backupCount=AUDIT_LOG_BACKUPS,
+            encoding="utf-8",
+        )
+
+    def write(self, records: List[Dict[str, Any]]) -> None:
+
+        lines = "\n".join(json.dumps(rec, separators=(",", ":"), default=str) for rec in records)
+
+        # One emit per batch; the handler rolls over between batches.
+        self.handler.emit(logging.makeLogRecord({"msg": lines, "levelno": logging.INFO}))
+
+    def close(self) -> None:
+        self.handler.close()
+
+
+class ClickHouseAuditSink:
 
-        response = await call_next(request)
+    TABLE = "api_audit_log"
 
-        duration = (
-            datetime.utcnow() - start
-        ).total_seconds()
+    def __init__(self):
+        self.client = None
 
-        print(
-            f"[AUDIT] {request.method} {request.url.path}"
-            f" status={response.status_code}"
-            f" duration={duration:.3f}s"
+    def _ensure_table(self) -> None:
+
+        self.client.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {self.TABLE}
+            (
+                ts DateTime64(3, 'UTC'),
+                method LowCardinality(String),
+                path String,
+                status UInt16,
+                duration_ms Float64,
+                role LowCardinality(String),
+                user_id String,
+                cache_hit Nullable(UInt8)
+            )
+            ENGINE = MergeTree()
+            PARTITION BY toYYYYMM(ts)
+            ORDER BY (ts, path)
+            """
+        )
+
+    def write(self, records: List[Dict[str, Any]]) -> None:
+
+        if self.client is None:
+            self.client = get_clickhouse_client()
+            self._ensure_table()
+
+        self.client.execute(
+            f"INSERT INTO {self.TABLE} ({', '.join(AUDIT_COLUMNS)}) VALUES",
+            [tuple(rec.get(c) for c in AUDIT_COLUMNS) for rec in records],
         )
 
-        return response
\ No newline at end of file
+    def close(self) -> None:
+        if self.client is not None:
+            self.client.disconnect()
+
+
+def _build_sink(kind: str = AUDIT_SINK):
+    if kind == "clickhouse":
+        return ClickHouseAuditSink()
+    return FileAuditSink()
+
+
+# ===========================================================
+# BACKGROUND WRITER
+# ===========================================================
+
+class AuditWriter:
+    """Bounded queue drained in batches by a daemon thread.
+
+    `submit` never blocks: when the queue is full the record is dropped and
+    counted, so a slow sink cannot back-pressure request handling.
+    """
+
+    def __init__(self, sink=None, maxsize: int = AUDIT_QUEUE_SIZE):
+        self.sink = sink
+        self.queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def start(self) -> None:
+
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            if self.sink is None:
+                self.sink = _build_sink()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, record: Dict[str, Any]) -> None:
+
+        if self._thread is None:
+            self.start()
+
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _drain(self, first: Dict[str, Any]) -> List[Dict[str, Any]]:
+
+        batch = [first]
+        while len(batch) < AUDIT_BATCH_SIZE:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch: List[Dict[str, Any]]) -> None:
+        try:
+            self.sink.write(batch)
+        except Exception:
+            LOGGER.exception("Audit sink write failed; dropped %d records", len(batch))
+
+    def _run(self) -> None:
+
+        while not self._stop.is_set():
+            try:
+                first = self.queue.get(timeout=AUDIT_FLUSH_INTERVAL_SEC)
+            except queue.Empty:
+                continue
+            self._flush(self._drain(first))
+
+        # Final drain on shutdown
+        while True:
+            try:
+                first = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            self._flush(self._drain(first))
+
+    def stop(self, timeout: float = 5.0) -> None:
+
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self.sink is not None:
+            self.sink.close()
+
+
+audit_writer = AuditWriter()
+
+
+# ===========================================================
+# ASGI MIDDLEWARE
+# ===========================================================
+
+def _claims_from_headers(headers) -> Dict[str, Any]:
+    """Claims of the request's bearer token if the route already verified it.
+
+    Only the verified-token cache is consulted: a forged token records no
+    identity, and the middleware never runs a signature check on the event
+    loop (bad tokens would otherwise cost one verify here on every request).
+    """
+
+    for name, value in headers:
+        if name == b"authorization":
+            auth = value.decode("latin-1")
+            if auth.startswith("Bearer "):
+                return token_cache.get(auth[7:].strip()) or {}
+            break
+    return {}
+
+
+class AuditLogMiddleware:
+
+    def __init__(self, app, writer: Optional[AuditWriter] = None):
+
+        self.app = app
+        self.writer = writer or audit_writer
+
+    async def __call__(self, scope, receive, send):
+
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+        cache_info: Dict[str, Any] = {}
+        token = request_cache_info.set(cache_info)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_cache_info.reset(token)
+            claims = _claims_from_headers(scope.get("headers") or [])
+            cache_hit = cache_info.get("cache_hit")
+
+            self.writer.submit({
+                "ts": datetime.now(timezone.utc),
+                "method": scope.get("method", ""),
+                "path": scope.get("path", ""),
+                "status": status_code,
+                "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+                "role": str(claims.get("role", "")),
+                "user_id": str(claims.get("sub", claims.get("user_id", ""))),
+                "cache_hit": None if cache_hit is None else int(cache_hit),
+            })
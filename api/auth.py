@@ -0,0 +1,230 @@
+"""JWT verification with a bounded LRU of verified claims.
+
+Signature checks (HMAC or RSA) run once per distinct token; later requests
+carrying the same token are served from the cache until the token's `exp`
+(or JWT_CACHE_MAX_TTL_SEC, whichever comes first).
+"""
+from base64 import urlsafe_b64decode
+from collections import OrderedDict
+import hashlib
+import hmac
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import Header, HTTPException
+
+from config import (
+    JWT_ALGORITHMS,
+    JWT_CACHE_MAX_TTL_SEC,
+    JWT_CACHE_SIZE,
+    JWT_LEEWAY_SEC,
+    JWT_PUBLIC_KEY_PATH,
+    JWT_SECRET,
+)
+
+_HMAC_DIGESTS = {
+    "HS256": hashlib.sha256,
+    "HS384": hashlib.sha384,
+    "HS512": hashlib.sha512,
+}
+
+_RSA_DIGESTS = {
+    "RS256": "SHA256",
+    "RS384": "SHA384",
+    "RS512": "SHA512",
+}
+
+
+def _b64decode(segment: str) -> bytes:
+    padding = "=" * ((4 - len(segment) % 4) % 4)
+    return urlsafe_b64decode(segment + padding)
+
+
+# ===========================================================
+# SIGNATURE VERIFICATION
+# ===========================================================
+
+_public_key = None
+
+
+def _load_public_key():
+    """RSA public key, loaded on first use (needs the optional `cryptography` package)."""
+    global _public_key
+    if _public_key is None:
+        if not JWT_PUBLIC_KEY_PATH:
+            raise HTTPException(status_code=401, detail="RSA tokens are not accepted")
+        from cryptography.hazmat.primitives.serialization import load_pem_public_key
+
+        with open(JWT_PUBLIC_KEY_PATH, "rb") as f:
+            _public_key = load_pem_public_key(f.read())
+    return _public_key
+
+
+def _verify_signature(alg: str, signing_input: bytes, signature: bytes) -> bool:
+
+    if alg in _HMAC_DIGESTS:
+        if not JWT_SECRET:
+            return False
+        expected = hmac.new(JWT_SECRET.encode("utf-8"), signing_input, _HMAC_DIGESTS[alg]).digest()
+        return hmac.compare_digest(expected, signature)
+
+    if alg in _RSA_DIGESTS:
+        from cryptography.exceptions import InvalidSignature
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.asymmetric import padding
+
+        try:
+            _load_public_key().verify(
+                signature,
+                signing_input,
+                padding.PKCS1v15(),
+                getattr(hashes, _RSA_DIGESTS[alg])(),
+            )
+        except InvalidSignature:
+            return False
+        return True
+
+    return False
+
+
+def _time_claim(claims: Dict[str, Any], name: str) -> Optional[float]:
+    """NumericDate claim (RFC 7519) as float; 401 when present but not a number."""
+
+    value = claims.get(name)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise HTTPException(status_code=401, detail="Invalid JWT claims")
+    return float(value)
+
+
+def verify_token(token: str) -> Dict[str, Any]:
+    """Fully verify a compact JWS token and return its claims."""
+
+    parts = token.split(".")
+    if len(parts) != 3:
+        raise HTTPException(status_code=401, detail="Invalid JWT")
+
+    try:
+        header = json.loads(_b64decode(parts[0]))
+        claims = json.loads(_b64decode(parts[1]))
+        signature = _b64decode(parts[2])
+    except Exception:
+        raise HTTPException(status_code=401, detail="Invalid JWT payload")
+
+    if not isinstance(header, dict) or not isinstance(claims, dict):
+        raise HTTPException(status_code=401, detail="Invalid JWT payload")
+
+    alg = str(header.get("alg", ""))
+    if alg not in JWT_ALGORITHMS:
+        raise HTTPException(status_code=401, detail="Unsupported JWT algorithm")
+
+    if not _verify_signature(alg, f"{parts[0]}.{parts[1]}".encode("ascii"), signature):
+        raise HTTPException(status_code=401, detail="Invalid JWT signature")
+
+    now = time.time()
+    exp = _time_claim(claims, "exp")
+    if exp is not None and exp + JWT_LEEWAY_SEC < now:
+        raise HTTPException(status_code=401, detail="Token expired")
+    nbf = _time_claim(claims, "nbf")
+    if nbf is not None and nbf - JWT_LEEWAY_SEC > now:
+        raise HTTPException(status_code=401, detail="Token not yet valid")
+
+    return claims
+
+
+# ===========================================================
+# VERIFIED-TOKEN LRU
+# ===========================================================
+
+class VerifiedTokenCache:
+
+    def __init__(self, maxsize: int = JWT_CACHE_SIZE, max_ttl: float = JWT_CACHE_MAX_TTL_SEC):
+        self.maxsize = maxsize
+        self.max_ttl = max_ttl
+        self._entries: "OrderedDict[bytes, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, claims = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return claims
+
+    def put(self, token: str, claims: Dict[str, Any]) -> None:
+        expires_at = time.time() + self.max_ttl
+        exp = _time_claim(claims, "exp")
+        if exp is not None:
+            expires_at = min(expires_at, exp + JWT_LEEWAY_SEC)
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (expires_at, claims)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = VerifiedTokenCache()
+
+
+def claims_for_token(token: str) -> Dict[str, Any]:
+    claims = token_cache.get(token)
+    if claims is None:
+        claims = verify_token(token)
+        token_cache.put(token, claims)
+    return claims
+
+
+# ===========================================================
+# FASTAPI DEPENDENCIES
+# ===========================================================
+
+def bearer_token(authorization: Optional[str]) -> str:
+
+    if not authorization:
+        raise HTTPException(status_code=401, detail="Missing Authorization header")
+
+    if not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Invalid Authorization scheme")
+
+    token = authorization.split(" ", 1)[1].strip()
+
+    if not token:
+        raise HTTPException(status_code=401, detail="Missing token")
+
+    return token
+
+
+def get_claims(authorization: Optional[str] = Header(None)) -> Dict[str, Any]:
+    return claims_for_token(bearer_token(authorization))
+
+
+def require_role(*roles: str) -> Callable[..., Dict[str, Any]]:
+    """Dependency factory: verified claims whose `role` is one of `roles`."""
+
+    allowed = {role.lower() for role in roles}
+
+    def _dependency(authorization: Optional[str] = Header(None)) -> Dict[str, Any]:
+        claims = get_claims(authorization)
+        if str(claims.get("role", "")).lower() not in allowed:
+            raise HTTPException(status_code=403, detail="Forbidden for role")
+        return claims
+
+    return _dependency
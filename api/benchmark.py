@@ -0,0 +1,291 @@
+"""Serialization benchmark for the agent assigned-loans payload.
+
+Compares the per-request work of three ways to turn the cached page dict
+into response bytes:
+
+  response_model   FastAPI with response_model=AssignedLoansPage: validate,
+                   jsonable_encoder, stdlib JSONResponse (the old default
+                   plus a typed model)
+  encoder          no response_model: jsonable_encoder + stdlib JSONResponse
+  json_response    what the endpoint does now: one `dumps` call (orjson
+                   when installed), no validation or encoder pass
+
+and reports gzip/brotli size and cost for the rendered body.
+
+It then drives GET /dashboard/agent/assigned-loans end to end through
+TestClient, with an in-memory Redis and a canned ClickHouse client
+standing in for the real ones and auth/rate limiting switched off, and
+reports requests/sec for the stdlib-json baseline against orjson and
+compression, alone and together. Timings are for a warm page cache
+(every request after the first is a Redis hit), and the response is read
+raw, so client-side decompression is not counted. Over loopback
+compression only adds CPU; its gain is the bytes column on a real link.
+
+    python -m api.benchmark --rows 1000 --iterations 200 --requests 200
+"""
+import argparse
+from contextlib import ExitStack
+from datetime import datetime, timedelta
+import gzip
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from unittest import mock
+
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+from starlette.responses import JSONResponse
+
+from api import cache, clients, metrics
+from api.compression import CompressionMiddleware, brotli
+from api.conditional import ConditionalJSONResponse
+from api.metrics import MetricsMiddleware, dumps, orjson
+from api.routers import agent
+from api.routers.schema import AssignedLoansPage
+
+STATUSES = ["PTP", "NO_ANSWER", "CALLBACK", "REFUSED", "PAID"]
+BUCKETS = ["0-30", "31-60", "61-90", "90+", "NPA"]
+
+
+def sample_page(rows: int, seed: int = 7) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    loans = [
+        {
+            "loan_id": f"L{i:08d}",
+            "borrower_name": f"Borrower {rng.randint(1, 50000)}",
+            "dpd_days": rng.randint(0, 400),
+            "overdue_amount": round(rng.uniform(100, 250000), 2),
+            "loan_aging_bucket": rng.choice(BUCKETS),
+            "last_call_at": (now - timedelta(minutes=rng.randint(0, 10000))).isoformat(),
+            "last_call_status": rng.choice(STATUSES),
+            "last_call_duration": rng.randint(0, 900),
+            "followup_due": rng.random() < 0.3,
+            "calls_today": rng.randint(0, 6),
+        }
+        for i in range(rows)
+    ]
+    return {
+        "loans": loans,
+        "next_cursor": "WzEyLCJMMDAwMDAwOTkiXQ",
+        "limit": rows,
+        "total": rows * 3,
+        "followups_due": sum(l["followup_due"] for l in loans),
+        "cache_hit": True,
+        "generated_at": now.isoformat(),
+    }
+
+
+def _response_model(payload: Dict[str, Any]) -> bytes:
+    model = AssignedLoansPage(**payload)
+    return JSONResponse(jsonable_encoder(model)).body
+
+
+def _encoder(payload: Dict[str, Any]) -> bytes:
+    return JSONResponse(jsonable_encoder(payload)).body
+
+
+def _json_response(payload: Dict[str, Any]) -> bytes:
+    return dumps(payload)
+
+
+PATHS: Dict[str, Callable[[Dict[str, Any]], bytes]] = {
+    "response_model": _response_model,
+    "encoder": _encoder,
+    "json_response": _json_response,
+}
+
+
+def _time(fn: Callable[[], Any], iterations: int) -> float:
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations
+
+
+def run(rows: int, iterations: int) -> List[str]:
+
+    payload = sample_page(rows)
+    lines = [
+        f"agent assigned-loans page: {rows} rows, {iterations} iterations, "
+        f"orjson={'yes' if orjson is not None else 'no'}",
+        "",
+        f"{'path':<16} {'ms/req':>9} {'req/s':>10} {'speedup':>8} {'bytes':>10}",
+    ]
+
+    baseline: Optional[float] = None
+    for name, fn in PATHS.items():
+        seconds = _time(lambda: fn(payload), iterations)
+        baseline = baseline or seconds
+        lines.append(
+            f"{name:<16} {seconds * 1000:>9.3f} {1 / seconds:>10.1f} {baseline / seconds:>7.2f}x {len(fn(payload)):>10}"
+        )
+
+    body = dumps(payload)
+    codecs = {"gzip-6": lambda: gzip.compress(body, compresslevel=6)}
+    if brotli is not None:
+        codecs["br-5"] = lambda: brotli.compress(body, quality=5)
+
+    lines += ["", f"{'encoding':<16} {'ms/req':>9} {'bytes':>10} {'ratio':>8}"]
+    for name, fn in codecs.items():
+        seconds = _time(fn, max(1, iterations // 4))
+        size = len(fn())
+        lines.append(f"{name:<16} {seconds * 1000:>9.3f} {size:>10} {len(body) / size:>7.1f}x")
+
+    return lines
+
+
+# ===========================================================
+# ENDPOINT THROUGHPUT
+# ===========================================================
+
+ENDPOINT = "/dashboard/agent/assigned-loans"
+
+# name -> (render with orjson, compress responses)
+ENDPOINT_VARIANTS: Dict[str, Tuple[bool, bool]] = {
+    "before": (False, False),
+    "orjson": (True, False),
+    "compression": (False, True),
+    "after": (True, True),
+}
+
+
+class _MemoryPipeline:
+
+    def __init__(self, redis: "_MemoryRedis"):
+        self._redis = redis
+        self._ops: List[Callable[[], Any]] = []
+
+    def get(self, key):
+        self._ops.append(lambda: self._redis.get(key))
+
+    def ttl(self, key):
+        self._ops.append(lambda: self._redis.ttl(key))
+
+    def zincrby(self, name, amount, value):
+        self._ops.append(lambda: amount)
+
+    def setex(self, key, ttl, value):
+        self._ops.append(lambda: self._redis.setex(key, ttl, value))
+
+    def execute(self):
+        return [op() for op in self._ops]
+
+
+class _MemoryRedis:
+    """Just enough of redis.Redis for the page cache."""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[bytes, int]] = {}
+
+    def get(self, key):
+        entry = self._data.get(key)
+        return entry[0] if entry else None
+
+    def ttl(self, key):
+        entry = self._data.get(key)
+        return entry[1] if entry else -2
+
+    def setex(self, key, ttl, value):
+        self._data[key] = (value if isinstance(value, bytes) else str(value).encode("utf-8"), int(ttl))
+        return True
+
+    def pipeline(self, transaction=True):
+        return _MemoryPipeline(self)
+
+
+class _CannedClickHouse:
+    """Answers the endpoint's totals and page queries from a sample page."""
+
+    def __init__(self, page: Dict[str, Any]):
+        self._page = page
+
+    def execute(self, query, params=None, **kwargs):
+        loans = self._page["loans"]
+        if "count()" in query:
+            return [(self._page["total"], self._page["followups_due"])]
+        columns = agent.CURSOR_FIELDS + [f for f in agent.LOAN_FIELDS if f not in agent.CURSOR_FIELDS]
+        limit = (params or {}).get("limit", len(loans))
+        return [tuple(loan[c] for c in columns) for loan in loans[:limit]]
+
+
+def _endpoint_app(compress: bool) -> FastAPI:
+    # Same response class and middleware order as api.main, minus audit logging.
+    app = FastAPI(default_response_class=ConditionalJSONResponse)
+    if compress:
+        app.add_middleware(CompressionMiddleware)
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(agent.router, prefix="/dashboard")
+    for dependency in agent.router.dependencies:
+        app.dependency_overrides[dependency.dependency] = lambda: None
+    return app
+
+
+def _time_endpoint(compress: bool, use_orjson: bool, rows: int, requests: int) -> Tuple[float, int, str]:
+
+    params = {"agent_id": "A0001", "limit": rows}
+    headers = {"Accept-Encoding": "br, gzip" if compress else "identity"}
+    redis = _MemoryRedis()
+    ch = _CannedClickHouse(sample_page(rows))
+
+    with ExitStack() as stack:
+        stack.enter_context(mock.patch.object(agent, "get_redis", lambda: redis))
+        stack.enter_context(mock.patch.object(cache, "get_redis", lambda: redis))
+        stack.enter_context(mock.patch.object(clients, "get_clickhouse_client", lambda: ch))
+        if not use_orjson:
+            stack.enter_context(mock.patch.object(metrics, "orjson", None))
+        client = stack.enter_context(TestClient(_endpoint_app(compress)))
+
+        def _get() -> Tuple[int, str]:
+            with client.stream("GET", ENDPOINT, params=params, headers=headers) as response:
+                response.raise_for_status()
+                size = sum(len(chunk) for chunk in response.iter_raw())
+                return size, response.headers.get("content-encoding", "identity")
+
+        size, encoding = _get()  # warm-up: fills the page cache
+        start = time.perf_counter()
+        for _ in range(requests):
+            _get()
+        return (time.perf_counter() - start) / requests, size, encoding
+
+
+def run_endpoint(rows: int, requests: int) -> List[str]:
+
+    lines = [
+        f"GET {ENDPOINT}: {rows} rows, {requests} requests, warm cache, "
+        f"orjson={'yes' if orjson is not None else 'no'}",
+        "",
+        f"{'variant':<16} {'ms/req':>9} {'req/s':>10} {'speedup':>8} {'bytes':>10} {'encoding':>9}",
+    ]
+
+    baseline: Optional[float] = None
+    for name, (use_orjson, compress) in ENDPOINT_VARIANTS.items():
+        seconds, size, encoding = _time_endpoint(compress, use_orjson, rows, requests)
+        baseline = baseline or seconds
+        lines.append(
+            f"{name:<16} {seconds * 1000:>9.3f} {1 / seconds:>10.1f} {baseline / seconds:>7.2f}x {size:>10} {encoding:>9}"
+        )
+
+    return lines
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+
+    parser = argparse.ArgumentParser(description="Benchmark agent payload serialization and the assigned-loans endpoint.")
+    parser.add_argument("--rows", type=int, default=1000, help="loans per page (max page size is 1000)")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=200, help="timed requests per endpoint variant (0 to skip)")
+    args = parser.parse_args(argv)
+
+    lines = run(args.rows, args.iterations)
+    if args.requests > 0:
+        lines += [""] + run_endpoint(args.rows, args.requests)
+    print("\n".join(lines))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
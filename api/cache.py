@@ -1,12 +1,50 @@
+import hashlib
 import json
-from typing import Any, Callable, Dict
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 from urllib.parse import quote_plus
 
 import redis
 
-from config import REDIS_URL
+from config import CACHE_WARM_TOP_N
 
-r = redis.Redis.from_url(REDIS_URL)
+from .clients import get_redis, new_redis_subscriber
+from .metrics import CACHE_DURATION, timed
+
+LOGGER = logging.getLogger(__name__)
+
+# Published by the ETL DAGs once gold tables have been rebuilt.
+GOLD_REFRESH_CHANNEL = "gold:refreshed"
+LISTENER_BACKOFF_MIN_SEC = 1.0
+LISTENER_BACKOFF_MAX_SEC = 60.0
+
+# Sorted set of cache_key -> request count, used to pick keys to re-warm.
+HITS_KEY = "cache:hits"
+HITS_MAX_KEYS = 1000
+
+# Gold table -> cache key prefixes (role:endpoint) whose payloads read from it.
+GOLD_TABLE_PREFIXES: Dict[str, List[str]] = {
+    "lender_portfolio_summary": ["lender:portfolio_summary"],
+    "agent_assigned_loans": ["agent:assigned_loans", "agent:assigned_loans_totals"],
+    "manager_branch_summary": ["manager:branch_summary"],
+    "hr_agent_performance_daily": ["hr:performance"],
+}
+
+# Called with the refreshed table list after invalidation and re-warming.
+_refresh_callbacks: List[Callable[[List[str]], Any]] = []
+
+# Most recently used fetchers, so hot keys can be recomputed after a refresh.
+_FETCHERS_MAX = 1024
+_fetchers: "OrderedDict[str, Tuple[int, Callable[[], Dict[str, Any]]]]" = OrderedDict()
+_fetchers_lock = threading.Lock()
+
+# Per-request scratch dict set by the audit middleware; the dict itself is
+# shared with the threadpool copy of the context, so writes are visible.
+request_cache_info: ContextVar[Optional[Dict[str, Any]]] = ContextVar("request_cache_info", default=None)
 
 
 def _encode_filter_value(value: Any) -> str:
@@ -17,17 +55,120 @@ def _encode_filter_value(value: Any) -> str:
     return quote_plus(encoded)
 
 
+def _remember_fetcher(cache_key: str, ttl: int, fetch_fn: Callable[[], Dict[str, Any]]) -> None:
+    with _fetchers_lock:
+        _fetchers[cache_key] = (ttl, fetch_fn)
+        _fetchers.move_to_end(cache_key)
+        while len(_fetchers) > _FETCHERS_MAX:
+            _fetchers.popitem(last=False)
+
+
+def _store(cache_key: str, ttl: int, result: Dict[str, Any]) -> bytes:
+    raw = json.dumps(result, separators=(",", ":"), default=str).encode("utf-8")
+    get_redis().setex(cache_key, ttl, raw)
+    return raw
+
+
+def _note_validator(raw: bytes, ttl_left: int, payload: Dict[str, Any]) -> None:
+    """Record a cache entry's digest, remaining TTL and generated_at for HTTP validators.
+
+    The digest is taken over the stored bytes, so it stays the same for the
+    life of the entry and changes whenever the entry is rebuilt (TTL expiry
+    or a gold refresh re-warm). See api/conditional.py.
+    """
+    info = request_cache_info.get()
+    if info is None:
+        return
+    info.setdefault("versions", []).append(hashlib.sha1(raw).hexdigest()[:16])
+    info["max_age"] = min(info.get("max_age", ttl_left), ttl_left)
+    generated_at = payload.get("generated_at")
+    if generated_at:
+        info["generated_at"] = max(info.get("generated_at", ""), str(generated_at))
+
+
+def _key_endpoint(cache_key: str) -> str:
+    return ":".join(cache_key.split(":", 2)[:2])
+
+
 def get_or_fetch(cache_key: str, ttl: int, fetch_fn: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
-    val = r.get(cache_key)
-    if val:
-        parsed = json.loads(val)
-        if isinstance(parsed, dict):
+    _remember_fetcher(cache_key, ttl, fetch_fn)
+
+    endpoint = _key_endpoint(cache_key)
+    with timed(CACHE_DURATION, f"cache.{endpoint}", endpoint=endpoint, result="miss") as labels:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.get(cache_key)
+        pipe.ttl(cache_key)
+        pipe.zincrby(HITS_KEY, 1, cache_key)
+        val, ttl_left, _ = pipe.execute()
+
+        info = request_cache_info.get()
+        if info is not None:
+            info.setdefault("cache_hit", bool(val))
+
+        if val:
+            labels["result"] = "hit"
+            parsed = json.loads(val)
+            if not isinstance(parsed, dict):
+                parsed = {"data": parsed}
+            _note_validator(val, max(0, ttl_left or 0), parsed)
             return parsed
-        return {"data": parsed}
 
-    result = fetch_fn()
-    r.setex(cache_key, ttl, json.dumps(result, separators=(",", ":"), default=str))
-    return result
+        result = fetch_fn()
+        _note_validator(_store(cache_key, ttl, result), ttl, result)
+        return result
+
+
+def get_or_fetch_many(
+    cache_keys: Dict[str, str],
+    ttl: int,
+    fetch_many_fn: Callable[[List[str]], Dict[str, Dict[str, Any]]],
+) -> Dict[str, Dict[str, Any]]:
+    """Batch get_or_fetch: one MGET for all ids, one fetch for the misses.
+
+    `cache_keys` maps id -> cache key; `fetch_many_fn` receives the missing
+    ids and returns id -> payload. Misses are written back in one pipeline.
+    """
+    if not cache_keys:
+        return {}
+
+    ids = list(cache_keys)
+    keys = [cache_keys[i] for i in ids]
+    for entity_id, key in zip(ids, keys):
+        _remember_fetcher(key, ttl, lambda entity_id=entity_id: fetch_many_fn([entity_id])[entity_id])
+
+    endpoint = _key_endpoint(keys[0])
+    with timed(CACHE_DURATION, f"cache.{endpoint}.batch", endpoint=endpoint, result="miss") as labels:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.mget(keys)
+        for key in keys:
+            pipe.zincrby(HITS_KEY, 1, key)
+        values = pipe.execute()[0]
+
+        results: Dict[str, Dict[str, Any]] = {}
+        missing: List[str] = []
+        for entity_id, val in zip(ids, values):
+            if val:
+                parsed = json.loads(val)
+                results[entity_id] = parsed if isinstance(parsed, dict) else {"data": parsed}
+            else:
+                missing.append(entity_id)
+
+        info = request_cache_info.get()
+        if info is not None:
+            info.setdefault("cache_hit", not missing)
+
+        if not missing:
+            labels["result"] = "hit"
+            return results
+
+        fetched = fetch_many_fn(missing)
+        pipe = get_redis().pipeline(transaction=False)
+        for entity_id in missing:
+            payload = fetched[entity_id]
+            results[entity_id] = payload
+            pipe.setex(cache_keys[entity_id], ttl, json.dumps(payload, separators=(",", ":"), default=str))
+        pipe.execute()
+        return results
 
 
 def build_cache_key(role: str, endpoint: str, **filters: Any) -> str:
@@ -39,7 +180,155 @@ def build_cache_key(role: str, endpoint: str, **filters: Any) -> str:
 
 def invalidate(pattern: str) -> int:
     count = 0
+    r = get_redis()
     for key in r.scan_iter(pattern):
         r.delete(key)
         count += 1
     return count
+
+
+# ===========================================================
+# GOLD SERVING KEYS (written by airflow/dags/gold_materializer.py)
+# ===========================================================
+
+def _decode(value: Any) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else str(value)
+
+
+def read_gold_entity(table: str, *entity: Any) -> Dict[str, str]:
+    """Return the materialized hash for one gold entity, or {} when absent."""
+    try:
+        r = get_redis()
+        version = r.get(f"gold:{table}:version")
+        if not version:
+            return {}
+        key = ":".join([f"gold:{table}", _decode(version)] + [str(v) for v in entity])
+        raw = r.hgetall(key)
+    except redis.RedisError:
+        LOGGER.exception("Gold key read failed for table=%s entity=%s", table, entity)
+        return {}
+    return {_decode(k): _decode(v) for k, v in raw.items()}
+
+
+def read_gold_rows(table: str, *entity: Any) -> List[Dict[str, Any]]:
+    """Return the JSON rows stored per field of a gold entity hash."""
+    return [json.loads(v) for v in read_gold_entity(table, *entity).values()]
+
+
+# ===========================================================
+# GOLD REFRESH: INVALIDATE + RE-WARM
+# ===========================================================
+
+def prefixes_for_tables(tables: Iterable[str]) -> List[str]:
+    prefixes: List[str] = []
+    for table in tables:
+        for prefix in GOLD_TABLE_PREFIXES.get(table, []):
+            if prefix not in prefixes:
+                prefixes.append(prefix)
+    return prefixes
+
+
+def invalidate_gold_tables(tables: Iterable[str]) -> int:
+    count = 0
+    for prefix in prefixes_for_tables(tables):
+        count += invalidate(f"{prefix}:*")
+    return count
+
+
+def top_keys(prefixes: Iterable[str], top_n: int) -> List[str]:
+    prefixes = tuple(f"{p}:" for p in prefixes)
+    if not prefixes or top_n <= 0:
+        return []
+
+    keys: List[str] = []
+    for raw in get_redis().zrevrange(HITS_KEY, 0, HITS_MAX_KEYS - 1):
+        key = _decode(raw)
+        if key.startswith(prefixes):
+            keys.append(key)
+            if len(keys) >= top_n:
+                break
+    return keys
+
+
+def warm_keys(keys: Iterable[str]) -> int:
+    warmed = 0
+    for key in keys:
+        with _fetchers_lock:
+            entry = _fetchers.get(key)
+        if entry is None:
+            continue
+        ttl, fetch_fn = entry
+        try:
+            _store(key, ttl, fetch_fn())
+            warmed += 1
+        except Exception:
+            LOGGER.exception("Cache warm failed for key=%s", key)
+    return warmed
+
+
+def on_gold_refresh(callback: Callable[[List[str]], Any]) -> None:
+    _refresh_callbacks.append(callback)
+
+
+def handle_gold_refresh(tables: Iterable[str], top_n: int = CACHE_WARM_TOP_N) -> Dict[str, int]:
+    tables = list(tables)
+    prefixes = prefixes_for_tables(tables)
+    hot = top_keys(prefixes, top_n)
+    invalidated = invalidate_gold_tables(tables)
+    warmed = warm_keys(hot)
+    # Keep the hit counter bounded to the hottest keys.
+    get_redis().zremrangebyrank(HITS_KEY, 0, -(HITS_MAX_KEYS + 1))
+    LOGGER.info(
+        "Gold refresh tables=%s invalidated=%s warmed=%s",
+        tables,
+        invalidated,
+        warmed,
+    )
+    for callback in list(_refresh_callbacks):
+        try:
+            callback(tables)
+        except Exception:
+            LOGGER.exception("Gold refresh callback %r failed", callback)
+    return {"invalidated": invalidated, "warmed": warmed}
+
+
+def _listen_gold_refresh() -> None:
+    backoff = LISTENER_BACKOFF_MIN_SEC
+    try:
+        while True:
+            pubsub = None
+            try:
+                pubsub = new_redis_subscriber().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(GOLD_REFRESH_CHANNEL)
+                LOGGER.info("Subscribed to %s", GOLD_REFRESH_CHANNEL)
+                backoff = LISTENER_BACKOFF_MIN_SEC
+                for message in pubsub.listen():
+                    try:
+                        event = json.loads(message["data"])
+                        handle_gold_refresh(event.get("tables") or [])
+                    except Exception:
+                        LOGGER.exception("Invalid gold refresh event: %r", message.get("data"))
+            except redis.RedisError:
+                # Redis restart or network blip: refreshes published meanwhile are
+                # lost, so cached payloads may be stale until their TTL expires.
+                LOGGER.exception("Gold refresh subscription lost; reconnecting in %.0fs", backoff)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+            time.sleep(backoff)
+            backoff = min(backoff * 2, LISTENER_BACKOFF_MAX_SEC)
+    finally:
+        LOGGER.error("Gold refresh listener thread exited")
+
+
+def start_gold_refresh_listener() -> threading.Thread:
+    thread = threading.Thread(
+        target=_listen_gold_refresh,
+        name="gold-refresh-listener",
+        daemon=True,
+    )
+    thread.start()
+    return thread
@@ -0,0 +1,194 @@
+"""Shared Redis and ClickHouse clients, created on first use from config.settings.
+
+Importing this module (or anything that imports it) opens no connections,
+so workers start fast; pool sizes and timeouts come from the environment.
+
+ClickHouse: clickhouse_driver.Client is one connection and not thread-safe,
+so the API keeps a bounded pool of them. `get_clickhouse_client()` returns
+a cheap handle whose execute/execute_iter check a connection out of the
+pool for the duration of the call.
+"""
+from contextlib import contextmanager
+import logging
+import math
+import queue
+import threading
+from typing import Any, Iterator, Optional
+
+from clickhouse_driver import Client as ClickHouseClient
+from fastapi import HTTPException
+import redis
+
+from config import Settings, settings as default_settings
+
+LOGGER = logging.getLogger(__name__)
+
+
+# ===========================================================
+# REDIS
+# ===========================================================
+
+_redis: Optional[redis.Redis] = None
+_redis_lock = threading.Lock()
+
+
+def get_redis() -> redis.Redis:
+
+    global _redis
+    if _redis is None:
+        with _redis_lock:
+            if _redis is None:
+                s = default_settings
+                _redis = redis.Redis(
+                    connection_pool=redis.BlockingConnectionPool(
+                        host=s.redis_host,
+                        port=s.redis_port,
+                        db=s.redis_db,
+                        max_connections=s.redis_max_connections,
+                        socket_timeout=s.redis_socket_timeout_sec,
+                        socket_connect_timeout=s.redis_socket_timeout_sec,
+                        timeout=s.redis_socket_timeout_sec,
+                    )
+                )
+    return _redis
+
+
+def new_redis_subscriber() -> redis.Redis:
+    """Dedicated client for long-lived pub/sub listeners.
+
+    Not shared with get_redis(): an idle subscription would hit that pool's
+    socket_timeout and raise. Reads block indefinitely here, and the
+    health check pings the connection so a dead peer is still noticed.
+    """
+    s = default_settings
+    return redis.Redis(
+        host=s.redis_host,
+        port=s.redis_port,
+        db=s.redis_db,
+        socket_timeout=None,
+        socket_connect_timeout=s.redis_socket_timeout_sec,
+        socket_keepalive=True,
+        health_check_interval=30,
+    )
+
+
+# ===========================================================
+# CLICKHOUSE
+# ===========================================================
+
+class ClickHousePool:
+
+    def __init__(self, s: Settings):
+        self.settings = s
+        self.size = s.ch_pool_size
+        # Slots start empty; connections are opened when first checked out.
+        self._slots: "queue.LifoQueue[Optional[ClickHouseClient]]" = queue.LifoQueue(maxsize=self.size)
+        for _ in range(self.size):
+            self._slots.put(None)
+
+    def _connect(self) -> ClickHouseClient:
+        s = self.settings
+        return ClickHouseClient(
+            host=s.ch_host,
+            port=s.ch_port,
+            user=s.ch_user,
+            password=s.ch_password,
+            database=s.ch_database,
+            connect_timeout=s.ch_connect_timeout_sec,
+            send_receive_timeout=s.ch_send_receive_timeout_sec,
+        )
+
+    @contextmanager
+    def connection(self) -> Iterator[ClickHouseClient]:
+
+        try:
+            client = self._slots.get(timeout=self.settings.ch_pool_timeout_sec)
+        except queue.Empty:
+            # Same contract as admission control (api/limits.py): shed, don't fail.
+            raise HTTPException(
+                status_code=503,
+                detail=f"ClickHouse pool exhausted ({self.size} connections)",
+                headers={"Retry-After": str(max(1, math.ceil(self.settings.ch_pool_timeout_sec)))},
+            )
+
+        try:
+            if client is None:
+                client = self._connect()
+            yield client
+        except BaseException:
+            # The connection may be mid-query; drop it rather than reuse it.
+            if client is not None:
+                client.disconnect()
+            client = None
+            raise
+        finally:
+            self._slots.put(client)
+
+    def close(self) -> None:
+        # Only idle slots are drained and refilled; connections still checked
+        # out return to their own slot, which must stay free for them.
+        drained = 0
+        while True:
+            try:
+                client = self._slots.get_nowait()
+            except queue.Empty:
+                break
+            drained += 1
+            if client is not None:
+                client.disconnect()
+        for _ in range(drained):
+            self._slots.put(None)
+
+
+class PooledClickHouseClient:
+    """Client-shaped handle over the pool; keeps `last_query` of its latest call."""
+
+    def __init__(self, pool: ClickHousePool):
+        self.pool = pool
+        self.last_query = None
+
+    def execute(self, *args: Any, **kwargs: Any) -> Any:
+        with self.pool.connection() as client:
+            try:
+                return client.execute(*args, **kwargs)
+            finally:
+                self.last_query = client.last_query
+
+    def execute_iter(self, *args: Any, **kwargs: Any) -> Iterator[Any]:
+        # The connection stays checked out until the iterator is exhausted or closed.
+        with self.pool.connection() as client:
+            try:
+                yield from client.execute_iter(*args, **kwargs)
+            finally:
+                self.last_query = client.last_query
+
+    def disconnect(self) -> None:
+        pass
+
+
+_ch_pool: Optional[ClickHousePool] = None
+_ch_pool_lock = threading.Lock()
+
+
+def get_clickhouse_pool() -> ClickHousePool:
+
+    global _ch_pool
+    if _ch_pool is None:
+        with _ch_pool_lock:
+            if _ch_pool is None:
+                _ch_pool = ClickHousePool(default_settings)
+    return _ch_pool
+
+
+def get_clickhouse_client() -> PooledClickHouseClient:
+    return PooledClickHouseClient(get_clickhouse_pool())
+
+
+def close_clients() -> None:
+
+    global _redis
+    if _ch_pool is not None:
+        _ch_pool.close()
+    if _redis is not None:
+        _redis.connection_pool.disconnect()
+        _redis = None
@@ -0,0 +1,118 @@
+"""Brotli/gzip compression for buffered API responses.
+
+Pure ASGI middleware. A response is compressed when the client accepts
+it, it arrives in a single body message of at least COMPRESS_MIN_BYTES
+and it has no Content-Encoding yet. Streaming responses (SSE, exports,
+which gzip themselves) pass through untouched. Brotli is used when the
+optional `brotli` package is installed and the client asks for it.
+"""
+import gzip
+import time
+from typing import Optional, Set
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from config import COMPRESS_BROTLI_QUALITY, COMPRESS_GZIP_LEVEL, COMPRESS_MIN_BYTES
+
+from .metrics import record_span
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only
+    brotli = None
+
+
+def _accepted(accept_encoding: str) -> Set[str]:
+    accepted = set()
+    for part in accept_encoding.split(","):
+        token, _, params = part.partition(";")
+        token = token.strip().lower()
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if token:
+            accepted.add(token)
+    return accepted
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = _accepted(accept_encoding)
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+class CompressionMiddleware:
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = COMPRESS_MIN_BYTES,
+        gzip_level: int = COMPRESS_GZIP_LEVEL,
+        brotli_quality: int = COMPRESS_BROTLI_QUALITY,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def compress(self, encoding: str, body: bytes) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level)
+
+    async def __call__(self, scope, receive, send):
+
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+
+        async def send_wrapper(message):
+            nonlocal start_message
+
+            if message["type"] == "http.response.start":
+                # Held back until the first body message shows whether to compress.
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            start, start_message = start_message, None
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=list(start.get("headers", [])))
+
+            if (
+                message.get("more_body", False)
+                or len(body) < self.minimum_size
+                or "content-encoding" in headers
+            ):
+                await send(start)
+                await send(message)
+                return
+
+            began = time.perf_counter()
+            compressed = self.compress(encoding, body)
+            record_span("compress", time.perf_counter() - began)
+
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            await send(dict(start, headers=headers.raw))
+            await send(dict(message, body=compressed))
+
+        await self.app(scope, receive, send_wrapper)
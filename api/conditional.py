@@ -0,0 +1,111 @@
+"""HTTP conditional caching for dashboard responses backed by the Redis cache.
+
+get_or_fetch records, per request, a digest of every cache entry it read
+or wrote, the shortest remaining TTL and the payload's generated_at (see
+cache._note_validator). The default response class turns those into
+ETag / Last-Modified / Cache-Control headers and answers a matching
+If-None-Match (or, without one, If-Modified-Since) with an empty 304, so
+neither the body nor its JSON rendering is produced.
+
+Responses that did not go through get_or_fetch (exports, batches, errors)
+carry no validators and are rendered as before.
+"""
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+import hashlib
+from typing import Any, Dict, Mapping, Optional
+
+from starlette.background import BackgroundTask
+from starlette.responses import Response
+
+from .cache import request_cache_info
+from .metrics import TimedJSONResponse, request_scope
+
+
+def _http_date(generated_at: str) -> Optional[str]:
+    try:
+        dt = datetime.fromisoformat(generated_at)
+    except ValueError:
+        return None
+    # generated_at is written with datetime.utcnow(), i.e. naive UTC.
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return format_datetime(dt.astimezone(timezone.utc).replace(microsecond=0), usegmt=True)
+
+
+def response_validators(info: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    """ETag, Last-Modified and Cache-Control for the cache entries a request read."""
+
+    if not info or not info.get("versions"):
+        return {}
+
+    versions = info["versions"]
+    digest = versions[0] if len(versions) == 1 else hashlib.sha1("|".join(versions).encode("ascii")).hexdigest()[:16]
+
+    headers = {
+        # Weak: the body also carries per-request fields such as cache_hit.
+        "ETag": f'W/"{digest}"',
+        "Cache-Control": f"private, max-age={int(info.get('max_age', 0))}",
+        "Vary": "Authorization",
+    }
+    last_modified = _http_date(info["generated_at"]) if info.get("generated_at") else None
+    if last_modified:
+        headers["Last-Modified"] = last_modified
+    return headers
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def is_not_modified(request_headers: Mapping[str, str], validators: Mapping[str, str]) -> bool:
+
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        etag = _opaque(validators["ETag"])
+        return any(tag.strip() == "*" or _opaque(tag) == etag for tag in if_none_match.split(","))
+
+    if_modified_since = request_headers.get("if-modified-since")
+    last_modified = validators.get("Last-Modified")
+    if if_modified_since and last_modified:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+
+    return False
+
+
+def _request_headers() -> Dict[str, str]:
+    scope = request_scope.get() or {}
+    return {
+        k.decode("latin-1").lower(): v.decode("latin-1")
+        for k, v in scope.get("headers", [])
+    }
+
+
+class ConditionalJSONResponse(TimedJSONResponse):
+    """Default response class: adds validators and short-circuits to 304."""
+
+    def __init__(
+        self,
+        content: Any,
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+        media_type: Optional[str] = None,
+        background: Optional[BackgroundTask] = None,
+    ) -> None:
+
+        validators = response_validators(request_cache_info.get()) if status_code == 200 else {}
+        if not validators:
+            super().__init__(content, status_code, headers, media_type, background)
+            return
+
+        headers = {**(headers or {}), **validators}
+        if is_not_modified(_request_headers(), validators):
+            # Skip JSONResponse.render entirely; 304 carries no body.
+            Response.__init__(self, None, 304, headers, None, background)
+            return
+
+        super().__init__(content, status_code, headers, media_type, background)
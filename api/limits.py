@@ -0,0 +1,156 @@
+"""Per-role/user rate limiting and per-endpoint ClickHouse admission control.
+
+Rate limiting is a token bucket per (role, user) kept in Redis through a
+Lua script, so all API workers share it; if Redis is unavailable each
+worker falls back to its own in-process buckets (an LRU of the most recent
+callers) and leaves Redis alone for a cooldown, so an outage does not add
+a connect timeout to every request.
+
+Admission control bounds how many ClickHouse queries each endpoint may
+have in flight. A query that cannot get a slot within the queue deadline
+is shed with 503 + Retry-After, so a slow endpoint cannot take every
+worker thread from the light ones.
+"""
+from collections import OrderedDict
+from contextlib import contextmanager
+import logging
+import math
+import threading
+import time
+from typing import Any, Dict, Iterator, Tuple
+
+import redis
+from fastapi import Depends, HTTPException
+
+from config import (
+    CH_MAX_INFLIGHT_DEFAULT,
+    CH_MAX_INFLIGHT_PER_ENDPOINT,
+    CH_QUEUE_DEADLINE_SEC,
+    RATE_LIMITS,
+)
+
+from .auth import get_claims
+from .clients import get_redis
+from .metrics import current_endpoint
+
+LOGGER = logging.getLogger(__name__)
+
+
+# ===========================================================
+# TOKEN BUCKET
+# ===========================================================
+
+_TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(data[1]) or burst
+local ts = tonumber(data[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+_token_bucket = None
+
+# After a Redis error, use local buckets only for this long.
+REDIS_COOLDOWN_SEC = 30.0
+_redis_retry_at = 0.0
+
+LOCAL_BUCKETS_MAX = 10000
+_local_buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+_local_lock = threading.Lock()
+
+
+def _take_local(key: str, rate: float, burst: float, now: float) -> Tuple[bool, float]:
+    with _local_lock:
+        tokens, ts = _local_buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + max(0.0, now - ts) * rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        _local_buckets[key] = (tokens, now)
+        _local_buckets.move_to_end(key)
+        while len(_local_buckets) > LOCAL_BUCKETS_MAX:
+            _local_buckets.popitem(last=False)
+    return allowed, tokens
+
+
+def take_token(key: str, rate: float, burst: float) -> Tuple[bool, float]:
+    """Consume one token; returns (allowed, tokens left)."""
+    global _token_bucket, _redis_retry_at
+    now = time.time()
+    if now < _redis_retry_at:
+        return _take_local(key, rate, burst, now)
+    try:
+        if _token_bucket is None:
+            _token_bucket = get_redis().register_script(_TOKEN_BUCKET_LUA)
+        allowed, tokens = _token_bucket(keys=[key], args=[rate, burst, now])
+        return bool(int(allowed)), float(tokens)
+    except redis.RedisError:
+        _redis_retry_at = now + REDIS_COOLDOWN_SEC
+        LOGGER.warning(
+            "Rate limit store unavailable; using local buckets for %.0fs", REDIS_COOLDOWN_SEC
+        )
+        return _take_local(key, rate, burst, now)
+
+
+def rate_limit(claims: Dict[str, Any] = Depends(get_claims)) -> None:
+    """FastAPI dependency: 429 once the caller's bucket is empty."""
+
+    role = str(claims.get("role", "")).lower()
+    rate, burst = RATE_LIMITS.get(role, RATE_LIMITS["default"])
+    user = str(claims.get("sub", claims.get("user_id", "anonymous")))
+
+    allowed, tokens = take_token(f"ratelimit:{role}:{user}", rate, burst)
+    if not allowed:
+        retry_after = max(1, math.ceil((1 - tokens) / rate))
+        raise HTTPException(
+            status_code=429,
+            detail="Rate limit exceeded",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+# ===========================================================
+# CONCURRENCY LIMITER
+# ===========================================================
+
+_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+_semaphores_lock = threading.Lock()
+
+
+def _semaphore(endpoint: str) -> threading.BoundedSemaphore:
+    sem = _semaphores.get(endpoint)
+    if sem is None:
+        with _semaphores_lock:
+            sem = _semaphores.get(endpoint)
+            if sem is None:
+                limit = CH_MAX_INFLIGHT_PER_ENDPOINT.get(endpoint, CH_MAX_INFLIGHT_DEFAULT)
+                sem = threading.BoundedSemaphore(limit)
+                _semaphores[endpoint] = sem
+    return sem
+
+
+@contextmanager
+def admission(endpoint: str = "", deadline: float = CH_QUEUE_DEADLINE_SEC) -> Iterator[None]:
+    """Hold one of the endpoint's ClickHouse slots, or shed with 503."""
+
+    sem = _semaphore(endpoint or current_endpoint())
+    if not sem.acquire(timeout=deadline):
+        raise HTTPException(
+            status_code=503,
+            detail="Too many concurrent queries for this endpoint",
+            headers={"Retry-After": str(max(1, math.ceil(deadline)))},
+        )
+    try:
+        yield
+    finally:
+        sem.release()
@@ -0,0 +1,121 @@
+"""Server-sent event fan-out for dashboard payloads that change on gold refresh.
+
+Each topic (e.g. one branch on one date) has a compute function and any
+number of subscriber queues. On a gold refresh event the payload is
+computed once, on the refresh listener thread, and the same object is
+pushed to every subscriber. Queues hold only the latest payload; a slow
+client skips intermediate updates instead of buffering them.
+"""
+import asyncio
+import json
+import logging
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, Hashable, Iterable, Optional, Set
+
+from starlette.concurrency import run_in_threadpool
+
+from .cache import on_gold_refresh
+
+LOGGER = logging.getLogger(__name__)
+
+HEARTBEAT_SEC = 15.0
+
+
+class _Topic:
+
+    def __init__(self, compute: Callable[[], Dict[str, Any]], loop: asyncio.AbstractEventLoop):
+        self.compute = compute
+        self.loop = loop
+        self.queues: Set[asyncio.Queue] = set()
+        self.version = 0
+
+
+def _offer(queue: asyncio.Queue, item: Any) -> None:
+    # Keep only the newest payload.
+    if queue.full():
+        try:
+            queue.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+    queue.put_nowait(item)
+
+
+class LiveFeed:
+
+    def __init__(self, event: str, tables: Iterable[str]):
+        self.event = event
+        self.tables = set(tables)
+        self._topics: Dict[Hashable, _Topic] = {}
+        self._lock = threading.Lock()
+        on_gold_refresh(self.handle_refresh)
+
+    def subscriber_count(self, key: Optional[Hashable] = None) -> int:
+        with self._lock:
+            if key is not None:
+                topic = self._topics.get(key)
+                return len(topic.queues) if topic else 0
+            return sum(len(t.queues) for t in self._topics.values())
+
+    def _subscribe(self, key: Hashable, compute: Callable[[], Dict[str, Any]]) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        with self._lock:
+            topic = self._topics.get(key)
+            if topic is None:
+                topic = _Topic(compute, asyncio.get_running_loop())
+                self._topics[key] = topic
+            topic.queues.add(queue)
+        return queue
+
+    def _unsubscribe(self, key: Hashable, queue: asyncio.Queue) -> None:
+        with self._lock:
+            topic = self._topics.get(key)
+            if topic is None:
+                return
+            topic.queues.discard(queue)
+            if not topic.queues:
+                del self._topics[key]
+
+    def handle_refresh(self, tables: Iterable[str]) -> int:
+        """Recompute every subscribed topic once and fan it out. Runs off the event loop."""
+
+        if not self.tables.intersection(tables):
+            return 0
+
+        with self._lock:
+            topics = list(self._topics.values())
+
+        pushed = 0
+        for topic in topics:
+            try:
+                payload = topic.compute()
+            except Exception:
+                LOGGER.exception("Live feed %s compute failed", self.event)
+                continue
+            topic.version += 1
+            item = (topic.version, payload)
+            with self._lock:
+                queues = list(topic.queues)
+            for queue in queues:
+                topic.loop.call_soon_threadsafe(_offer, queue, item)
+            pushed += len(queues)
+        return pushed
+
+    def _format(self, version: int, payload: Dict[str, Any]) -> str:
+        data = json.dumps(payload, separators=(",", ":"), default=str)
+        return f"id: {version}\nevent: {self.event}\ndata: {data}\n\n"
+
+    async def stream(self, key: Hashable, compute: Callable[[], Dict[str, Any]]) -> AsyncIterator[str]:
+
+        queue = self._subscribe(key, compute)
+        try:
+            # Current state first, so the client does not wait for the next refresh.
+            yield self._format(0, await run_in_threadpool(compute))
+            while True:
+                try:
+                    version, payload = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SEC)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield self._format(version, payload)
+        finally:
+            self._unsubscribe(key, queue)
@@ -1,11 +1,18 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
-from .routers import lender, agent, manager, hr
-from .audit_log import AuditLogMiddleware
+from .routers import lender, agent, manager, hr, health_router
+from .audit_log import AuditLogMiddleware, audit_writer
+from .cache import start_gold_refresh_listener
+from .clients import close_clients
+from .compression import CompressionMiddleware
+from .conditional import ConditionalJSONResponse
+from .metrics import MetricsMiddleware, render_metrics
+from .query_profile import start_profile_log, stop_profile_log
 
 
-app = FastAPI()
+app = FastAPI(default_response_class=ConditionalJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -13,14 +20,67 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Last-Modified", "Server-Timing"],
 )
 
+# Inside the metrics middleware, so compression shows up as a Server-Timing span.
+app.add_middleware(CompressionMiddleware)
+
 app.add_middleware(AuditLogMiddleware)
 
+app.add_middleware(MetricsMiddleware)
+
+
+@app.on_event("startup")
+def subscribe_gold_refresh():
+    start_gold_refresh_listener()
+
+
+@app.on_event("startup")
+def start_audit_writer():
+    audit_writer.start()
+
+
+@app.on_event("shutdown")
+def flush_audit_writer():
+    audit_writer.stop()
+
+
+@app.on_event("startup")
+def start_query_profile_log():
+    start_profile_log()
+
+
+@app.on_event("shutdown")
+def flush_query_profile_log():
+    stop_profile_log()
+
+
+@app.on_event("startup")
+def start_dependency_probe():
+    health_router.dependency_probe.start()
+
+
+@app.on_event("shutdown")
+def stop_dependency_probe():
+    health_router.dependency_probe.stop()
+
+
+@app.on_event("shutdown")
+def close_shared_clients():
+    close_clients()
+
+
 @app.get("/health")
 def health():
     return {"status":"ok"}
 
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+app.include_router(health_router.router)
 app.include_router(lender.router,prefix="/dashboard")
 app.include_router(agent.router,prefix="/dashboard")
 app.include_router(manager.router,prefix="/dashboard")
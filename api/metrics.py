@@ -0,0 +1,195 @@
+"""In-process latency histograms, Server-Timing spans and /metrics exposition."""
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+import json
+import re
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is used instead
+    orjson = None
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# (name, seconds) spans recorded during the current request, for Server-Timing.
+request_spans: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_spans", default=None)
+# The ASGI scope of the current request; the router adds "route" to it in place.
+request_scope: ContextVar[Optional[Dict[str, Any]]] = ContextVar("request_scope", default=None)
+
+
+class Histogram:
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...], buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.label_names)
+        idx = bisect_left(self.buckets, seconds)
+        with self._lock:
+            # per-bucket counts (+Inf last), then sum and count
+            series = self._series.get(key)
+            if series is None:
+                series = [0.0] * (len(self.buckets) + 3)
+                self._series[key] = series
+            series[idx] += 1
+            series[-2] += seconds
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {k: list(v) for k, v in self._series.items()}
+        for key, series in sorted(snapshot.items()):
+            base = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(self.label_names, key))
+            sep = "," if base else ""
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{le}"}} {int(cumulative)}')
+            lines.append(f"{self.name}_sum{{{base}}} {series[-2]}")
+            lines.append(f"{self.name}_count{{{base}}} {int(series[-1])}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUEST_DURATION = Histogram(
+    "api_request_duration_seconds",
+    "End-to-end request latency.",
+    ("endpoint", "method", "status"),
+)
+CACHE_DURATION = Histogram(
+    "api_cache_lookup_duration_seconds",
+    "get_or_fetch latency, including the fetch on a miss.",
+    ("endpoint", "result"),
+)
+QUERY_DURATION = Histogram(
+    "api_clickhouse_query_duration_seconds",
+    "ClickHouse query latency by query name.",
+    ("query",),
+)
+SERIALIZE_DURATION = Histogram(
+    "api_serialization_duration_seconds",
+    "Response body rendering latency.",
+    ("endpoint",),
+)
+
+ALL_HISTOGRAMS = [REQUEST_DURATION, CACHE_DURATION, QUERY_DURATION, SERIALIZE_DURATION]
+
+
+def record_span(name: str, seconds: float) -> None:
+    spans = request_spans.get()
+    if spans is not None:
+        spans.append((name, seconds))
+
+
+@contextmanager
+def timed(histogram: Histogram, span_name: str, **labels: str) -> Iterator[Dict[str, str]]:
+    """Time a block into `histogram` and the request's Server-Timing spans.
+
+    Yields the labels dict so the block can fill in labels only known at the
+    end (e.g. cache hit/miss).
+    """
+    start = time.perf_counter()
+    try:
+        yield labels
+    finally:
+        elapsed = time.perf_counter() - start
+        histogram.observe(elapsed, **labels)
+        record_span(span_name, elapsed)
+
+
+def current_endpoint() -> str:
+    scope = request_scope.get() or {}
+    return getattr(scope.get("route"), "path", "unmatched")
+
+
+def dumps(content: Any) -> bytes:
+    """Compact JSON bytes; orjson when installed. Unknown types (Decimal, UUID) become str."""
+    if orjson is not None:
+        return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+class TimedJSONResponse(JSONResponse):
+    """JSONResponse rendered by `dumps`, recorded as a `serialize` span.
+
+    Unlike the stock JSONResponse it accepts datetimes and Decimals, so a
+    route may return it directly and skip jsonable_encoder.
+    """
+
+    def render(self, content: Any) -> bytes:
+        with timed(SERIALIZE_DURATION, "serialize", endpoint=current_endpoint()):
+            return dumps(content)
+
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for histogram in ALL_HISTOGRAMS:
+        lines.extend(histogram.render())
+    return "\n".join(lines) + "\n"
+
+
+_TOKEN_RE = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+def server_timing_header(spans: List[Tuple[str, float]], total: float) -> str:
+    parts = [f"{_TOKEN_RE.sub('_', name)};dur={seconds * 1000:.2f}" for name, seconds in spans]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+class MetricsMiddleware:
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        spans: List[Tuple[str, float]] = []
+        token = request_spans.set(spans)
+        scope_token = request_scope.set(scope)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((
+                    b"server-timing",
+                    server_timing_header(spans, time.perf_counter() - start).encode("latin-1"),
+                ))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_spans.reset(token)
+            request_scope.reset(scope_token)
+            REQUEST_DURATION.observe(
+                time.perf_counter() - start,
+                endpoint=getattr(scope.get("route"), "path", "unmatched"),
+                method=scope.get("method", ""),
+                status=str(status_code),
+            )
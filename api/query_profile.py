@@ -0,0 +1,237 @@
+"""ClickHouse query tagging, client-side profile capture and a cost report.
+
+Every router query runs with a unique `query_id` and a stable
+`log_comment` ("dashboard:<query name>"), so server-side stats in
+system.query_log can be matched back to the endpoint that issued them.
+The driver's progress/profile info for each execution is appended to a
+local JSON lines log through a non-blocking queue handler.
+
+Report:
+    python -m api.query_profile --minutes 60 --order-by read_bytes
+"""
+import argparse
+from datetime import datetime, timedelta, timezone
+import json
+import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+import os
+import queue
+from statistics import quantiles
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+import uuid
+
+from config import (
+    AUDIT_QUEUE_SIZE,
+    QUERY_PROFILE_LOG_BACKUPS,
+    QUERY_PROFILE_LOG_MAX_BYTES,
+    QUERY_PROFILE_LOG_PATH,
+)
+
+LOG_COMMENT_PREFIX = "dashboard:"
+
+PROFILE_LOGGER = logging.getLogger("api.query_profile.records")
+PROFILE_LOGGER.propagate = False
+PROFILE_LOGGER.setLevel(logging.INFO)
+
+_listener: Optional[QueueListener] = None
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of raising when the queue is full."""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+def start_profile_log(path: str = QUERY_PROFILE_LOG_PATH) -> None:
+
+    global _listener
+    if _listener is not None:
+        return
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    records: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=AUDIT_QUEUE_SIZE)
+    file_handler = RotatingFileHandler(
+        path,
+        maxBytes=QUERY_PROFILE_LOG_MAX_BYTES,
+        backupCount=QUERY_PROFILE_LOG_BACKUPS,
+        encoding="utf-8",
+    )
+    PROFILE_LOGGER.addHandler(_DroppingQueueHandler(records))
+    _listener = QueueListener(records, file_handler)
+    _listener.start()
+
+
+def stop_profile_log() -> None:
+
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in list(PROFILE_LOGGER.handlers):
+        PROFILE_LOGGER.removeHandler(handler)
+    _listener = None
+
+
+# ===========================================================
+# TAGGING + CAPTURE
+# ===========================================================
+
+def query_tags(query_name: str) -> Tuple[str, Dict[str, Any]]:
+    """Return (query_id, settings) to pass to client.execute."""
+    query_id = f"{query_name}:{uuid.uuid4().hex}"
+    return query_id, {"log_comment": f"{LOG_COMMENT_PREFIX}{query_name}"}
+
+
+def capture_profile(client, query_name: str, query_id: str) -> Dict[str, Any]:
+
+    info = getattr(client, "last_query", None)
+    progress = getattr(info, "progress", None)
+    profile = getattr(info, "profile_info", None)
+
+    record = {
+        "ts": datetime.now(timezone.utc).isoformat(),
+        "query": query_name,
+        "query_id": query_id,
+        "elapsed_ms": round(getattr(info, "elapsed", 0.0) * 1000, 3),
+        "progress_rows": getattr(progress, "rows", None),
+        "progress_bytes": getattr(progress, "bytes", None),
+        "progress_total_rows": getattr(progress, "total_rows", None),
+        "result_rows": getattr(profile, "rows", None),
+        "result_bytes": getattr(profile, "bytes", None),
+        "result_blocks": getattr(profile, "blocks", None),
+    }
+
+    if PROFILE_LOGGER.handlers:
+        PROFILE_LOGGER.info(json.dumps(record, separators=(",", ":")))
+
+    return record
+
+
+# ===========================================================
+# REPORT
+# ===========================================================
+
+REPORT_ORDER_BY = ["read_bytes", "read_rows", "duration_ms", "memory", "calls"]
+
+
+def _load_local_records(path: str, since: datetime) -> Dict[str, Dict[str, Any]]:
+
+    records: Dict[str, Dict[str, Any]] = {}
+    for candidate in [path] + [f"{path}.{i}" for i in range(1, QUERY_PROFILE_LOG_BACKUPS + 1)]:
+        if not os.path.exists(candidate):
+            continue
+        with open(candidate, encoding="utf-8") as f:
+            for line in f:
+                # Skip torn or foreign lines rather than failing the whole report.
+                try:
+                    rec = json.loads(line)
+                    if datetime.fromisoformat(rec["ts"]) >= since:
+                        records[rec["query_id"]] = rec
+                except (ValueError, KeyError, TypeError):
+                    continue
+    return records
+
+
+def _p95(values: List[float]) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return quantiles(values, n=20)[-1]
+
+
+def build_report(client, minutes: int, path: str = QUERY_PROFILE_LOG_PATH) -> List[Dict[str, Any]]:
+
+    since = datetime.now(timezone.utc) - timedelta(minutes=minutes)
+    local = _load_local_records(path, since)
+
+    rows = client.execute(
+        """
+        SELECT
+            query_id,
+            substring(log_comment, %(prefix_len)s + 1) AS query_name,
+            query_duration_ms,
+            read_rows,
+            read_bytes,
+            result_rows,
+            memory_usage
+        FROM system.query_log
+        WHERE type = 'QueryFinish'
+          AND event_time >= now() - INTERVAL %(minutes)s MINUTE
+          AND startsWith(log_comment, %(prefix)s)
+        """,
+        {"prefix": LOG_COMMENT_PREFIX, "prefix_len": len(LOG_COMMENT_PREFIX), "minutes": minutes},
+    )
+
+    by_name: Dict[str, Dict[str, Any]] = {}
+    for query_id, name, duration_ms, read_rows, read_bytes, result_rows, memory in rows:
+        agg = by_name.setdefault(name, {
+            "query": name,
+            "calls": 0,
+            "durations": [],
+            "client_ms": [],
+            "read_rows": 0,
+            "read_bytes": 0,
+            "result_rows": 0,
+            "memory": 0,
+        })
+        agg["calls"] += 1
+        agg["durations"].append(float(duration_ms))
+        agg["read_rows"] += int(read_rows)
+        agg["read_bytes"] += int(read_bytes)
+        agg["result_rows"] += int(result_rows)
+        agg["memory"] = max(agg["memory"], int(memory))
+        rec = local.get(query_id)
+        if rec is not None:
+            agg["client_ms"].append(float(rec["elapsed_ms"]))
+
+    report = []
+    for agg in by_name.values():
+        durations = sorted(agg.pop("durations"))
+        client_ms = agg.pop("client_ms")
+        agg["duration_ms"] = sum(durations)
+        agg["p95_ms"] = _p95(durations)
+        agg["client_avg_ms"] = sum(client_ms) / len(client_ms) if client_ms else None
+        agg["matched_local"] = len(client_ms)
+        report.append(agg)
+    return report
+
+
+def _format_report(report: List[Dict[str, Any]]) -> str:
+
+    header = f"{'query':<40} {'calls':>7} {'total_ms':>10} {'p95_ms':>9} {'client_ms':>10} {'read_rows':>12} {'read_MB':>9} {'max_mem_MB':>10}"
+    lines = [header, "-" * len(header)]
+    for agg in report:
+        client_ms = "-" if agg["client_avg_ms"] is None else f"{agg['client_avg_ms']:.1f}"
+        lines.append(
+            f"{agg['query']:<40} {agg['calls']:>7} {agg['duration_ms']:>10.0f} {agg['p95_ms']:>9.1f}"
+            f" {client_ms:>10} {agg['read_rows']:>12} {agg['read_bytes'] / 1e6:>9.1f} {agg['memory'] / 1e6:>10.1f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+
+    parser = argparse.ArgumentParser(description="Rank dashboard ClickHouse queries by cost.")
+    parser.add_argument("--minutes", type=int, default=60, help="time window to report on")
+    parser.add_argument("--order-by", choices=REPORT_ORDER_BY, default="read_bytes")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--log-path", default=QUERY_PROFILE_LOG_PATH)
+    args = parser.parse_args(argv)
+
+    from api.routers._common import get_clickhouse_client
+
+    report = build_report(get_clickhouse_client(), args.minutes, args.log_path)
+    report.sort(key=lambda agg: agg[args.order_by], reverse=True)
+    print(_format_report(report[: args.limit]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,105 +1,206 @@
-from base64 import urlsafe_b64decode
+import csv
 from datetime import date
+import io
 import json
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+import zlib
 
-from clickhouse_driver import Client as ClickHouseClient
 from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from api import clients
+from api.auth import bearer_token, claims_for_token
+from api.clients import PooledClickHouseClient
+from api.conditional import ConditionalJSONResponse
+from api.limits import admission
+from api.metrics import QUERY_DURATION, timed
+from api.query_profile import capture_profile, query_tags
 
 
 # ===========================================================
-# JWT CLAIMS (DEMO SIMPLE DECODE)
+# JWT CLAIMS
 # ===========================================================
 
-def _decode_jwt_payload(token: str) -> Dict[str, Any]:
+def get_claims_from_auth(authorization: Optional[str]) -> Dict[str, Any]:
 
-    parts = token.split(".")
+    return claims_for_token(bearer_token(authorization))
 
-    if len(parts) != 3:
-        raise HTTPException(status_code=401, detail="Invalid JWT")
 
-    payload_part = parts[1]
+# ===========================================================
+# CLICKHOUSE CONNECTION
+# ===========================================================
 
-    padding = "=" * ((4 - len(payload_part) % 4) % 4)
+# Pooled and configured from config.settings (CH_*); see api/clients.py.
 
-    try:
+def get_clickhouse_client() -> PooledClickHouseClient:
 
-        payload_raw = urlsafe_b64decode(payload_part + padding)
+    return clients.get_clickhouse_client()
 
-        payload = json.loads(payload_raw.decode("utf-8"))
 
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid JWT payload")
+# ===========================================================
+# QUERY HELPER
+# ===========================================================
 
-    if not isinstance(payload, dict):
-        raise HTTPException(status_code=401, detail="Invalid JWT payload")
+def execute_query(
 
-    return payload
+    client: PooledClickHouseClient,
 
+    query_name: str,
 
-def get_claims_from_auth(authorization: Optional[str]) -> Dict[str, Any]:
+    query: str,
 
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Missing Authorization header")
+    params: Optional[Dict[str, Any]] = None,
 
-    if not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Invalid Authorization scheme")
+    **kwargs: Any
 
-    token = authorization.split(" ", 1)[1].strip()
+):
 
-    if not token:
-        raise HTTPException(status_code=401, detail="Missing token")
+    query_id, settings = query_tags(query_name)
 
-    return _decode_jwt_payload(token)
+    settings.update(kwargs.pop("settings", None) or {})
 
+    with admission(), timed(QUERY_DURATION, f"ch.{query_name}", query=query_name):
 
-def require_role(claims: Dict[str, Any], expected_role: str):
+        result = client.execute(query, params or {}, query_id=query_id, settings=settings, **kwargs)
 
-    role = str(claims.get("role", "")).lower()
+    capture_profile(client, query_name, query_id)
 
-    if role != expected_role.lower():
-        raise HTTPException(status_code=403, detail="Forbidden for role")
+    return result
 
 
-# ===========================================================
-# CLICKHOUSE CONNECTION (HARDCODED)
-# ===========================================================
-
-def get_clickhouse_client() -> ClickHouseClient:
+def query_ch(query: str, params: Optional[Dict[str, Any]] = None):
 
-    return ClickHouseClient(
+    client = get_clickhouse_client()
 
-        host="localhost",     # docker clickhouse host
+    return client.execute(
 
-        port=9000,            # native tcp
+        query,
 
-        user="default",
+        params or {},
 
-        password="",          # add if password exists
+        with_column_types=False
 
-        database="compliance" # 
     )
 
 
+def today_iso() -> str:
+
+    return date.today().isoformat()
+
+
 # ===========================================================
-# QUERY HELPER
+# JSON RESPONSES
 # ===========================================================
 
-def query_ch(query: str, params: Optional[Dict[str, Any]] = None):
+# Returning a Response skips FastAPI's jsonable_encoder and response_model
+# validation; the payload is rendered once by orjson (see api.metrics.dumps).
+# Routes document the shape with `responses={200: {"model": ...}}`.
 
-    client = get_clickhouse_client()
+def json_response(payload: Dict[str, Any]) -> ConditionalJSONResponse:
 
-    return client.execute(
+    return ConditionalJSONResponse(payload)
 
-        query,
 
-        params or {},
+# ===========================================================
+# STREAMING EXPORT
+# ===========================================================
 
-        with_column_types=False
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
 
-    )
+EXPORT_BLOCK_ROWS = 10000
+EXPORT_CHUNK_ROWS = 1000
 
 
-def today_iso() -> str:
+def _encode_rows(columns: List[str], rows: Iterable[tuple], fmt: str) -> Iterator[bytes]:
+
+    buf = io.StringIO()
+
+    writer = csv.writer(buf) if fmt == "csv" else None
+
+    if writer is not None:
+        writer.writerow(columns)
+
+    pending = 0
+
+    for row in rows:
+
+        if writer is not None:
+            writer.writerow(["" if v is None else v for v in row])
+        else:
+            buf.write(json.dumps(dict(zip(columns, row)), separators=(",", ":"), default=str))
+            buf.write("\n")
+
+        pending += 1
+
+        if pending >= EXPORT_CHUNK_ROWS:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+            pending = 0
+
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+def _gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+
+    yield compressor.flush()
+
+
+def stream_export(
+    query: str,
+    params: Optional[Dict[str, Any]],
+    columns: List[str],
+    fmt: str = "ndjson",
+    gzip: bool = False,
+    filename: str = "export",
+    query_name: str = "export",
+) -> StreamingResponse:
+
+    if fmt not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"format must be one of {sorted(EXPORT_MEDIA_TYPES)}")
+
+    def _rows() -> Iterator[tuple]:
+
+        client = get_clickhouse_client()
+
+        query_id, settings = query_tags(query_name)
+
+        settings["max_block_size"] = EXPORT_BLOCK_ROWS
+
+        # The endpoint's admission slot and the pooled connection are held
+        # until the stream ends or the client goes away.
+        with admission():
+            yield None
+            yield from client.execute_iter(
+                query,
+                params or {},
+                query_id=query_id,
+                settings=settings,
+            )
+
+    rows = _rows()
+
+    # Take the slot now, in the request context, so an overloaded endpoint
+    # still answers 503 before the streaming response has started.
+    next(rows)
+
+    body = _encode_rows(columns, rows, fmt)
+
+    headers = {"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'}
+
+    if gzip:
+        body = _gzip_chunks(body)
+        headers["Content-Encoding"] = "gzip"
 
-    return date.today().isoformat()
\ No newline at end of file
+    return StreamingResponse(body, media_type=EXPORT_MEDIA_TYPES[fmt], headers=headers)
@@ -1,84 +1,169 @@
-from datetime import datetime, date
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+import json
 from typing import Optional
 
-from fastapi import APIRouter, Header
+from fastapi import APIRouter, Depends, HTTPException, Query
 
-from api.cache import build_cache_key, get_or_fetch, r
-from ._common import get_clickhouse_client, get_claims_from_auth, require_role
+from config import CACHE_TTLS
 
-router = APIRouter()
+from api.auth import require_role
+from api.cache import build_cache_key, get_or_fetch
+from api.clients import get_redis
+from api.limits import rate_limit
+from ._common import execute_query, get_clickhouse_client, json_response
+from .schema import AssignedLoansPage
 
+router = APIRouter(dependencies=[Depends(require_role("agent")), Depends(rate_limit)])
 
-@router.get('/agent/assigned-loans')
+MAX_PAGE_SIZE = 1000
+
+
+def _iso(value):
+    if not value:
+        return None
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+# Column -> JSON converter, in response order
+LOAN_FIELDS = {
+    "loan_id": lambda v: v,
+    "borrower_name": lambda v: v,
+    "dpd_days": lambda v: int(v or 0),
+    "overdue_amount": lambda v: float(v or 0),
+    "loan_aging_bucket": lambda v: v,
+    "last_call_at": _iso,
+    "last_call_status": lambda v: v,
+    "last_call_duration": lambda v: int(v or 0),
+    "followup_due": bool,
+    "calls_today": lambda v: int(v or 0),
+}
+
+# Always selected: they form the keyset cursor
+CURSOR_FIELDS = ["dpd_days", "loan_id"]
+
+
+def _encode_cursor(dpd_days: int, loan_id: str) -> str:
+    raw = json.dumps([dpd_days, loan_id], separators=(",", ":")).encode("utf-8")
+    return urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str):
+    padding = "=" * ((4 - len(cursor) % 4) % 4)
+    try:
+        dpd_days, loan_id = json.loads(urlsafe_b64decode(cursor + padding))
+        return int(dpd_days), str(loan_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _parse_fields(fields: Optional[str]):
+    if not fields:
+        return list(LOAN_FIELDS)
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in LOAN_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {unknown}")
+    return [f for f in LOAN_FIELDS if f in requested]
+
+
+@router.get('/agent/assigned-loans', response_model=None, responses={200: {"model": AssignedLoansPage}})
 def assigned_loans(
     date: Optional[str] = None,
     status_filter: Optional[str] = None,
     agent_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = None,
 ):
     agent_id = agent_id or ""
     if not agent_id:
-        return {"loans": [], "total": 0, "followups_due": 0, "cache_hit": False, "generated_at": datetime.utcnow().isoformat()}
+        return json_response({"loans": [], "total": 0, "followups_due": 0, "next_cursor": None, "cache_hit": False, "generated_at": datetime.utcnow().isoformat()})
+
+    selected_fields = _parse_fields(fields)
+    after = _decode_cursor(cursor) if cursor else None
 
     query_date = date or datetime.utcnow().date().isoformat()
-    cache_key = build_cache_key(
-        "agent",
-        "assigned_loans",
+    filters = dict(
         agent_id=agent_id,
         date=query_date,
         status_filter=status_filter or "ALL",
     )
-    cache_hit = bool(r.get(cache_key))
+    page_key = build_cache_key(
+        "agent",
+        "assigned_loans",
+        cursor=cursor or "",
+        fields=",".join(selected_fields),
+        limit=limit,
+        **filters,
+    )
+    totals_key = build_cache_key("agent", "assigned_loans_totals", **filters)
+    cache_hit = bool(get_redis().get(page_key))
+
+    where_parts = ["agent_id = %(agent_id)s"]
+    params = {"agent_id": agent_id}
+    if status_filter:
+        where_parts.append("upper(last_call_status) = upper(%(status_filter)s)")
+        params["status_filter"] = status_filter
 
-    def _fetch():
+    def _fetch_totals():
         client = get_clickhouse_client()
-        where_parts = ["agent_id = %(agent_id)s"]
-        params = {"agent_id": agent_id, "query_date": query_date}
+        rows = execute_query(
+            client,
+            "agent.assigned_loans.totals",
+            f"""
+            SELECT count(), countIf(followup_due = 1)
+            FROM agent_assigned_loans
+            WHERE {' AND '.join(where_parts)}
+            """,
+            params,
+        )
+        total, followups_due = rows[0] if rows else (0, 0)
+        return {"total": int(total or 0), "followups_due": int(followups_due or 0)}
 
-        if status_filter:
-            where_parts.append("upper(last_call_status) = upper(%(status_filter)s)")
-            params["status_filter"] = status_filter
+    def _fetch_page():
+        client = get_clickhouse_client()
+        page_where = list(where_parts)
+        page_params = dict(params, limit=limit)
+        if after is not None:
+            page_where.append(
+                "(dpd_days < %(after_dpd)s"
+                " OR (dpd_days = %(after_dpd)s AND loan_id > %(after_loan_id)s))"
+            )
+            page_params["after_dpd"], page_params["after_loan_id"] = after
 
+        columns = CURSOR_FIELDS + [f for f in selected_fields if f not in CURSOR_FIELDS]
         sql = f"""
-        SELECT
-            loan_id,
-            borrower_name,
-            dpd_days,
-            overdue_amount,
-            loan_aging_bucket,
-            last_call_at,
-            last_call_status,
-            last_call_duration,
-            followup_due,
-            calls_today
+        SELECT {', '.join(columns)}
         FROM agent_assigned_loans
-        WHERE {' AND '.join(where_parts)}
+        WHERE {' AND '.join(page_where)}
+        ORDER BY dpd_days DESC, loan_id ASC
+        LIMIT %(limit)s
         """
-        rows = client.execute(sql, params)
-        loans = [
-            {
-                "loan_id": row[0],
-                "borrower_name": row[1],
-                "dpd_days": int(row[2] or 0),
-                "overdue_amount": float(row[3] or 0),
-                "loan_aging_bucket": row[4],
-                "last_call_at": row[5].isoformat() if row[5] else None,
-                "last_call_status": row[6],
-                "last_call_duration": int(row[7] or 0),
-                "followup_due": bool(row[8]),
-                "calls_today": int(row[9] or 0),
-            }
-            for row in rows
-        ]
-        followups_due = sum(1 for loan in loans if loan["followup_due"])
+        rows = execute_query(client, "agent.assigned_loans.page", sql, page_params)
+
+        loans = []
+        for row in rows:
+            values = dict(zip(columns, row))
+            loans.append({f: LOAN_FIELDS[f](values[f]) for f in selected_fields})
+
+        next_cursor = None
+        if len(rows) == limit:
+            last = rows[-1]
+            next_cursor = _encode_cursor(int(last[0] or 0), str(last[1]))
+
         return {
             "loans": loans,
-            "total": len(loans),
-            "followups_due": followups_due,
+            "next_cursor": next_cursor,
+            "limit": limit,
             "generated_at": datetime.utcnow().isoformat(),
         }
 
-    result = get_or_fetch(cache_key, ttl=30, fetch_fn=_fetch)
+    result = get_or_fetch(page_key, ttl=CACHE_TTLS["agent"], fetch_fn=_fetch_page)
+    totals = get_or_fetch(totals_key, ttl=CACHE_TTLS["agent"], fetch_fn=_fetch_totals)
     if isinstance(result, dict):
+        result["total"] = totals.get("total", 0)
+        result["followups_due"] = totals.get("followups_due", 0)
         result["cache_hit"] = cache_hit
         result.setdefault("generated_at", datetime.utcnow().isoformat())
-    return result
\ No newline at end of file
+    return json_response(result)
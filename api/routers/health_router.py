@@ -1,88 +1,175 @@
+"""Liveness and readiness endpoints.
+
+/livez answers from the process alone. /readyz serves the last result of
+dependency probes that run on a background thread every
+HEALTH_PROBE_INTERVAL_SEC, so load balancer polling never reaches Redis
+or ClickHouse. Gold table row counts come from system.parts metadata
+instead of scanning the tables.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
 
-from clickhouse_driver import Client
-import redis
+from config import HEALTH_PROBE_INTERVAL_SEC, HEALTH_STALE_AFTER_SEC
 
+from api.clients import get_clickhouse_client, get_redis
 
-router = APIRouter()
 
+LOGGER = logging.getLogger(__name__)
 
-def get_clickhouse():
+router = APIRouter()
 
-    return Client(
 
-        host="localhost",
-        port=9000,
-        user="default",
-        password="",
-        database="compliance",
+GOLD_TABLES = [
+
+    "lender_portfolio_summary",
+    "agent_assigned_loans",
+    "manager_branch_summary",
+    "hr_agent_performance_daily",
+
+]
+
+TABLE_ROWS_SQL = """
+SELECT table, sum(rows)
+FROM system.parts
+WHERE active
+  AND database = currentDatabase()
+  AND table IN %(tables)s
+GROUP BY table
+"""
+
 
-    )
+# ===========================================================
+# BACKGROUND PROBES
+# ===========================================================
 
+class DependencyProbe:
 
-@router.get("/health")
-def health():
+    def __init__(self, interval: float = HEALTH_PROBE_INTERVAL_SEC, stale_after: float = HEALTH_STALE_AFTER_SEC):
 
-    services = {}
+        self.interval = interval
+        self.stale_after = stale_after
+        self.started_at = time.time()
+        self._result: Optional[Dict[str, Any]] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
 
-    # ClickHouse check
-    try:
+    def _probe_redis(self) -> Dict[str, Any]:
 
-        ch = get_clickhouse()
+        start = time.perf_counter()
+        try:
+            get_redis().ping()
+            return {"status": "ok", "latency_ms": round((time.perf_counter() - start) * 1000, 2)}
+        except Exception as exc:
+            return {"status": "error", "error": type(exc).__name__}
 
-        tables = [
+    def _probe_clickhouse(self) -> Dict[str, Any]:
 
-            "lender_portfolio_summary",
-            "agent_assigned_loans",
-            "manager_branch_summary",
-            "hr_agent_performance_daily",
+        start = time.perf_counter()
+        try:
+            rows = get_clickhouse_client().execute(TABLE_ROWS_SQL, {"tables": tuple(GOLD_TABLES)})
+        except Exception as exc:
+            return {"status": "error", "error": type(exc).__name__}
 
-        ]
+        counts = {t: 0 for t in GOLD_TABLES}
+        counts.update({table: int(total or 0) for table, total in rows})
+        return {
+            "status": "ok",
+            "latency_ms": round((time.perf_counter() - start) * 1000, 2),
+            "table_rows": counts,
+        }
 
-        counts = {}
+    def run_once(self) -> Dict[str, Any]:
 
-        for t in tables:
+        services = {
+            "redis": self._probe_redis(),
+            "clickhouse": self._probe_clickhouse(),
+        }
+        now = time.time()
+        result = {
+            "status": "ok" if all(s["status"] == "ok" for s in services.values()) else "degraded",
+            "checked_at": datetime.fromtimestamp(now, timezone.utc).isoformat(),
+            "services": services,
+        }
+        with self._lock:
+            self._result = result
+            self._checked_at = now
+        return result
 
-            rows = ch.execute(
+    def _loop(self) -> None:
 
-                f"SELECT count(*) FROM {t}"
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                LOGGER.exception("Dependency probe failed")
+            self._stop.wait(self.interval)
 
-            )
+    def start(self) -> None:
 
-            counts[t] = rows[0][0]
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="dependency-probe", daemon=True)
+        self._thread.start()
 
-        services["clickhouse"] = "ok"
+    def stop(self) -> None:
 
-        services["table_counts"] = counts
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval)
+        self._thread = None
 
-    except Exception:
+    def snapshot(self) -> Dict[str, Any]:
+        """Last probe result, marked stale once it is older than `stale_after`."""
 
-        services["clickhouse"] = "error"
+        with self._lock:
+            result, checked_at = self._result, self._checked_at
+
+        if result is None:
+            return {"status": "starting", "services": {}}
+
+        age = time.time() - checked_at
+        if age > self.stale_after:
+            return dict(result, status="stale", age_sec=round(age, 1))
+        return dict(result, age_sec=round(age, 1))
 
 
-    # Redis check
-    try:
+dependency_probe = DependencyProbe()
 
-        r = redis.Redis(
 
-            host="localhost",
-            port=6379,
+# ===========================================================
+# ENDPOINTS
+# ===========================================================
+
+@router.get("/livez")
+def livez():
+
+    return {
 
-        )
+        "status": "ok",
 
-        r.ping()
+        "uptime_sec": round(time.time() - dependency_probe.started_at, 1),
 
-        services["redis"] = "ok"
+    }
 
-    except Exception:
 
-        services["redis"] = "error"
+@router.get("/readyz")
+def readyz():
 
+    snapshot = dependency_probe.snapshot()
 
-    return {
+    return JSONResponse(
 
-        "status": "ok",
+        snapshot,
 
-        "services": services,
+        status_code=200 if snapshot["status"] == "ok" else 503,
 
-    }
\ No newline at end of file
+    )
@@ -1,21 +1,28 @@
 from datetime import datetime
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 
+from config import CACHE_TTLS
+
+from api.auth import require_role
 from api.cache import build_cache_key, get_or_fetch
-from ._common import get_clickhouse_client
+from api.limits import rate_limit
+from ._common import execute_query, get_clickhouse_client, json_response, stream_export
+from .schema import HrPerformance
 
 
-router = APIRouter()
+router = APIRouter(dependencies=[Depends(require_role("hr")), Depends(rate_limit)])
 
 
-@router.get("/hr/performance")
+@router.get("/hr/performance", response_model=None, responses={200: {"model": HrPerformance}})
 def hr_performance():
     cache_key = build_cache_key("hr", "performance", date=datetime.utcnow().date().isoformat())
 
     def _fetch():
         client = get_clickhouse_client()
-        rows = client.execute(
+        rows = execute_query(
+            client,
+            "hr.performance",
             """
             SELECT
                 agent_id,
@@ -46,4 +53,36 @@ def hr_performance():
             "generated_at": datetime.utcnow().isoformat(),
         }
 
-    return get_or_fetch(cache_key, 60, _fetch)
\ No newline at end of file
+    return json_response(get_or_fetch(cache_key, CACHE_TTLS["hr"], _fetch))
+
+
+HR_EXPORT_COLUMNS = [
+    "agent_id",
+    "total_calls",
+    "success_rate",
+    "talk_time",
+    "collections",
+]
+
+
+@router.get("/hr/performance/export")
+def hr_performance_export(format: str = "ndjson", gzip: bool = False):
+    return stream_export(
+        """
+        SELECT
+            agent_id,
+            sum(total_calls) as total_calls,
+            avg(call_success_rate) as success_rate,
+            sum(total_talk_time_min) as talk_time,
+            sum(amount_collected) as collections
+        FROM hr_agent_performance_daily
+        GROUP BY agent_id
+        ORDER BY total_calls DESC
+        """,
+        None,
+        HR_EXPORT_COLUMNS,
+        fmt=format,
+        gzip=gzip,
+        filename="hr_agent_performance",
+        query_name="hr.performance.export",
+    )
@@ -1,13 +1,101 @@
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 
-from api.cache import build_cache_key, get_or_fetch
-from api.routers._common import get_clickhouse_client
+from config import CACHE_TTLS
 
+from api.auth import require_role
+from api.cache import build_cache_key, get_or_fetch, get_or_fetch_many, read_gold_rows
+from api.limits import rate_limit
+from api.routers._common import execute_query, get_clickhouse_client, stream_export
+
+
+router = APIRouter(dependencies=[Depends(require_role("lender")), Depends(rate_limit)])
+
+MAX_BATCH_IDS = 200
+
+
+def _portfolio_response(lender_id, total, npa, efficiency, bucket_breakdown):
+
+    npa_ratio = (
+
+        (npa / total) * 100
+
+        if total > 0 else 0
+
+    )
+
+    return {
+
+        "lender_id": lender_id,
+
+        "total_disbursed": total,
+
+        "npa_ratio": npa_ratio,
+
+        "collection_efficiency": efficiency,
+
+        "bucket_breakdown": bucket_breakdown,
+
+        "generated_at":
+
+            datetime.utcnow().isoformat()
+
+    }
+
+
+def _portfolio_from_gold(lender_id, bucket_filter):
+
+    gold_rows = read_gold_rows("lender_portfolio_summary", lender_id)
+
+    # Versions written before the sum/count columns existed fall back to ClickHouse.
+    if not gold_rows or any("collection_efficiency_rows" not in g for g in gold_rows):
+
+        return None
+
+    total = sum(float(g.get("total_principal_disbursed") or 0) for g in gold_rows)
+
+    npa = sum(float(g.get("npa_amount") or 0) for g in gold_rows)
+
+    # Row-weighted, like avg() in the ClickHouse fallback and the batch endpoint.
+    efficiency_rows = sum(int(g.get("collection_efficiency_rows") or 0) for g in gold_rows)
+
+    efficiency = (
+
+        sum(float(g.get("collection_efficiency_sum") or 0) for g in gold_rows) / efficiency_rows
+
+        if efficiency_rows else 0
+
+    )
+
+    bucket_breakdown = {
+
+        str(g.get("loan_aging_bucket")): float(g.get("total_principal_disbursed") or 0)
+
+        for g in gold_rows
+
+        if not bucket_filter or g.get("loan_aging_bucket") == bucket_filter
+
+    }
+
+    return _portfolio_response(lender_id, total, npa, efficiency, bucket_breakdown)
+
+
+def _portfolio_cache_key(lender_id, bucket_filter):
+
+    return build_cache_key(
+
+        "lender",
+
+        "portfolio_summary",
+
+        lender_id=lender_id,
+
+        bucket=bucket_filter or "ALL"
+
+    )
 
-router = APIRouter()
 
 @router.get("/lender/portfolio-summary")
 def portfolio_summary(
@@ -38,24 +126,25 @@ def portfolio_summary(
     # Cache Key
     # -----------------------------
 
-    cache_key = build_cache_key(
+    cache_key = _portfolio_cache_key(lender_id, bucket_filter)
 
-        "lender",
 
-        "portfolio_summary",
+    # -----------------------------
+    # Fetch Function
+    # -----------------------------
 
-        lender_id=lender_id,
+    def _fetch():
 
-        bucket=bucket_filter or "ALL"
+        # -----------------------------------
+        # Materialized gold keys first
+        # -----------------------------------
 
-    )
+        gold = _portfolio_from_gold(lender_id, bucket_filter)
 
+        if gold is not None:
 
-    # -----------------------------
-    # Fetch Function
-    # -----------------------------
+            return gold
 
-    def _fetch():
 
         client = get_clickhouse_client()
 
@@ -64,7 +153,7 @@ def portfolio_summary(
         # Portfolio Summary
         # -----------------------------------
 
-        sql_summary = f"""
+        sql_summary = """
 
         SELECT
 
@@ -76,12 +165,14 @@ def portfolio_summary(
 
         FROM lender_portfolio_summary
 
-        WHERE lender_id = '{lender_id}'
+        WHERE lender_id = %(lender_id)s
 
         """
 
 
-        rows = client.execute(sql_summary) or [(0,0,0)]
+        params = {"lender_id": lender_id, "bucket": bucket_filter}
+
+        rows = execute_query(client, "lender.portfolio_summary.summary", sql_summary, params) or [(0,0,0)]
 
         total = float(rows[0][0] or 0)
 
@@ -90,20 +181,11 @@ def portfolio_summary(
         efficiency = float(rows[0][2] or 0)
 
 
-        npa_ratio = (
-
-            (npa / total) * 100
-
-            if total > 0 else 0
-
-        )
-
-
         # -----------------------------------
         # Bucket Breakdown
         # -----------------------------------
 
-        bucket_sql = f"""
+        bucket_sql = """
 
         SELECT
 
@@ -113,7 +195,7 @@ def portfolio_summary(
 
         FROM lender_portfolio_summary
 
-        WHERE lender_id = '{lender_id}'
+        WHERE lender_id = %(lender_id)s
 
         GROUP BY loan_aging_bucket
 
@@ -122,14 +204,14 @@ def portfolio_summary(
 
         if bucket_filter:
 
-            bucket_sql += f"""
+            bucket_sql += """
 
-            HAVING loan_aging_bucket = '{bucket_filter}'
+            HAVING loan_aging_bucket = %(bucket)s
 
             """
 
 
-        bucket_rows = client.execute(bucket_sql)
+        bucket_rows = execute_query(client, "lender.portfolio_summary.buckets", bucket_sql, params)
 
 
         bucket_breakdown = {
@@ -145,23 +227,19 @@ def portfolio_summary(
         # Response
         # -----------------------------------
 
-        return {
+        return _portfolio_response(
 
-            "lender_id": lender_id,
+            lender_id,
 
-            "total_disbursed": total,
+            total,
 
-            "npa_ratio": npa_ratio,
+            npa,
 
-            "collection_efficiency": efficiency,
+            efficiency,
 
-            "bucket_breakdown": bucket_breakdown,
+            bucket_breakdown
 
-            "generated_at":
-
-                datetime.utcnow().isoformat()
-
-        }
+        )
 
 
     # -----------------------------
@@ -172,17 +250,119 @@ def portfolio_summary(
 
         cache_key,
 
-        ttl=3600,
+        ttl=CACHE_TTLS["lender"],
 
         fetch_fn=_fetch
 
     )
 
 
+@router.get("/lender/portfolio-summary/batch")
+def portfolio_summary_batch(
+
+    lender_ids: str,
+
+    bucket_filter: Optional[str] = None,
+
+):
+
+    ids = list(dict.fromkeys(l.strip() for l in lender_ids.split(",") if l.strip()))
+
+    if not ids:
+
+        raise HTTPException(status_code=400, detail="lender_ids is required")
+
+    if len(ids) > MAX_BATCH_IDS:
+
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} lender_ids per call")
+
+
+    def _fetch_many(missing: List[str]) -> Dict[str, Dict]:
+
+        client = get_clickhouse_client()
+
+        rows = execute_query(
+
+            client,
+
+            "lender.portfolio_summary_batch",
+
+            """
+            SELECT
+                lender_id,
+                loan_aging_bucket,
+                sum(total_principal_disbursed),
+                sum(npa_amount),
+                sum(collection_efficiency_pct),
+                count()
+            FROM lender_portfolio_summary
+            WHERE lender_id IN %(lender_ids)s
+            GROUP BY lender_id, loan_aging_bucket
+            """,
+
+            {"lender_ids": tuple(missing)},
+
+        )
+
+        # lender_id -> [total, npa, efficiency sum, row count, bucket breakdown]
+        acc = {lender_id: [0.0, 0.0, 0.0, 0, {}] for lender_id in missing}
+
+        for lender_id, bucket, principal, npa, efficiency_sum, count in rows:
+
+            a = acc[lender_id]
+
+            a[0] += float(principal or 0)
+
+            a[1] += float(npa or 0)
+
+            a[2] += float(efficiency_sum or 0)
+
+            a[3] += int(count or 0)
+
+            if not bucket_filter or bucket == bucket_filter:
+
+                a[4][str(bucket)] = float(principal or 0)
+
+        return {
+
+            lender_id: _portfolio_response(
+
+                lender_id,
+
+                total,
+
+                npa,
+
+                efficiency_sum / count if count else 0,
+
+                buckets
+
+            )
+
+            for lender_id, (total, npa, efficiency_sum, count, buckets) in acc.items()
+
+        }
+
+
+    cache_keys = {lender_id: _portfolio_cache_key(lender_id, bucket_filter) for lender_id in ids}
+
+    lenders = get_or_fetch_many(cache_keys, ttl=CACHE_TTLS["lender"], fetch_many_fn=_fetch_many)
+
+    return {
+
+        "lenders": lenders,
+
+        "generated_at": datetime.utcnow().isoformat()
+
+    }
+
+
 @router.get("/lender/npa-alerts")
 def npa_alerts(limit: int = 50):
     client = get_clickhouse_client()
-    rows = client.execute(
+    rows = execute_query(
+        client,
+        "lender.npa_alerts",
         """
         SELECT
             loan_id,
@@ -211,4 +391,32 @@ def npa_alerts(limit: int = 50):
         for r in rows
     ]
 
-    return {"alerts": alerts}
\ No newline at end of file
+    return {"alerts": alerts}
+
+
+NPA_EXPORT_COLUMNS = [
+    "loan_id",
+    "borrower_id",
+    "dpd_days",
+    "overdue_amount",
+    "loan_aging_bucket",
+    "due_date",
+]
+
+
+@router.get("/lender/npa-alerts/export")
+def npa_alerts_export(format: str = "ndjson", gzip: bool = False):
+    return stream_export(
+        f"""
+        SELECT {', '.join(NPA_EXPORT_COLUMNS)}
+        FROM loans_clean
+        WHERE loan_aging_bucket = 'NPA'
+        ORDER BY dpd_days DESC
+        """,
+        None,
+        NPA_EXPORT_COLUMNS,
+        fmt=format,
+        gzip=gzip,
+        filename="npa_loans",
+        query_name="lender.npa_alerts.export",
+    )
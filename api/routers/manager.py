@@ -1,13 +1,94 @@
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 
-from api.cache import build_cache_key, get_or_fetch, r
-from ._common import get_clickhouse_client
+from config import CACHE_TTLS
 
+from api.auth import require_role
+from api.cache import build_cache_key, get_or_fetch, get_or_fetch_many, read_gold_entity
+from api.clients import get_redis
+from api.limits import rate_limit
+from api.live_feed import LiveFeed
+from ._common import execute_query, get_clickhouse_client
+
+
+router = APIRouter(dependencies=[Depends(require_role("manager")), Depends(rate_limit)])
+
+MAX_BATCH_IDS = 200
+
+# One computation per gold refresh, shared by every subscriber of a branch/date.
+branch_feed = LiveFeed("branch_summary", ["manager_branch_summary"])
+
+SUMMARY_COLUMNS = [
+    "agents_active_today",
+    "total_calls_made",
+    "collection_today",
+    "target_achievement_pct",
+    "followups_pending",
+    "calls_successful",
+    "collection_target",
+]
+
+TOP_AGENTS_SELECT = """
+    c.agent_id,
+    count() AS calls_made,
+    countIf(c.call_success_flag) AS calls_successful,
+    round(avg(c.call_duration_sec), 2) AS avg_call_duration_sec
+"""
+
+
+def _top_agent(row) -> Dict:
+    return {
+        "agent_id": row[0],
+        "calls_made": int(row[1] or 0),
+        "calls_successful": int(row[2] or 0),
+        "avg_call_duration_sec": float(row[3] or 0.0),
+    }
+
+
+def _branch_payload(s, top_agents: List[Dict]) -> Dict:
+    # `s` is a summary row in SUMMARY_COLUMNS order (gold hash values are strings)
+    if s:
+        agents_active = int(float(s[0] or 0))
+        calls_made = int(float(s[1] or 0))
+        collection_today = float(s[2] or 0.0)
+        target_pct = float(s[3] or 0.0)
+        followups_pending = int(float(s[4] or 0))
+        calls_successful = int(float(s[5] or 0))
+        collection_target = float(s[6] or 0.0)
+    else:
+        agents_active = 0
+        calls_made = 0
+        collection_today = 0.0
+        target_pct = 0.0
+        followups_pending = 0
+        calls_successful = 0
+        collection_target = 0.0
+
+    return {
+        "agents_active_today": agents_active,
+        "calls_made": calls_made,
+        "collection_today": collection_today,
+        "target_pct": target_pct,
+        "top_agents": top_agents,
+        "followups_pending": followups_pending,
+        "generated_at": datetime.utcnow().isoformat(),
+        "calls_successful": calls_successful,
+        "collection_target": collection_target,
+    }
+
+
+def _branch_cache_key(manager_id: Optional[str], branch_id: str, query_date: str) -> str:
+    return build_cache_key(
+        "manager",
+        "branch_summary",
+        manager_id=manager_id or "demo",
+        branch_id=branch_id,
+        date=query_date,
+    )
 
-router = APIRouter()
 
 @router.get('/manager/branch-summary')
 def branch_summary(
@@ -20,58 +101,29 @@ def branch_summary(
         raise HTTPException(status_code=400, detail="branch_id is required for this demo")
 
     query_date = date or datetime.utcnow().date().isoformat()
-    cache_key = build_cache_key(
-        "manager",
-        "branch_summary",
-        manager_id=manager_id or "demo",
-        branch_id=selected_branch_id,
-        date=query_date,
-    )
-    cache_hit = bool(r.get(cache_key))
+    cache_key = _branch_cache_key(manager_id, selected_branch_id, query_date)
+    cache_hit = bool(get_redis().get(cache_key))
 
     def _fetch():
         client = get_clickhouse_client()
 
-        summary_sql = """
-        SELECT
-            agents_active_today,
-            total_calls_made,
-            collection_today,
-            target_achievement_pct,
-            followups_pending,
-            calls_successful,
-            collection_target
-        FROM manager_branch_summary
-        WHERE branch_id = %(branch_id)s
-          AND report_date = toDate(%(report_date)s)
-        ORDER BY report_date DESC
-        LIMIT 1
-        """
-        summary_rows = client.execute(summary_sql, {"branch_id": selected_branch_id, "report_date": query_date})
-        if summary_rows:
-            s = summary_rows[0]
-            agents_active = int(s[0] or 0)
-            calls_made = int(s[1] or 0)
-            collection_today = float(s[2] or 0.0)
-            target_pct = float(s[3] or 0.0)
-            followups_pending = int(s[4] or 0)
-            calls_successful = int(s[5] or 0)
-            collection_target = float(s[6] or 0.0)
+        gold = read_gold_entity("manager_branch_summary", selected_branch_id, query_date)
+        if gold:
+            s = [gold.get(c) for c in SUMMARY_COLUMNS]
         else:
-            agents_active = 0
-            calls_made = 0
-            collection_today = 0.0
-            target_pct = 0.0
-            followups_pending = 0
-            calls_successful = 0
-            collection_target = 0.0
-
-        top_agents_sql = """
-        SELECT
-            c.agent_id,
-            count() AS calls_made,
-            countIf(c.call_success_flag) AS calls_successful,
-            round(avg(c.call_duration_sec), 2) AS avg_call_duration_sec
+            summary_sql = f"""
+            SELECT {', '.join(SUMMARY_COLUMNS)}
+            FROM manager_branch_summary
+            WHERE branch_id = %(branch_id)s
+              AND report_date = toDate(%(report_date)s)
+            ORDER BY report_date DESC
+            LIMIT 1
+            """
+            summary_rows = execute_query(client, "manager.branch_summary.summary", summary_sql, {"branch_id": selected_branch_id, "report_date": query_date})
+            s = summary_rows[0] if summary_rows else None
+
+        top_agents_sql = f"""
+        SELECT {TOP_AGENTS_SELECT}
         FROM calls_analyzed c
         INNER JOIN agents_enriched a ON c.agent_id = a.agent_id
         WHERE a.branch_id = %(branch_id)s
@@ -80,31 +132,100 @@ def branch_summary(
         ORDER BY calls_successful DESC, calls_made DESC
         LIMIT 5
         """
-        top_agents_rows = client.execute(top_agents_sql, {"branch_id": selected_branch_id, "report_date": query_date})
-        top_agents = [
-            {
-                "agent_id": row[0],
-                "calls_made": int(row[1] or 0),
-                "calls_successful": int(row[2] or 0),
-                "avg_call_duration_sec": float(row[3] or 0.0),
-            }
-            for row in top_agents_rows
-        ]
+        top_agents_rows = execute_query(client, "manager.branch_summary.top_agents", top_agents_sql, {"branch_id": selected_branch_id, "report_date": query_date})
 
-        return {
-            "agents_active_today": agents_active,
-            "calls_made": calls_made,
-            "collection_today": collection_today,
-            "target_pct": target_pct,
-            "top_agents": top_agents,
-            "followups_pending": followups_pending,
-            "generated_at": datetime.utcnow().isoformat(),
-            "calls_successful": calls_successful,
-            "collection_target": collection_target,
-        }
+        return _branch_payload(s, [_top_agent(row) for row in top_agents_rows])
 
-    result = get_or_fetch(cache_key, ttl=60, fetch_fn=_fetch)
+    result = get_or_fetch(cache_key, ttl=CACHE_TTLS["manager"], fetch_fn=_fetch)
     if isinstance(result, dict):
         result["cache_hit"] = cache_hit
         result.setdefault("generated_at", datetime.utcnow().isoformat())
     return result
+
+
+@router.get('/manager/branch-summary/batch')
+def branch_summary_batch(
+    branch_ids: str,
+    date: Optional[str] = None,
+    manager_id: Optional[str] = None,
+):
+    ids = list(dict.fromkeys(b.strip() for b in branch_ids.split(",") if b.strip()))
+    if not ids:
+        raise HTTPException(status_code=400, detail="branch_ids is required")
+    if len(ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} branch_ids per call")
+
+    query_date = date or datetime.utcnow().date().isoformat()
+
+    def _fetch_many(missing: List[str]) -> Dict[str, Dict]:
+        client = get_clickhouse_client()
+        params = {"branch_ids": tuple(missing), "report_date": query_date}
+
+        summary_rows = execute_query(
+            client,
+            "manager.branch_summary_batch.summary",
+            f"""
+            SELECT branch_id, {', '.join(SUMMARY_COLUMNS)}
+            FROM manager_branch_summary
+            WHERE branch_id IN %(branch_ids)s
+              AND report_date = toDate(%(report_date)s)
+            LIMIT 1 BY branch_id
+            """,
+            params,
+        )
+        summaries = {row[0]: row[1:] for row in summary_rows}
+
+        top_agents_rows = execute_query(
+            client,
+            "manager.branch_summary_batch.top_agents",
+            f"""
+            SELECT a.branch_id, {TOP_AGENTS_SELECT}
+            FROM calls_analyzed c
+            INNER JOIN agents_enriched a ON c.agent_id = a.agent_id
+            WHERE a.branch_id IN %(branch_ids)s
+              AND toDate(c.call_start_time) = toDate(%(report_date)s)
+            GROUP BY a.branch_id, c.agent_id
+            ORDER BY calls_successful DESC, calls_made DESC
+            LIMIT 5 BY a.branch_id
+            """,
+            params,
+        )
+        top_agents: Dict[str, List[Dict]] = {}
+        for row in top_agents_rows:
+            top_agents.setdefault(row[0], []).append(_top_agent(row[1:]))
+
+        return {
+            branch_id: _branch_payload(summaries.get(branch_id), top_agents.get(branch_id, []))
+            for branch_id in missing
+        }
+
+    cache_keys = {branch_id: _branch_cache_key(manager_id, branch_id, query_date) for branch_id in ids}
+    branches = get_or_fetch_many(cache_keys, ttl=CACHE_TTLS["manager"], fetch_many_fn=_fetch_many)
+
+    return {
+        "date": query_date,
+        "branches": branches,
+        "generated_at": datetime.utcnow().isoformat(),
+    }
+
+
+@router.get('/manager/branch-summary/stream')
+def branch_summary_stream(
+    branch_id: Optional[str] = None,
+    date: Optional[str] = None,
+    manager_id: Optional[str] = None,
+):
+    selected_branch_id = branch_id or ""
+    if not selected_branch_id:
+        raise HTTPException(status_code=400, detail="branch_id is required for this demo")
+
+    query_date = date or datetime.utcnow().date().isoformat()
+
+    def _compute():
+        return branch_summary(branch_id=selected_branch_id, date=query_date, manager_id=manager_id)
+
+    return StreamingResponse(
+        branch_feed.stream((manager_id or "demo", selected_branch_id, query_date), _compute),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
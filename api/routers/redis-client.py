@@ -1,13 +1,21 @@
 import redis
 
+from config import settings
+
+
 def get_redis():
 
+    # Text-mode client for ad-hoc use; the API itself shares api.clients.get_redis().
     return redis.Redis(
 
-        host="redis",   # docker service name
+        host=settings.redis_host,
+
+        port=settings.redis_port,
+
+        db=settings.redis_db,
 
-        port=6379,
+        socket_timeout=settings.redis_socket_timeout_sec,
 
         decode_responses=True
 
-    )
\ No newline at end of file
+    )
@@ -0,0 +1,47 @@
+"""Response models for the large dashboard payloads.
+
+These describe the responses in the OpenAPI schema only. The endpoints
+build plain dicts (they are cached as JSON in Redis) and return them
+through `json_response`, so FastAPI neither validates them against the
+model nor runs jsonable_encoder on every request.
+"""
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class AssignedLoan(BaseModel):
+    # Every field is optional: `fields=` projects the row.
+    loan_id: Optional[str] = None
+    borrower_name: Optional[str] = None
+    dpd_days: Optional[int] = None
+    overdue_amount: Optional[float] = None
+    loan_aging_bucket: Optional[str] = None
+    last_call_at: Optional[str] = None
+    last_call_status: Optional[str] = None
+    last_call_duration: Optional[int] = None
+    followup_due: Optional[bool] = None
+    calls_today: Optional[int] = None
+
+
+class AssignedLoansPage(BaseModel):
+    loans: List[AssignedLoan]
+    next_cursor: Optional[str] = None
+    limit: Optional[int] = None
+    total: int
+    followups_due: int
+    cache_hit: bool
+    generated_at: str
+
+
+class AgentPerformance(BaseModel):
+    agent_id: str
+    total_calls: int
+    success_rate: float
+    talk_time: float
+    collections: float
+
+
+class HrPerformance(BaseModel):
+    agents: List[AgentPerformance]
+    generated_at: str
@@ -1,31 +1,248 @@
-from dotenv import load_dotenv
+from dataclasses import dataclass, field
+import json
 import os
+from typing import Dict, List, Tuple
+
+from dotenv import load_dotenv
+
+
+# Configuration for DB URIs, pool sizes, timeouts, TTLs and thresholds.
+# Everything is read from the environment (or .env) once, into `settings`;
+# the module-level names below are kept for existing imports.
+
+
+def _int(name, default):
+    return int(os.getenv(name, str(default)))
+
+
+def _float(name, default):
+    return float(os.getenv(name, str(default)))
+
+
+# Token bucket per (role, user): "<tokens per second>:<burst>"
+def _rate(name, default):
+    rate, burst = os.getenv(f"RATE_LIMIT_{name.upper()}", default).split(":")
+    return float(rate), float(burst)
+
+
+@dataclass(frozen=True)
+class Settings:
+
+    # PostgreSQL
+    pg_host: str = "localhost"
+    pg_port: int = 5432
+    pg_user: str = ""
+    pg_password: str = ""
+    pg_database: str = ""
+    pg_pool_min: int = 1
+    pg_pool_max: int = 5
+    pg_connect_timeout_sec: int = 10
+
+    # ClickHouse (native protocol)
+    ch_host: str = "localhost"
+    ch_port: int = 9000
+    ch_database: str = "compliance"
+    ch_user: str = "default"
+    ch_password: str = ""
+    ch_pool_size: int = 16
+    ch_pool_timeout_sec: float = 5.0
+    ch_connect_timeout_sec: float = 10.0
+    ch_send_receive_timeout_sec: float = 300.0
+
+    # Redis
+    redis_host: str = "localhost"
+    redis_port: int = 6379
+    redis_db: int = 0
+    redis_max_connections: int = 64
+    redis_socket_timeout_sec: float = 5.0
+
+    # Serving cache
+    cache_ttls: Dict[str, int] = field(default_factory=dict)
+    cache_warm_top_n: int = 20
+
+    # Audit log writer: "file" (rotating JSON lines) or "clickhouse"
+    audit_sink: str = "file"
+    audit_log_path: str = "logs/audit.log"
+    audit_log_max_bytes: int = 50 * 1024 * 1024
+    audit_log_backups: int = 5
+    audit_queue_size: int = 10000
+    audit_batch_size: int = 500
+    audit_flush_interval_sec: float = 1.0
+
+    # Client-side ClickHouse profile records, joined with system.query_log by api/query_profile.py
+    query_profile_log_path: str = "logs/query_profile.log"
+    query_profile_log_max_bytes: int = 50 * 1024 * 1024
+    query_profile_log_backups: int = 5
+
+    # JWT verification (api/auth.py). HS* tokens use jwt_secret; RS* tokens use
+    # the PEM public key at jwt_public_key_path.
+    jwt_secret: str = ""
+    jwt_public_key_path: str = ""
+    jwt_algorithms: List[str] = field(default_factory=lambda: ["HS256"])
+    jwt_leeway_sec: int = 30
+    jwt_cache_size: int = 10000
+    jwt_cache_max_ttl_sec: int = 300
+
+    rate_limits: Dict[str, Tuple[float, float]] = field(default_factory=dict)
+
+    # In-flight ClickHouse queries per endpoint; overrides as JSON {route path: limit}
+    ch_max_inflight_default: int = 8
+    ch_max_inflight_per_endpoint: Dict[str, int] = field(default_factory=dict)
+    ch_queue_deadline_sec: float = 2.0
+
+    # Response compression: bodies smaller than the threshold are sent as-is
+    compress_min_bytes: int = 1024
+    compress_gzip_level: int = 6
+    compress_brotli_quality: int = 5
+
+    # Readiness probes run in the background; /readyz serves the last result
+    health_probe_interval_sec: float = 10.0
+    health_stale_after_sec: float = 30.0
+
+    @property
+    def pg_conn_str(self) -> str:
+        return f"postgresql://{self.pg_user}:{self.pg_password}@{self.pg_host}:{self.pg_port}/{self.pg_database}"
+
+    @property
+    def clickhouse_conn_str(self) -> str:
+        return f"clickhouse://{self.ch_user}:{self.ch_password}@{self.ch_host}:{self.ch_port}/{self.ch_database}"
+
+    @property
+    def redis_url(self) -> str:
+        return f"redis://{self.redis_host}:{self.redis_port}/{self.redis_db}"
+
+
+def load_settings() -> Settings:
+    """Read the environment once. Opens no connections."""
+
+    load_dotenv()
+
+    return Settings(
+        pg_host=os.getenv("PG_HOST", "localhost"),
+        pg_port=_int("PG_PORT", 5432),
+        pg_user=os.getenv("PG_USER", ""),
+        pg_password=os.getenv("PG_PASSWORD", ""),
+        pg_database=os.getenv("PG_DATABASE", ""),
+        pg_pool_min=_int("PG_POOL_MIN", 1),
+        pg_pool_max=_int("PG_POOL_MAX", 5),
+        pg_connect_timeout_sec=_int("PG_CONNECT_TIMEOUT_SEC", 10),
+
+        ch_host=os.getenv("CH_HOST", "localhost"),
+        ch_port=_int("CH_PORT", 9000),
+        ch_database=os.getenv("CH_DATABASE", "compliance"),
+        ch_user=os.getenv("CH_USER", "default"),
+        ch_password=os.getenv("CH_PASSWORD", ""),
+        ch_pool_size=_int("CH_POOL_SIZE", 16),
+        ch_pool_timeout_sec=_float("CH_POOL_TIMEOUT_SEC", 5.0),
+        ch_connect_timeout_sec=_float("CH_CONNECT_TIMEOUT_SEC", 10.0),
+        ch_send_receive_timeout_sec=_float("CH_SEND_RECEIVE_TIMEOUT_SEC", 300.0),
+
+        redis_host=os.getenv("REDIS_HOST", "localhost"),
+        redis_port=_int("REDIS_PORT", 6379),
+        redis_db=_int("REDIS_DB", 0),
+        redis_max_connections=_int("REDIS_MAX_CONNECTIONS", 64),
+        redis_socket_timeout_sec=_float("REDIS_SOCKET_TIMEOUT_SEC", 5.0),
+
+        cache_ttls={
+            "lender": _int("CACHE_TTL_LENDER", 3600),
+            "agent": _int("CACHE_TTL_AGENT", 30),
+            "manager": _int("CACHE_TTL_MANAGER", 60),
+            "hr": _int("CACHE_TTL_HR", 60),
+        },
+        cache_warm_top_n=_int("CACHE_WARM_TOP_N", 20),
+
+        audit_sink=os.getenv("AUDIT_SINK", "file"),
+        audit_log_path=os.getenv("AUDIT_LOG_PATH", "logs/audit.log"),
+        audit_log_max_bytes=_int("AUDIT_LOG_MAX_BYTES", 50 * 1024 * 1024),
+        audit_log_backups=_int("AUDIT_LOG_BACKUPS", 5),
+        audit_queue_size=_int("AUDIT_QUEUE_SIZE", 10000),
+        audit_batch_size=_int("AUDIT_BATCH_SIZE", 500),
+        audit_flush_interval_sec=_float("AUDIT_FLUSH_INTERVAL_SEC", 1.0),
+
+        query_profile_log_path=os.getenv("QUERY_PROFILE_LOG_PATH", "logs/query_profile.log"),
+        query_profile_log_max_bytes=_int("QUERY_PROFILE_LOG_MAX_BYTES", 50 * 1024 * 1024),
+        query_profile_log_backups=_int("QUERY_PROFILE_LOG_BACKUPS", 5),
+
+        jwt_secret=os.getenv("JWT_SECRET", ""),
+        jwt_public_key_path=os.getenv("JWT_PUBLIC_KEY_PATH", ""),
+        jwt_algorithms=[a.strip() for a in os.getenv("JWT_ALGORITHMS", "HS256").split(",") if a.strip()],
+        jwt_leeway_sec=_int("JWT_LEEWAY_SEC", 30),
+        jwt_cache_size=_int("JWT_CACHE_SIZE", 10000),
+        jwt_cache_max_ttl_sec=_int("JWT_CACHE_MAX_TTL_SEC", 300),
+
+        rate_limits={
+            "agent": _rate("agent", "2:10"),
+            "manager": _rate("manager", "5:20"),
+            "hr": _rate("hr", "2:10"),
+            "lender": _rate("lender", "2:10"),
+            "default": _rate("default", "1:5"),
+        },
+
+        ch_max_inflight_default=_int("CH_MAX_INFLIGHT_DEFAULT", 8),
+        ch_max_inflight_per_endpoint=json.loads(os.getenv("CH_MAX_INFLIGHT_PER_ENDPOINT", "{}")),
+        ch_queue_deadline_sec=_float("CH_QUEUE_DEADLINE_SEC", 2.0),
+
+        compress_min_bytes=_int("COMPRESS_MIN_BYTES", 1024),
+        compress_gzip_level=_int("COMPRESS_GZIP_LEVEL", 6),
+        compress_brotli_quality=_int("COMPRESS_BROTLI_QUALITY", 5),
+
+        health_probe_interval_sec=_float("HEALTH_PROBE_INTERVAL_SEC", 10.0),
+        health_stale_after_sec=_float("HEALTH_STALE_AFTER_SEC", 30.0),
+    )
+
+
+settings = load_settings()
+
+
+PG_HOST = settings.pg_host
+PG_PORT = settings.pg_port
+PG_USER = settings.pg_user
+PG_PASSWORD = settings.pg_password
+PG_DATABASE = settings.pg_database
+PG_CONN_STR = settings.pg_conn_str
+
+CH_HOST = settings.ch_host
+CH_PORT = settings.ch_port
+CH_DATABASE = settings.ch_database
+CH_USER = settings.ch_user
+CH_PASSWORD = settings.ch_password
+CLICKHOUSE_CONN_STR = settings.clickhouse_conn_str
+
+REDIS_HOST = settings.redis_host
+REDIS_PORT = settings.redis_port
+REDIS_URL = settings.redis_url
+
+CACHE_TTLS = settings.cache_ttls
+CACHE_WARM_TOP_N = settings.cache_warm_top_n
 
-load_dotenv()
+AUDIT_SINK = settings.audit_sink
+AUDIT_LOG_PATH = settings.audit_log_path
+AUDIT_LOG_MAX_BYTES = settings.audit_log_max_bytes
+AUDIT_LOG_BACKUPS = settings.audit_log_backups
+AUDIT_QUEUE_SIZE = settings.audit_queue_size
+AUDIT_BATCH_SIZE = settings.audit_batch_size
+AUDIT_FLUSH_INTERVAL_SEC = settings.audit_flush_interval_sec
 
-# Configuration for DB URIs, TTLs, thresholds
-PG_HOST = os.getenv("PG_HOST")
-PG_PORT = os.getenv("PG_PORT")
-PG_USER = os.getenv("PG_USER")
-PG_PASSWORD = os.getenv("PG_PASSWORD")
-PG_DATABASE = os.getenv("PG_DATABASE")
+QUERY_PROFILE_LOG_PATH = settings.query_profile_log_path
+QUERY_PROFILE_LOG_MAX_BYTES = settings.query_profile_log_max_bytes
+QUERY_PROFILE_LOG_BACKUPS = settings.query_profile_log_backups
 
-PG_CONN_STR = f"postgresql://{PG_USER}:{PG_PASSWORD}@{PG_HOST}:{PG_PORT}/{PG_DATABASE}"
+JWT_SECRET = settings.jwt_secret
+JWT_PUBLIC_KEY_PATH = settings.jwt_public_key_path
+JWT_ALGORITHMS = settings.jwt_algorithms
+JWT_LEEWAY_SEC = settings.jwt_leeway_sec
+JWT_CACHE_SIZE = settings.jwt_cache_size
+JWT_CACHE_MAX_TTL_SEC = settings.jwt_cache_max_ttl_sec
 
-CH_HOST = os.getenv("CH_HOST")
-CH_PORT = os.getenv("CH_PORT")
-CH_DATABASE = os.getenv("CH_DATABASE")
-CH_USER = os.getenv("CH_USER")
-CH_PASSWORD = os.getenv("CH_PASSWORD", "")
-CLICKHOUSE_CONN_STR = f"clickhouse://{CH_USER}:{CH_PASSWORD}@{CH_HOST}:{CH_PORT}/{CH_DATABASE}"
+RATE_LIMITS = settings.rate_limits
 
-REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
-REDIS_PORT = os.getenv("REDIS_PORT", "6379")
-REDIS_URL = f"redis://{REDIS_HOST}:{REDIS_PORT}/0"
+CH_MAX_INFLIGHT_DEFAULT = settings.ch_max_inflight_default
+CH_MAX_INFLIGHT_PER_ENDPOINT = settings.ch_max_inflight_per_endpoint
+CH_QUEUE_DEADLINE_SEC = settings.ch_queue_deadline_sec
 
-CACHE_TTLS = {
-    "agent": 30,
-    "manager": 60,
-    "hr": 60,
-}
+COMPRESS_MIN_BYTES = settings.compress_min_bytes
+COMPRESS_GZIP_LEVEL = settings.compress_gzip_level
+COMPRESS_BROTLI_QUALITY = settings.compress_brotli_quality
 
+HEALTH_PROBE_INTERVAL_SEC = settings.health_probe_interval_sec
+HEALTH_STALE_AFTER_SEC = settings.health_stale_after_sec
@@ -11,6 +11,29 @@ function setStatus(msg) {
   if (el) el.textContent = msg || '';
 }
 
+function authHeaders() {
+  const token = localStorage.getItem('authToken');
+  return token ? { Authorization: `Bearer ${token}` } : {};
+}
+
+// url -> { etag, data } of the last 200 response, replayed on 304.
+const responseCache = new Map();
+
+// GET with If-None-Match; the API answers 304 while its cache entry is unchanged.
+async function getJson(url) {
+  const key = url.toString();
+  const cached = responseCache.get(key);
+  const headers = authHeaders();
+  if (cached) headers['If-None-Match'] = cached.etag;
+  const res = await fetch(url, { headers, cache: 'no-store' });
+  if (res.status === 304 && cached) return cached.data;
+  const data = await res.json();
+  const etag = res.headers.get('ETag');
+  if (res.ok && etag) responseCache.set(key, { etag, data });
+  else responseCache.delete(key);
+  return data;
+}
+
 function apiBase() {
   return document.getElementById('apiBase').value.trim().replace(/\/$/, '');
 }
@@ -40,6 +63,7 @@ async function run(action) {
   if (action === 'lender') return fetchLender();
   if (action === 'agent') return fetchAgent();
   if (action === 'manager') return fetchManager();
+  if (action === 'managerLive') return streamManager();
   if (action === 'hr') return fetchHr();
 }
 
@@ -57,8 +81,7 @@ async function fetchLender() {
   url.searchParams.set('lender_id', lender_id);
   if (bucket_filter) url.searchParams.set('bucket_filter', bucket_filter);
   setPanel('lender', { loading: true });
-  const res = await fetch(url);
-  const data = await res.json();
+  const data = await getJson(url);
   setPanel('lender', data);
 }
 
@@ -70,8 +93,7 @@ async function fetchAgent() {
   url.searchParams.set('agent_id', agent_id);
   if (status_filter) url.searchParams.set('status_filter', status_filter);
   setPanel('agent', { loading: true });
-  const res = await fetch(url);
-  const data = await res.json();
+  const data = await getJson(url);
   setPanel('agent', data);
 }
 
@@ -83,15 +105,45 @@ async function fetchManager() {
   url.searchParams.set('branch_id', branch_id);
   if (date) url.searchParams.set('date', date);
   setPanel('manager', { loading: true });
-  const res = await fetch(url);
-  const data = await res.json();
+  const data = await getJson(url);
   setPanel('manager', data);
 }
 
+let managerStream = null;
+
+// Subscribes to the branch SSE feed instead of polling. Uses fetch so the
+// Authorization header can be sent (EventSource cannot set headers).
+async function streamManager() {
+  const branch_id = byId('branchId').value.trim();
+  const date = byId('branchDate').value.trim();
+  if (!branch_id) return setPanel('manager', { error: 'branch_id is required' });
+  if (managerStream) managerStream.abort();
+  managerStream = new AbortController();
+  const url = new URL(apiBase() + '/dashboard/manager/branch-summary/stream');
+  url.searchParams.set('branch_id', branch_id);
+  if (date) url.searchParams.set('date', date);
+  setPanel('manager', { loading: true, live: true });
+  const res = await fetch(url, { headers: authHeaders(), signal: managerStream.signal });
+  if (!res.ok) return setPanel('manager', { error: `HTTP ${res.status}` });
+  const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = '';
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += value;
+    let sep;
+    while ((sep = buffer.indexOf('\n\n')) >= 0) {
+      const frame = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+      const data = frame.split('\n').filter((l) => l.startsWith('data: ')).map((l) => l.slice(6)).join('\n');
+      if (data) setPanel('manager', JSON.parse(data));
+    }
+  }
+}
+
 async function fetchHr() {
   const url = new URL(apiBase() + '/dashboard/hr/performance');
   setPanel('hr', { loading: true });
-  const res = await fetch(url);
-  const data = await res.json();
+  const data = await getJson(url);
   setPanel('hr', data);
 }
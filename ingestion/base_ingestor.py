@@ -2,9 +2,12 @@
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from datetime import datetime, timezone
+import hashlib
+import json
 import logging
+import os
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Optional
 
 import pandas as pd
 import psycopg2
@@ -12,29 +15,52 @@ from psycopg2 import pool
 from psycopg2.extras import execute_values
 from psycopg2 import sql
 
-
-@dataclass
-class ValidationReport:
-    is_valid: bool
-    errors: List[str]
-    warning_rows: List[int]
-    null_counts: Dict[str, int]
-    duplicate_count: int
+from quality.profiling import detect_drift, ensure_profile_table, load_previous_profile, profile_csv, save_profile
+from quality.report import ValidationReport  # noqa: F401 (re-exported)
 
 
 @dataclass
 class WriteResult:
     rows_written: int
     rows_skipped: int
-    status: str  # success | partial | failed
+    status: str  # success | partial | failed | unchanged
     error_msg: Optional[str]
+    rows_quarantined: int = 0
+    rows_unchanged: int = 0
 
 
 class BaseIngestor(ABC):
-    def __init__(self, source_name, pg_conn_str, csv_path):
+    def __init__(
+        self,
+        source_name,
+        pg_conn_str,
+        csv_path,
+        pool_min=None,
+        pool_max=None,
+        profile=None,
+        quarantine=None,
+        row_hashing=None,
+    ):
         self.source_name = source_name
         self.pg_conn_str = pg_conn_str
         self.csv_path = Path(csv_path)
+        self.pool_min = pool_min if pool_min is not None else int(os.getenv("PG_POOL_MIN", "1"))
+        self.pool_max = pool_max if pool_max is not None else int(os.getenv("PG_POOL_MAX", "5"))
+        self._pool = None
+        if profile is None:
+            profile = os.getenv("INGEST_PROFILE", "").lower() in ("1", "true", "yes")
+        self.profile = profile
+        # Quarantine mode: load the valid rows and park invalid ones in
+        # ingestion_quarantine instead of rejecting the whole file.
+        if quarantine is None:
+            quarantine = os.getenv("INGEST_QUARANTINE", "").lower() in ("1", "true", "yes")
+        self.quarantine = quarantine
+        # Row hashing: compare each row's hash with ingestion_row_hash and
+        # upsert only new or changed rows.
+        if row_hashing is None:
+            row_hashing = os.getenv("INGEST_ROW_HASH", "").lower() in ("1", "true", "yes")
+        self.row_hashing = row_hashing
+        self.profile_chunksize = int(os.getenv("INGEST_PROFILE_CHUNKSIZE", "100000"))
 
         self.logger = logging.getLogger(f"ingestion.{self.source_name}")
         if not self.logger.handlers:
@@ -53,11 +79,16 @@ class BaseIngestor(ABC):
             "started_at": datetime.now(timezone.utc),
         }
 
-        self.pool = pool.SimpleConnectionPool(
-            minconn=1,
-            maxconn=5,
-            dsn=self.pg_conn_str,
-        )
+    @property
+    def pool(self):
+        # Opened on first write, so constructing ingestors connects to nothing.
+        if self._pool is None:
+            self._pool = pool.SimpleConnectionPool(
+                minconn=self.pool_min,
+                maxconn=self.pool_max,
+                dsn=self.pg_conn_str,
+            )
+        return self._pool
 
     @abstractmethod
     def load_csv(self):
@@ -92,9 +123,149 @@ class BaseIngestor(ABC):
             )
             """
         )
+        cursor.execute("ALTER TABLE ingestion_log ADD COLUMN IF NOT EXISTS content_hash TEXT")
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS ingestion_log_content_hash_idx ON ingestion_log (source, content_hash)"
+        )
+
+    def _ensure_row_hash_table(self, cursor) -> None:
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ingestion_row_hash (
+                source TEXT NOT NULL,
+                pk TEXT NOT NULL,
+                row_hash BIGINT NOT NULL,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                PRIMARY KEY (source, pk)
+            )
+            """
+        )
+
+    def file_hash(self, block_size=1 << 20) -> str:
+        digest = hashlib.sha256()
+        with self.csv_path.open("rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def is_unchanged(self, content_hash) -> bool:
+        """True when this exact file content was already loaded for this source."""
+        conn = None
+        try:
+            conn = self.pool.getconn()
+            with conn.cursor() as cursor:
+                self._ensure_ingestion_log_table(cursor)
+                cursor.execute(
+                    """
+                    SELECT 1 FROM ingestion_log
+                    WHERE source = %s AND content_hash = %s AND status IN ('success', 'partial')
+                    LIMIT 1
+                    """,
+                    (self.source_name, content_hash),
+                )
+                found = cursor.fetchone() is not None
+            conn.commit()
+            return found
+        finally:
+            if conn is not None:
+                self.pool.putconn(conn)
+
+    def _row_hashes(self, df, primary_key) -> pd.DataFrame:
+        # Load metadata changes every run, so it is left out of the hash.
+        data_columns = [c for c in df.columns if c not in ("ingested_at", "source_file")]
+        hashes = pd.util.hash_pandas_object(df[data_columns].astype(str), index=False)
+        return pd.DataFrame({
+            "pk": df[primary_key].astype(str).to_numpy(),
+            # BIGINT is signed; reinterpret the uint64 bits
+            "row_hash": hashes.to_numpy().view("int64"),
+        })
+
+    def _filter_changed_rows(self, cursor, df, primary_key):
+        """Rows whose hash differs from ingestion_row_hash, plus their (pk, hash) pairs."""
+        self._ensure_row_hash_table(cursor)
+        hashes = self._row_hashes(df, primary_key)
+        cursor.execute(
+            "SELECT pk, row_hash FROM ingestion_row_hash WHERE source = %s AND pk = ANY(%s)",
+            (self.source_name, hashes["pk"].drop_duplicates().tolist()),
+        )
+        # Nullable Int64 keeps the 64-bit hashes exact through the left join
+        stored = pd.DataFrame(cursor.fetchall(), columns=["pk", "stored_hash"]).astype({"stored_hash": "Int64"})
+        merged = hashes.merge(stored, on="pk", how="left")
+        changed = merged["stored_hash"].ne(merged["row_hash"]).fillna(True).to_numpy(dtype=bool)
+        return df[changed], hashes[changed]
+
+    def _store_row_hashes(self, cursor, hashes) -> None:
+        if hashes.empty:
+            return
+        now = datetime.now(timezone.utc)
+        execute_values(
+            cursor,
+            """
+            INSERT INTO ingestion_row_hash (source, pk, row_hash, updated_at) VALUES %s
+            ON CONFLICT (source, pk) DO UPDATE SET row_hash = EXCLUDED.row_hash, updated_at = EXCLUDED.updated_at
+            """,
+            # Last occurrence wins, like the upsert itself
+            [
+                (self.source_name, pk, int(row_hash), now)
+                for pk, row_hash in hashes.drop_duplicates("pk", keep="last").itertuples(index=False, name=None)
+            ],
+            page_size=1000,
+        )
+
+    def _ensure_quarantine_table(self, cursor) -> None:
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ingestion_quarantine (
+                id BIGSERIAL PRIMARY KEY,
+                source TEXT NOT NULL,
+                file_name TEXT NOT NULL,
+                row_number INTEGER NOT NULL,
+                error_mask BIGINT NOT NULL,
+                error_codes TEXT[] NOT NULL,
+                row_data JSONB NOT NULL,
+                quarantined_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            )
+            """
+        )
+
+    def _write_quarantine(self, cursor, df, report) -> int:
+        invalid = ~report.valid_mask
+        if not invalid.any():
+            return 0
+
+        self._ensure_quarantine_table(cursor)
+        positions = invalid.nonzero()[0]
+        masks = report.row_errors[positions]
+        rows = json.loads(df.iloc[positions].to_json(orient="records", date_format="iso"))
+        quarantined_at = datetime.now(timezone.utc)
+        records = [
+            (
+                self.source_name,
+                self.source_metadata["file_name"],
+                int(position),
+                # BIGINT is signed; bit 63 wraps to a negative number
+                int(mask.astype("int64")),
+                report.codes(mask),
+                json.dumps(row),
+                quarantined_at,
+            )
+            for position, mask, row in zip(positions, masks, rows)
+        ]
+        execute_values(
+            cursor,
+            """
+            INSERT INTO ingestion_quarantine
+                (source, file_name, row_number, error_mask, error_codes, row_data, quarantined_at)
+            VALUES %s
+            """,
+            records,
+            page_size=1000,
+        )
+        return len(records)
 
     def write_to_postgres(self, df, report):
-        if not report.is_valid:
+        quarantine = self.quarantine and not report.has_file_errors
+        if not report.is_valid and not quarantine:
             error_msg = "; ".join(report.errors) if report.errors else "Validation failed"
             self.logger.error(
                 "Ingestion aborted for source=%s due to validation errors: %s",
@@ -111,6 +282,8 @@ class BaseIngestor(ABC):
         conn = None
         rows_written = 0
         rows_skipped = len(report.warning_rows)
+        rows_quarantined = 0
+        rows_unchanged = 0
 
         try:
             conn = self.pool.getconn()
@@ -119,6 +292,16 @@ class BaseIngestor(ABC):
             with conn.cursor() as cursor:
                 self._ensure_ingestion_log_table(cursor)
 
+                if quarantine:
+                    rows_quarantined = self._write_quarantine(cursor, df, report)
+                    df = df[report.valid_mask]
+
+                changed_hashes = None
+                if self.row_hashing and not df.empty:
+                    total = len(df.index)
+                    df, changed_hashes = self._filter_changed_rows(cursor, df, self._resolve_primary_key(df))
+                    rows_unchanged = total - len(df.index)
+
                 if not df.empty:
                     table_name = self._table_name()
                     columns = [str(column) for column in df.columns]
@@ -155,11 +338,15 @@ class BaseIngestor(ABC):
                     execute_values(cursor, query.as_string(conn), records)
                     rows_written = len(records)
 
-                status = "partial" if rows_skipped > 0 else "success"
+                if changed_hashes is not None:
+                    self._store_row_hashes(cursor, changed_hashes)
+
+                status = "partial" if rows_skipped or rows_quarantined else "success"
+                error_msg = "; ".join(report.errors) if rows_quarantined else None
                 cursor.execute(
                     """
-                    INSERT INTO ingestion_log (source, file_name, row_count, timestamp, status, error_msg)
-                    VALUES (%s, %s, %s, %s, %s, %s)
+                    INSERT INTO ingestion_log (source, file_name, row_count, timestamp, status, error_msg, content_hash)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
                     """,
                     (
                         self.source_name,
@@ -167,23 +354,29 @@ class BaseIngestor(ABC):
                         rows_written,
                         datetime.now(timezone.utc),
                         status,
-                        None,
+                        error_msg,
+                        self.source_metadata.get("content_hash"),
                     ),
                 )
 
             conn.commit()
             self.logger.info(
-                "Ingestion completed for source=%s with status=%s rows_written=%s rows_skipped=%s",
+                "Ingestion completed for source=%s with status=%s rows_written=%s rows_skipped=%s "
+                "rows_quarantined=%s rows_unchanged=%s",
                 self.source_name,
                 status,
                 rows_written,
                 rows_skipped,
+                rows_quarantined,
+                rows_unchanged,
             )
             return WriteResult(
                 rows_written=rows_written,
                 rows_skipped=rows_skipped,
                 status=status,
-                error_msg=None,
+                error_msg=error_msg,
+                rows_quarantined=rows_quarantined,
+                rows_unchanged=rows_unchanged,
             )
         except Exception as exc:
             if conn is not None:
@@ -199,7 +392,56 @@ class BaseIngestor(ABC):
             if conn is not None:
                 self.pool.putconn(conn)
 
+    def profile_file(self):
+        """Sketch-profile the raw file in one chunked pass and store it with its drift warnings."""
+        profile = profile_csv(self.csv_path, self.source_name, chunksize=self.profile_chunksize)
+
+        conn = None
+        try:
+            conn = self.pool.getconn()
+            conn.autocommit = False
+            with conn.cursor() as cursor:
+                ensure_profile_table(cursor)
+                drift = detect_drift(profile, load_previous_profile(cursor, self.source_name))
+                save_profile(cursor, profile, drift)
+            conn.commit()
+        except Exception:
+            if conn is not None:
+                conn.rollback()
+            raise
+        finally:
+            if conn is not None:
+                self.pool.putconn(conn)
+
+        for warning in drift:
+            self.logger.warning("Profile drift for source=%s: %s", self.source_name, warning)
+        self.logger.info(
+            "Profiled source=%s file=%s rows=%s drift_warnings=%s",
+            self.source_name,
+            profile.file_name,
+            profile.row_count,
+            len(drift),
+        )
+        return profile, drift
+
     def run(self):
+        content_hash = self.file_hash()
+        self.source_metadata["content_hash"] = content_hash
+        if self.is_unchanged(content_hash):
+            self.logger.info(
+                "Skipping source=%s: file %s (sha256 %s) was already loaded",
+                self.source_name,
+                self.source_metadata["file_name"],
+                content_hash[:12],
+            )
+            return WriteResult(rows_written=0, rows_skipped=0, status="unchanged", error_msg=None)
+
+        if self.profile:
+            try:
+                self.profile_file()
+            except Exception:
+                # Profiling is advisory; never block the load on it.
+                self.logger.exception("Profiling failed for source=%s", self.source_name)
         df = self.load_csv()
         report = self.validate(df)
         result = self.write_to_postgres(df, report)
@@ -1,7 +1,10 @@
 import pandas as pd
 from psycopg2 import sql
 
-from .base_ingestor import BaseIngestor, ValidationReport
+from quality.report import ValidationReport
+from quality.validators import flag_required, null_counts
+
+from .base_ingestor import BaseIngestor
 
 class CallIngestor(BaseIngestor):
     def load_csv(self):
@@ -32,33 +35,25 @@ class CallIngestor(BaseIngestor):
         return df
 
     def validate(self, df):
-        errors = []
-
-        required_columns = ["call_id", "loan_id", "agent_id", "call_start_time"]
-        for column in required_columns:
-            if column not in df.columns:
-                errors.append(f"Missing required column: {column}")
-
-        for column in required_columns:
-            if column in df.columns:
-                missing_rows = df.index[df[column].isna() | (df[column].astype(str).str.strip() == "")].tolist()
-                if missing_rows:
-                    errors.append(f"Null/empty {column} at rows: {missing_rows[:25]}")
+        report = ValidationReport.for_rows(self.source_name, len(df.index))
+        flag_required(report, df, ["call_id", "loan_id", "agent_id", "call_start_time"])
 
         if "call_duration_sec" in df.columns:
             duration = pd.to_numeric(df["call_duration_sec"], errors="coerce")
-            invalid_rows = df.index[duration.isna() | (duration < 0) | (duration > 7200)].tolist()
-            if invalid_rows:
-                errors.append(f"call_duration_sec must be between 0 and 7200 at rows: {invalid_rows[:25]}")
+            report.flag(
+                "range:call_duration_sec",
+                duration.isna() | (duration < 0) | (duration > 7200),
+                "call_duration_sec must be between 0 and 7200",
+            )
 
         if "call_status" in df.columns and "transcript" in df.columns:
             status = df["call_status"].astype(str).str.upper().str.strip()
             transcript = df["transcript"].astype(str).str.strip()
-            invalid_rows = df.index[(status == "COMPLETED") & (transcript == "")].tolist()
-            if invalid_rows:
-                errors.append(
-                    f"transcript must be non-empty when call_status=COMPLETED at rows: {invalid_rows[:25]}"
-                )
+            report.flag(
+                "missing:transcript",
+                (status == "COMPLETED") & (transcript == ""),
+                "transcript must be non-empty when call_status=COMPLETED",
+            )
 
         if "loan_id" in df.columns:
             loan_ids = (
@@ -81,28 +76,19 @@ class CallIngestor(BaseIngestor):
                         )
                         existing = {row[0] for row in cursor.fetchall()}
 
-                    missing_fk_rows = df.index[
+                    report.flag(
+                        "fk:loan_id",
                         df["loan_id"].notna()
                         & df["loan_id"].astype(str).str.strip().ne("")
-                        & ~df["loan_id"].astype(str).isin(existing)
-                    ].tolist()
-                    if missing_fk_rows:
-                        errors.append(
-                            f"loan_id does not exist in loans table at rows: {missing_fk_rows[:25]}"
-                        )
+                        & ~df["loan_id"].astype(str).isin(existing),
+                        "loan_id does not exist in loans table",
+                    )
                 except Exception as exc:
-                    errors.append(f"FK validation query failed: {exc}")
+                    report.fail(f"FK validation query failed: {exc}")
                 finally:
                     if conn is not None:
                         self.pool.putconn(conn)
 
-        null_counts = {column: int(df[column].isna().sum()) for column in df.columns}
-        duplicate_count = int(df["call_id"].duplicated().sum()) if "call_id" in df.columns else 0
-
-        return ValidationReport(
-            is_valid=len(errors) == 0,
-            errors=errors,
-            warning_rows=[],
-            null_counts=null_counts,
-            duplicate_count=duplicate_count,
-        )
+        report.null_counts = null_counts(df)
+        report.duplicate_count = int(df["call_id"].duplicated().sum()) if "call_id" in df.columns else 0
+        return report
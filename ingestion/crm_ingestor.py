@@ -1,6 +1,9 @@
 import pandas as pd
 
-from .base_ingestor import BaseIngestor, ValidationReport
+from quality.report import ValidationReport
+from quality.validators import flag_required, null_counts
+
+from .base_ingestor import BaseIngestor
 
 class CRMIngestor(BaseIngestor):
     def load_csv(self):
@@ -10,23 +13,9 @@ class CRMIngestor(BaseIngestor):
         return df
 
     def validate(self, df):
-        errors = []
-        required_columns = ["customer_id", "name", "phone_number"]
-        for column in required_columns:
-            if column not in df.columns:
-                errors.append(f"Missing required column: {column}")
-            else:
-                missing_rows = df.index[df[column].isna() | (df[column].astype(str).str.strip() == "")].tolist()
-                if missing_rows:
-                    errors.append(f"Null/empty {column} at rows: {missing_rows[:25]}")
-
-        null_counts = {column: int(df[column].isna().sum()) for column in df.columns}
-        duplicate_count = int(df["customer_id"].duplicated().sum()) if "customer_id" in df.columns else 0
+        report = ValidationReport.for_rows(self.source_name, len(df.index))
+        flag_required(report, df, ["customer_id", "name", "phone_number"])
 
-        return ValidationReport(
-            is_valid=len(errors) == 0,
-            errors=errors,
-            warning_rows=[],
-            null_counts=null_counts,
-            duplicate_count=duplicate_count,
-        )
+        report.null_counts = null_counts(df)
+        report.duplicate_count = int(df["customer_id"].duplicated().sum()) if "customer_id" in df.columns else 0
+        return report
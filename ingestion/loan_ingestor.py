@@ -1,8 +1,12 @@
 from datetime import datetime, timezone
 
+import numpy as np
 import pandas as pd
 
-from .base_ingestor import BaseIngestor, ValidationReport
+from quality.report import ValidationReport
+from quality.validators import blank_mask, flag_required, null_counts
+
+from .base_ingestor import BaseIngestor
 
 class LoanIngestor(BaseIngestor):
     def load_csv(self):
@@ -43,89 +47,57 @@ class LoanIngestor(BaseIngestor):
         return df
 
     def validate(self, df):
-        errors = []
-        warning_rows = set()
-
-        required_columns = [
-            "loan_id",
-            "borrower_id",
-            "principal_amount",
-            "disbursement_date",
-        ]
-        for column in required_columns:
-            if column not in df.columns:
-                errors.append(f"Missing required column: {column}")
+        report = ValidationReport.for_rows(self.source_name, len(df.index))
+        flag_required(report, df, ["loan_id", "borrower_id", "principal_amount", "disbursement_date"])
 
         if "loan_id" in df.columns:
-            null_loan_id_rows = df.index[df["loan_id"].isna() | (df["loan_id"].astype(str).str.strip() == "")].tolist()
-            if null_loan_id_rows:
-                errors.append(f"Null/empty loan_id at rows: {null_loan_id_rows[:25]}")
-
-            duplicate_mask = (
-                df["loan_id"].notna()
-                & (df["loan_id"].astype(str).str.strip() != "")
-                & df["loan_id"].duplicated(keep=False)
+            report.flag(
+                "duplicate:loan_id",
+                ~blank_mask(df["loan_id"]) & df["loan_id"].duplicated(keep=False).to_numpy(dtype=bool),
+                "Duplicate loan_id",
             )
-            duplicate_rows = df.index[duplicate_mask].tolist()
-            if duplicate_rows:
-                errors.append(f"Duplicate loan_id found at rows: {duplicate_rows[:25]}")
-
-        for column in ["borrower_id", "principal_amount", "disbursement_date"]:
-            if column in df.columns:
-                missing_rows = df.index[df[column].isna() | (df[column].astype(str).str.strip() == "")].tolist()
-                if missing_rows:
-                    errors.append(f"Null/empty {column} at rows: {missing_rows[:25]}")
 
         if "principal_amount" in df.columns:
             principal = pd.to_numeric(df["principal_amount"], errors="coerce")
-            invalid_rows = df.index[principal.isna() | (principal <= 0)].tolist()
-            if invalid_rows:
-                errors.append(f"principal_amount must be > 0 at rows: {invalid_rows[:25]}")
+            report.flag("invalid:principal_amount", principal.isna() | (principal <= 0), "principal_amount must be > 0")
 
         if "interest_rate" in df.columns:
             interest = pd.to_numeric(df["interest_rate"], errors="coerce")
-            invalid_rows = df.index[interest.notna() & ((interest < 0) | (interest > 100))].tolist()
-            if invalid_rows:
-                errors.append(f"interest_rate must be between 0 and 100 at rows: {invalid_rows[:25]}")
+            report.flag(
+                "range:interest_rate",
+                interest.notna() & ((interest < 0) | (interest > 100)),
+                "interest_rate must be between 0 and 100",
+            )
 
         if "disbursement_date" in df.columns:
             disbursement_dates = pd.to_datetime(df["disbursement_date"], errors="coerce", utc=True)
             today = pd.Timestamp.now(tz="UTC")
             too_old = pd.Timestamp("2010-01-01", tz="UTC")
 
-            invalid_date_rows = df.index[disbursement_dates.isna()].tolist()
-            if invalid_date_rows:
-                errors.append(f"Invalid disbursement_date format at rows: {invalid_date_rows[:25]}")
-
-            future_rows = df.index[disbursement_dates.notna() & (disbursement_dates > today)].tolist()
-            if future_rows:
-                errors.append(f"disbursement_date cannot be in future at rows: {future_rows[:25]}")
-
-            old_rows = df.index[disbursement_dates.notna() & (disbursement_dates < too_old)].tolist()
-            if old_rows:
-                errors.append(f"disbursement_date cannot be before 2010-01-01 at rows: {old_rows[:25]}")
+            report.flag("format:disbursement_date", disbursement_dates.isna(), "Invalid disbursement_date format")
+            report.flag(
+                "future:disbursement_date",
+                disbursement_dates.notna() & (disbursement_dates > today),
+                "disbursement_date cannot be in future",
+            )
+            report.flag(
+                "too_old:disbursement_date",
+                disbursement_dates.notna() & (disbursement_dates < too_old),
+                "disbursement_date cannot be before 2010-01-01",
+            )
 
         if "loan_status" in df.columns:
             allowed_status = {"ACTIVE", "CLOSED", "NPA", "WRITTEN_OFF"}
             normalized_status = df["loan_status"].astype(str).str.upper().str.strip()
-            invalid_status_rows = df.index[~normalized_status.isin(allowed_status)].tolist()
-            if invalid_status_rows:
-                errors.append(
-                    f"Invalid loan_status (allowed: ACTIVE,CLOSED,NPA,WRITTEN_OFF) at rows: {invalid_status_rows[:25]}"
-                )
-
-        if "phone_number" in df.columns:
-            warning_rows.update(
-                df.index[df["phone_number"].isna() | (df["phone_number"].astype(str).str.strip() == "")].tolist()
+            report.flag(
+                "invalid:loan_status",
+                ~normalized_status.isin(allowed_status),
+                "Invalid loan_status (allowed: ACTIVE,CLOSED,NPA,WRITTEN_OFF)",
             )
 
-        null_counts = {column: int(df[column].isna().sum()) for column in df.columns}
-        duplicate_count = int(df["loan_id"].duplicated().sum()) if "loan_id" in df.columns else 0
+        if "phone_number" in df.columns:
+            report.warning_rows = np.flatnonzero(blank_mask(df["phone_number"])).tolist()
 
-        return ValidationReport(
-            is_valid=len(errors) == 0,
-            errors=errors,
-            warning_rows=sorted(warning_rows),
-            null_counts=null_counts,
-            duplicate_count=duplicate_count,
-        )
+        report.null_counts = null_counts(df)
+        report.duplicate_count = int(df["loan_id"].duplicated().sum()) if "loan_id" in df.columns else 0
+        return report
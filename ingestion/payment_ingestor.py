@@ -1,6 +1,9 @@
 import pandas as pd
 
-from .base_ingestor import BaseIngestor, ValidationReport
+from quality.report import ValidationReport
+from quality.validators import flag_required, null_counts
+
+from .base_ingestor import BaseIngestor
 
 class PaymentIngestor(BaseIngestor):
     def load_csv(self):
@@ -10,29 +13,13 @@ class PaymentIngestor(BaseIngestor):
         return df
 
     def validate(self, df):
-        errors = []
-        required_columns = ["payment_id", "loan_id", "amount", "payment_date", "status"]
-        for column in required_columns:
-            if column not in df.columns:
-                errors.append(f"Missing required column: {column}")
-            else:
-                missing_rows = df.index[df[column].isna() | (df[column].astype(str).str.strip() == "")].tolist()
-                if missing_rows:
-                    errors.append(f"Null/empty {column} at rows: {missing_rows[:25]}")
+        report = ValidationReport.for_rows(self.source_name, len(df.index))
+        flag_required(report, df, ["payment_id", "loan_id", "amount", "payment_date", "status"])
 
         if "amount" in df.columns:
             amount = pd.to_numeric(df["amount"], errors="coerce")
-            invalid_rows = df.index[amount.isna() | (amount <= 0)].tolist()
-            if invalid_rows:
-                errors.append(f"amount must be > 0 at rows: {invalid_rows[:25]}")
-
-        null_counts = {column: int(df[column].isna().sum()) for column in df.columns}
-        duplicate_count = int(df["payment_id"].duplicated().sum()) if "payment_id" in df.columns else 0
+            report.flag("invalid:amount", amount.isna() | (amount <= 0), "amount must be > 0")
 
-        return ValidationReport(
-            is_valid=len(errors) == 0,
-            errors=errors,
-            warning_rows=[],
-            null_counts=null_counts,
-            duplicate_count=duplicate_count,
-        )
+        report.null_counts = null_counts(df)
+        report.duplicate_count = int(df["payment_id"].duplicated().sum()) if "payment_id" in df.columns else 0
+        return report
@@ -0,0 +1,532 @@
+# Approximate, constant-memory data profiling for large ingestion files
+#
+# One streaming pass over chunked input (pandas read_csv(chunksize=...))
+# builds a fixed-size profile per column:
+#   - HyperLogLog distinct count
+#   - KLL quantile sketch (numeric columns)
+#   - count-min sketch + bounded candidate set for top values (text columns)
+# plus a reservoir sample of whole rows. Memory depends on the sketch
+# parameters, never on file size, and all sketch updates are vectorized
+# per chunk.
+#
+# Profiles are stored per (source, file) in the ingestion_profile table
+# next to ingestion_log, and `detect_drift` compares a new profile to the
+# previous one for the same source using only the two fixed-size profiles.
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+import base64
+import json
+import logging
+import math
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+LOGGER = logging.getLogger(__name__)
+
+def hash_values(values: pd.Series, seed: int = 0) -> np.ndarray:
+    """Stable 64-bit hashes of the (non-null) values of a column."""
+    keys = values.astype(str).to_numpy(dtype=object)
+    return pd.util.hash_array(keys, hash_key=f"{seed:016d}", categorize=False)
+
+
+# ===========================================================
+# RESERVOIR SAMPLE
+# ===========================================================
+
+class ReservoirSample:
+    """Uniform sample of `size` rows from a stream (Algorithm R, applied per chunk)."""
+
+    def __init__(self, size: int = 1000, seed: int = 0):
+        self.size = size
+        self.seen = 0
+        self._rng = np.random.default_rng(seed)
+        self._rows: List[Dict[str, Any]] = []
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        n = len(chunk.index)
+        if n == 0:
+            return
+
+        fill = max(0, min(self.size - len(self._rows), n))
+        if fill:
+            self._rows.extend(chunk.iloc[:fill].to_dict("records"))
+
+        if fill < n:
+            # Row t (0-based, global) replaces slot j ~ U[0, t] when j < size.
+            t = self.seen + np.arange(fill, n)
+            slots = (self._rng.random(n - fill) * (t + 1)).astype(np.int64)
+            hits = np.flatnonzero(slots < self.size)
+            if len(hits):
+                picked = chunk.iloc[hits + fill].to_dict("records")
+                for slot, row in zip(slots[hits], picked):
+                    self._rows[int(slot)] = row
+        self.seen += n
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self._rows)
+
+
+# ===========================================================
+# HYPERLOGLOG (distinct counts)
+# ===========================================================
+
+class HyperLogLog:
+    """HLL with 2**p one-byte registers (p=14: 16 KiB, ~0.8% standard error)."""
+
+    def __init__(self, p: int = 14, registers: Optional[np.ndarray] = None):
+        self.p = p
+        self.m = 1 << p
+        self.registers = registers if registers is not None else np.zeros(self.m, dtype=np.uint8)
+
+    def update_hashes(self, hashes: np.ndarray) -> None:
+        if not len(hashes):
+            return
+        hashes = hashes.astype(np.uint64, copy=False)
+        index = (hashes >> np.uint64(64 - self.p)).astype(np.int64)
+        rest_bits = 64 - self.p
+        rest = hashes & np.uint64((1 << rest_bits) - 1)
+        # rest < 2**53, so the float log2 is exact enough to find the top bit.
+        rank = np.full(len(hashes), rest_bits + 1, dtype=np.uint8)
+        nonzero = rest > 0
+        top_bit = np.floor(np.log2(rest[nonzero].astype(np.float64))).astype(np.int64)
+        rank[nonzero] = (rest_bits - top_bit).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def update(self, values: pd.Series) -> None:
+        self.update_hashes(hash_values(values.dropna()))
+
+    def estimate(self) -> int:
+        m = float(self.m)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / float(np.sum(np.power(2.0, -self.registers.astype(np.float64))))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            return int(round(m * math.log(m / zeros)))
+        return int(round(raw))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"p": self.p, "registers": base64.b64encode(self.registers.tobytes()).decode("ascii")}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "HyperLogLog":
+        registers = np.frombuffer(base64.b64decode(data["registers"]), dtype=np.uint8).copy()
+        return cls(p=int(data["p"]), registers=registers)
+
+
+# ===========================================================
+# KLL (quantiles)
+# ===========================================================
+
+class KLLSketch:
+    """KLL quantile sketch; keeps O(k) items with ~1.65/k rank error."""
+
+    def __init__(self, k: int = 200, seed: int = 0):
+        self.k = k
+        self.n = 0
+        self.levels: List[np.ndarray] = [np.empty(0, dtype=np.float64)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2.0 / 3.0) ** depth)))
+
+    def _compact(self, level: int) -> None:
+        items = np.sort(self.levels[level])
+        if len(items) % 2:
+            keep, items = items[-1:], items[:-1]
+        else:
+            keep = items[:0]
+        promoted = items[int(self._rng.integers(2))::2]
+        if level + 1 == len(self.levels):
+            self.levels.append(np.empty(0, dtype=np.float64))
+        self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+        self.levels[level] = keep
+
+    def update(self, values: np.ndarray) -> None:
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        if not len(values):
+            return
+        self.n += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        while True:
+            over = [h for h, items in enumerate(self.levels) if len(items) > self._capacity(h)]
+            if not over:
+                break
+            self._compact(over[0])
+
+    def _weighted(self):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(lvl), 2.0 ** h) for h, lvl in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        return items[order], weights[order]
+
+    def quantiles(self, qs: Sequence[float]) -> List[Optional[float]]:
+        items, weights = self._weighted()
+        if not len(items):
+            return [None for _ in qs]
+        cumulative = np.cumsum(weights)
+        positions = np.searchsorted(cumulative, np.asarray(qs) * cumulative[-1], side="left")
+        return [float(items[min(i, len(items) - 1)]) for i in positions]
+
+    def cdf(self, points: Sequence[float]) -> np.ndarray:
+        """Approximate fraction of values <= each point."""
+        items, weights = self._weighted()
+        if not len(items):
+            return np.zeros(len(points))
+        cumulative = np.concatenate([[0.0], np.cumsum(weights)])
+        return cumulative[np.searchsorted(items, np.asarray(points, dtype=np.float64), side="right")] / cumulative[-1]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"k": self.k, "n": self.n, "levels": [lvl.tolist() for lvl in self.levels]}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "KLLSketch":
+        sketch = cls(k=int(data["k"]))
+        sketch.n = int(data["n"])
+        sketch.levels = [np.asarray(lvl, dtype=np.float64) for lvl in data["levels"]] or [np.empty(0)]
+        return sketch
+
+
+# ===========================================================
+# COUNT-MIN (top values)
+# ===========================================================
+
+class CountMinTopK:
+    """Count-min sketch plus a bounded candidate set for the most frequent values."""
+
+    def __init__(self, width: int = 2048, depth: int = 4, top_k: int = 10):
+        self.width = width
+        self.depth = depth
+        self.top_k = top_k
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self.candidates: Dict[str, int] = {}
+
+    def _columns(self, values: pd.Series) -> List[np.ndarray]:
+        return [(hash_values(values, seed=row + 1) % np.uint64(self.width)).astype(np.int64) for row in range(self.depth)]
+
+    def estimate_many(self, values: pd.Series) -> np.ndarray:
+        if values.empty:
+            return np.zeros(0, dtype=np.int64)
+        columns = self._columns(values)
+        return np.min(np.vstack([self.table[row, cols] for row, cols in enumerate(columns)]), axis=0)
+
+    def update(self, values: pd.Series) -> None:
+        values = values.dropna().astype(str)
+        if values.empty:
+            return
+        counts = values.value_counts(sort=False)
+        distinct = pd.Series(counts.index, dtype=object)
+        for row, cols in enumerate(self._columns(distinct)):
+            self.table[row] += np.bincount(cols, weights=counts.to_numpy(), minlength=self.width).astype(np.int64)
+
+        # Re-rank old candidates together with this chunk's heaviest values;
+        # only 4 * top_k candidates are kept between chunks.
+        keep = 4 * self.top_k
+        pool = pd.Series(list(dict.fromkeys(list(self.candidates) + counts.nlargest(keep).index.tolist())), dtype=object)
+        estimates = self.estimate_many(pool)
+        order = np.argsort(-estimates, kind="stable")[:keep]
+        self.candidates = {str(pool.iloc[i]): int(estimates[i]) for i in order}
+
+    def top(self) -> List[List[Any]]:
+        ranked = sorted(self.candidates.items(), key=lambda item: -item[1])[: self.top_k]
+        return [[value, count] for value, count in ranked]
+
+
+# ===========================================================
+# PROFILES
+# ===========================================================
+
+QUANTILES = [0.01, 0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99]
+
+
+class ColumnProfiler:
+
+    def __init__(self, name: str, numeric: bool, hll_p: int = 14, kll_k: int = 400, top_k: int = 10):
+        self.name = name
+        self.numeric = numeric
+        self.count = 0
+        self.nulls = 0
+        self.hll = HyperLogLog(p=hll_p)
+        self.kll = KLLSketch(k=kll_k) if numeric else None
+        self.top_values = None if numeric else CountMinTopK(top_k=top_k)
+        self.unparsed = 0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self.total = 0.0
+
+    def update(self, series: pd.Series) -> None:
+        blank = series.isna()
+        if series.dtype == object or pd.api.types.is_string_dtype(series.dtype):
+            blank = blank | series.astype("string").str.strip().eq("").fillna(False)
+        values = series[~blank.to_numpy(dtype=bool)]
+        self.count += len(series.index)
+        self.nulls += len(series.index) - len(values.index)
+        self.hll.update(values)
+
+        if self.numeric:
+            numbers = pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+            parsed = numbers[np.isfinite(numbers)]
+            self.unparsed += len(numbers) - len(parsed)
+            if len(parsed):
+                self.kll.update(parsed)
+                low, high = float(parsed.min()), float(parsed.max())
+                self.min = low if self.min is None else min(self.min, low)
+                self.max = high if self.max is None else max(self.max, high)
+                self.total += float(parsed.sum())
+        else:
+            self.top_values.update(values)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {
+            "numeric": self.numeric,
+            "count": self.count,
+            "nulls": self.nulls,
+            "null_rate": self.nulls / self.count if self.count else 0.0,
+            "distinct_estimate": self.hll.estimate(),
+            "hll": self.hll.to_dict(),
+        }
+        if self.numeric:
+            parsed = self.kll.n
+            data.update({
+                "unparsed": self.unparsed,
+                "min": self.min,
+                "max": self.max,
+                "mean": self.total / parsed if parsed else None,
+                "quantiles": dict(zip([str(q) for q in QUANTILES], self.kll.quantiles(QUANTILES))),
+                "kll": self.kll.to_dict(),
+            })
+        else:
+            data["top_values"] = self.top_values.top()
+        return data
+
+
+@dataclass
+class DataProfile:
+    source: str
+    file_name: str
+    row_count: int
+    columns: Dict[str, Dict[str, Any]]
+    sample: pd.DataFrame = field(repr=False)
+    profiled_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+    def to_json(self, sample_rows: int = 100) -> str:
+        return json.dumps({
+            "source": self.source,
+            "file_name": self.file_name,
+            "row_count": self.row_count,
+            "profiled_at": self.profiled_at.isoformat(),
+            "columns": self.columns,
+            "sample": json.loads(self.sample.head(sample_rows).to_json(orient="records", date_format="iso")),
+        })
+
+    @classmethod
+    def from_json(cls, raw: Any) -> "DataProfile":
+        data = json.loads(raw) if isinstance(raw, (str, bytes)) else raw
+        return cls(
+            source=data["source"],
+            file_name=data["file_name"],
+            row_count=int(data["row_count"]),
+            columns=data["columns"],
+            sample=pd.DataFrame(data.get("sample") or []),
+            profiled_at=datetime.fromisoformat(data["profiled_at"]),
+        )
+
+
+def _looks_numeric(series: pd.Series, min_parse_rate: float = 0.95) -> bool:
+    if pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+        return True
+    values = series.dropna().astype(str).str.strip()
+    values = values[values.ne("")]
+    if values.empty:
+        return False
+    return float(pd.to_numeric(values, errors="coerce").notna().mean()) >= min_parse_rate
+
+
+def profile_chunks(
+    chunks: Iterable[pd.DataFrame],
+    source: str,
+    file_name: str,
+    numeric_columns: Optional[Sequence[str]] = None,
+    sample_size: int = 1000,
+    hll_p: int = 14,
+    kll_k: int = 400,
+    top_k: int = 10,
+) -> DataProfile:
+    """Profile a stream of DataFrame chunks in one pass.
+
+    Column kinds are fixed from `numeric_columns`, or inferred from the
+    first chunk when it is None.
+    """
+
+    profilers: Dict[str, ColumnProfiler] = {}
+    reservoir = ReservoirSample(size=sample_size)
+    rows = 0
+
+    for chunk in chunks:
+        for column in chunk.columns:
+            name = str(column)
+            if name not in profilers:
+                numeric = name in numeric_columns if numeric_columns is not None else _looks_numeric(chunk[column])
+                profilers[name] = ColumnProfiler(name, numeric, hll_p=hll_p, kll_k=kll_k, top_k=top_k)
+            profilers[name].update(chunk[column])
+        reservoir.update(chunk)
+        rows += len(chunk.index)
+
+    return DataProfile(
+        source=source,
+        file_name=file_name,
+        row_count=rows,
+        columns={name: p.to_dict() for name, p in profilers.items()},
+        sample=reservoir.to_frame(),
+    )
+
+
+def profile_csv(path, source: str, chunksize: int = 100_000, **kwargs: Any) -> DataProfile:
+    """Profile a CSV file without loading it whole; values are read as text."""
+
+    chunks = pd.read_csv(path, dtype=str, chunksize=chunksize, keep_default_na=True)
+    return profile_chunks(chunks, source=source, file_name=str(getattr(path, "name", path)).rsplit("/", 1)[-1], **kwargs)
+
+
+# ===========================================================
+# DRIFT
+# ===========================================================
+
+@dataclass(frozen=True)
+class DriftThresholds:
+    max_null_rate_delta: float = 0.05
+    max_psi: float = 0.2
+    max_distinct_ratio_change: float = 0.5
+    # Columns whose distinct count is at least this share of their non-null
+    # rows (IDs, timestamps) are expected to grow with the file.
+    key_like_distinct_share: float = 0.9
+    max_top_value_shift: float = 0.2
+
+
+def population_stability_index(previous: KLLSketch, current: KLLSketch, bins: int = 10) -> Optional[float]:
+    """PSI over the previous distribution's quantile bins, both sides read from sketches."""
+
+    if not previous.n or not current.n:
+        return None
+    edges = np.unique([q for q in previous.quantiles(np.linspace(0, 1, bins + 1)[1:-1]) if q is not None])
+    expected = np.diff(np.concatenate([[0.0], previous.cdf(edges), [1.0]]))
+    actual = np.diff(np.concatenate([[0.0], current.cdf(edges), [1.0]]))
+    expected = np.clip(expected, 1e-4, None)
+    actual = np.clip(actual, 1e-4, None)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def _top_value_shift(previous: Dict[str, Any], current: Dict[str, Any]) -> Optional[float]:
+    """Total variation distance between the top-value shares of two profiles."""
+
+    prev_count = previous["count"] - previous["nulls"]
+    cur_count = current["count"] - current["nulls"]
+    if prev_count <= 0 or cur_count <= 0:
+        return None
+    prev = {value: count / prev_count for value, count in previous.get("top_values") or []}
+    cur = {value: count / cur_count for value, count in current.get("top_values") or []}
+    if not prev or not cur:
+        return None
+    return 0.5 * sum(abs(prev.get(v, 0.0) - cur.get(v, 0.0)) for v in set(prev) | set(cur))
+
+
+def detect_drift(
+    current: DataProfile,
+    previous: Optional[DataProfile],
+    thresholds: Optional[DriftThresholds] = None,
+) -> List[str]:
+    """Drift warnings for `current` against `previous` (same source, earlier file)."""
+
+    if previous is None:
+        return []
+    thresholds = thresholds or DriftThresholds()
+    warnings = []
+
+    for name, cur in current.columns.items():
+        prev = previous.columns.get(name)
+        if prev is None:
+            warnings.append(f"{current.source}.{name}: new column")
+            continue
+
+        delta = cur["null_rate"] - prev["null_rate"]
+        if abs(delta) > thresholds.max_null_rate_delta:
+            warnings.append(f"{current.source}.{name}: null rate {prev['null_rate']:.2%} -> {cur['null_rate']:.2%}")
+
+        if prev["distinct_estimate"] and not (cur["numeric"] and prev["numeric"]):
+            ratio = cur["distinct_estimate"] / prev["distinct_estimate"]
+            prev_rows = prev["count"] - prev["nulls"]
+            cur_rows = cur["count"] - cur["nulls"]
+            key_like = (
+                prev_rows > 0 and cur_rows > 0
+                and prev["distinct_estimate"] >= thresholds.key_like_distinct_share * prev_rows
+                and cur["distinct_estimate"] >= thresholds.key_like_distinct_share * cur_rows
+            )
+            # Scale key-like columns by row counts so a bigger file alone is not
+            # drift; low-cardinality columns keep the same values at any size.
+            if key_like:
+                ratio *= prev_rows / cur_rows
+            if abs(ratio - 1) > thresholds.max_distinct_ratio_change:
+                warnings.append(
+                    f"{current.source}.{name}: distinct values {prev['distinct_estimate']} -> {cur['distinct_estimate']}"
+                )
+
+        if cur["numeric"] and prev["numeric"]:
+            psi = population_stability_index(KLLSketch.from_dict(prev["kll"]), KLLSketch.from_dict(cur["kll"]))
+            if psi is not None and psi > thresholds.max_psi:
+                warnings.append(
+                    f"{current.source}.{name}: distribution shift PSI {psi:.3f} "
+                    f"(median {prev['quantiles'].get('0.5')} -> {cur['quantiles'].get('0.5')})"
+                )
+        elif not cur["numeric"] and not prev["numeric"]:
+            shift = _top_value_shift(prev, cur)
+            if shift is not None and shift > thresholds.max_top_value_shift:
+                warnings.append(f"{current.source}.{name}: top value mix shifted by {shift:.0%}")
+
+    for name in previous.columns:
+        if name not in current.columns:
+            warnings.append(f"{current.source}.{name}: column missing")
+    return warnings
+
+
+# ===========================================================
+# STORAGE (next to ingestion_log)
+# ===========================================================
+
+PROFILE_TABLE_DDL = """
+CREATE TABLE IF NOT EXISTS ingestion_profile (
+    id BIGSERIAL PRIMARY KEY,
+    source TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    row_count BIGINT NOT NULL,
+    profiled_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    profile JSONB NOT NULL,
+    drift JSONB NOT NULL DEFAULT '[]'::jsonb
+);
+CREATE INDEX IF NOT EXISTS ingestion_profile_source_idx ON ingestion_profile (source, profiled_at DESC);
+"""
+
+
+def ensure_profile_table(cursor) -> None:
+    cursor.execute(PROFILE_TABLE_DDL)
+
+
+def load_previous_profile(cursor, source: str) -> Optional[DataProfile]:
+    cursor.execute(
+        "SELECT profile FROM ingestion_profile WHERE source = %s ORDER BY profiled_at DESC, id DESC LIMIT 1",
+        (source,),
+    )
+    row = cursor.fetchone()
+    return DataProfile.from_json(row[0]) if row else None
+
+
+def save_profile(cursor, profile: DataProfile, drift: Sequence[str]) -> None:
+    cursor.execute(
+        """
+        INSERT INTO ingestion_profile (source, file_name, row_count, profiled_at, profile, drift)
+        VALUES (%s, %s, %s, %s, %s::jsonb, %s::jsonb)
+        """,
+        (profile.source, profile.file_name, profile.row_count, profile.profiled_at, profile.to_json(), json.dumps(list(drift))),
+    )
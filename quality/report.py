@@ -1,15 +1,101 @@
-# Validation result model for reporting
-from dataclasses import dataclass
-from typing import List, Dict, Optional
-from datetime import datetime
+# Validation result model shared by the ingestors and quality checks
+#
+# Row-level problems are kept as a compact bitmask: one uint64 per row,
+# where bit i means the row failed rules[i]. Rules are registered in the
+# order checks run, so a report holds at most 64 distinct rule codes.
+# File-level problems (missing columns, failed lookups) reject the whole
+# file and live in `file_errors`.
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+
+MAX_RULES = 64
+
+
+@dataclass
+class Rule:
+    code: str      # stable identifier stored with quarantined rows, e.g. "null:loan_id"
+    message: str
+    row_count: int
+
 
 @dataclass
 class ValidationReport:
-    is_valid: bool
     source: str
     total_rows: int
-    errors: List[str]
-    warnings: List[str]
-    null_counts: Dict[str, int]
-    duplicate_count: int
-    checked_at: datetime
+    row_errors: np.ndarray = field(repr=False)
+    rules: List[Rule] = field(default_factory=list)
+    file_errors: List[str] = field(default_factory=list)
+    warnings: List[str] = field(default_factory=list)
+    warning_rows: List[int] = field(default_factory=list)
+    null_counts: Dict[str, int] = field(default_factory=dict)
+    duplicate_count: int = 0
+    checked_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+    @classmethod
+    def for_rows(cls, source: str, total_rows: int) -> "ValidationReport":
+        return cls(source=source, total_rows=total_rows, row_errors=np.zeros(total_rows, dtype=np.uint64))
+
+    def flag(self, code: str, mask, message: str) -> int:
+        """Mark rows where `mask` is true as failing rule `code`; returns how many did."""
+
+        if hasattr(mask, "fillna"):
+            mask = mask.fillna(False).to_numpy(dtype=bool)
+        mask = np.asarray(mask, dtype=bool)
+        count = int(mask.sum())
+        if not count:
+            return 0
+
+        for bit, rule in enumerate(self.rules):
+            if rule.code == code:
+                break
+        else:
+            if len(self.rules) == MAX_RULES:
+                raise ValueError(f"ValidationReport supports at most {MAX_RULES} rules")
+            bit = len(self.rules)
+            self.rules.append(Rule(code=code, message=message, row_count=0))
+
+        self.row_errors |= mask.astype(np.uint64) << np.uint64(bit)
+        self.rules[bit].row_count = int(((self.row_errors >> np.uint64(bit)) & np.uint64(1)).sum())
+        return count
+
+    def fail(self, message: str) -> None:
+        self.file_errors.append(message)
+
+    @property
+    def valid_mask(self) -> np.ndarray:
+        return self.row_errors == 0
+
+    @property
+    def invalid_count(self) -> int:
+        return int(self.total_rows - self.valid_mask.sum())
+
+    @property
+    def is_valid(self) -> bool:
+        return not self.file_errors and not self.invalid_count
+
+    @property
+    def has_file_errors(self) -> bool:
+        return bool(self.file_errors)
+
+    def codes(self, bits: int) -> List[str]:
+        """Rule codes encoded in one row's bitmask."""
+        return [rule.code for i, rule in enumerate(self.rules) if int(bits) >> i & 1]
+
+    def rows_for(self, code: str, limit: Optional[int] = None) -> List[int]:
+        """Row positions failing `code` (all of them unless `limit` is given)."""
+        for bit, rule in enumerate(self.rules):
+            if rule.code == code:
+                rows = np.flatnonzero((self.row_errors >> np.uint64(bit)) & np.uint64(1))
+                return rows[:limit].tolist() if limit is not None else rows.tolist()
+        return []
+
+    @property
+    def errors(self) -> List[str]:
+        """Human-readable summary: file errors plus one line per failed rule."""
+        return self.file_errors + [
+            f"{rule.message} in {rule.row_count} rows (first: {self.rows_for(rule.code, limit=5)})"
+            for rule in self.rules
+        ]
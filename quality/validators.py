@@ -1,32 +1,322 @@
 # Data quality checks for ingestion and Silver→Gold gate
+#
+# Ingestion checks work on whole pandas columns (no per-row Python loops).
+# The Silver→Gold gate never pulls silver data into Python: each table is
+# probed with one aggregate ClickHouse query (a single scan) whose results
+# are compared to thresholds.
+#
+# This module is also imported by the Airflow DAGs, so it must not import
+# the API's config.py; everything is passed in or has a default here.
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timezone
+import json
+import logging
+import os
+from pathlib import Path
+import tempfile
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
 import pandas as pd
-from dataclasses import dataclass
-from typing import List, Dict, Optional
-from datetime import datetime
+
+from .report import ValidationReport
+
+LOGGER = logging.getLogger(__name__)
+
+
+# ===========================================================
+# NULLS / DUPLICATES (vectorized)
+# ===========================================================
+
+def blank_mask(series: pd.Series) -> np.ndarray:
+    """True where a value is null or, for text columns, blank after strip."""
+    mask = series.isna().to_numpy(dtype=bool)
+    if series.dtype == object or pd.api.types.is_string_dtype(series.dtype):
+        blank = series.astype("string").str.strip().eq("")
+        mask = mask | blank.fillna(False).to_numpy(dtype=bool)
+    return mask
+
+
+def null_counts(df: pd.DataFrame) -> Dict[str, int]:
+    counts = df.isna().sum()
+    return {str(column): int(count) for column, count in counts.items()}
+
+
+def check_nulls(df: pd.DataFrame, required_cols: list, max_null_rate: float = 0.0) -> List[str]:
+    """Errors for required columns that are missing or have too many null/blank values."""
+    errors = []
+    total = len(df.index)
+    for column in required_cols:
+        if column not in df.columns:
+            errors.append(f"Missing required column: {column}")
+            continue
+        nulls = int(blank_mask(df[column]).sum())
+        if nulls and (total == 0 or nulls / total > max_null_rate):
+            errors.append(f"Null/empty {column} in {nulls} of {total} rows")
+    return errors
+
+
+def duplicate_mask(df: pd.DataFrame, pk_cols: list) -> np.ndarray:
+    """True for every row after the first with the same (non-null) key."""
+    if df.empty or not pk_cols:
+        return np.zeros(len(df.index), dtype=bool)
+    keys = df[list(pk_cols)]
+    has_key = ~keys.isna().any(axis=1).to_numpy(dtype=bool)
+    return keys.duplicated(keep="first").to_numpy(dtype=bool) & has_key
+
+
+def check_duplicates(df: pd.DataFrame, pk_cols: list) -> int:
+    missing = [c for c in pk_cols if c not in df.columns]
+    if missing:
+        return 0
+    return int(duplicate_mask(df, pk_cols).sum())
+
+
+# ===========================================================
+# ROW COUNT VARIANCE (rolling history per source)
+# ===========================================================
+
+DEFAULT_HISTORY_PATH = os.getenv("QUALITY_HISTORY_PATH", "logs/row_count_history.json")
+
+
+class RowCountHistory:
+    """Last `window` row counts per source, kept in a small JSON file."""
+
+    def __init__(self, path: str = DEFAULT_HISTORY_PATH, window: int = 14):
+        self.path = Path(path)
+        self.window = window
+
+    def _load(self) -> Dict[str, List[List[Any]]]:
+        if not self.path.exists():
+            return {}
+        try:
+            with self.path.open(encoding="utf-8") as f:
+                return json.load(f)
+        except ValueError:
+            LOGGER.warning("Row count history at %s is unreadable; starting over", self.path)
+            return {}
+
+    def recent(self, source: str) -> List[int]:
+        return [int(count) for _, count in self._load().get(source, [])]
+
+    def record(self, source: str, count: int, at: Optional[datetime] = None) -> None:
+        data = self._load()
+        at = at or datetime.now(timezone.utc)
+        entries = data.get(source, []) + [[at.isoformat(), int(count)]]
+        data[source] = entries[-self.window:]
+
+        # Write-then-rename so a crash never leaves a truncated file.
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=str(self.path.parent), prefix=self.path.name)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
+
+
+def check_row_count_variance(
+    source: str,
+    current_count: int,
+    history: Optional[RowCountHistory] = None,
+    max_deviation: float = 0.5,
+    min_history: int = 3,
+    record: bool = True,
+) -> Optional[str]:
+    """Warn when `current_count` is more than `max_deviation` away from the rolling median."""
+
+    history = history or RowCountHistory()
+    counts = history.recent(source)
+    if record:
+        history.record(source, current_count)
+
+    if len(counts) < min_history:
+        return None
+
+    baseline = float(np.median(counts))
+    if baseline <= 0:
+        return None
+
+    deviation = abs(current_count - baseline) / baseline
+    if deviation > max_deviation:
+        return (
+            f"Row count for {source} is {current_count}, {deviation:.0%} away from the "
+            f"median of the last {len(counts)} loads ({baseline:.0f})"
+        )
+    return None
+
+
+# ===========================================================
+# SILVER -> GOLD GATE (pushed down into ClickHouse)
+# ===========================================================
+
+@dataclass(frozen=True)
+class SilverGateSpec:
+    table: str
+    key: List[str]
+    not_null: List[str]
+    # name -> ClickHouse predicate that is true for a violating row
+    violations: Dict[str, str] = field(default_factory=dict)
+    freshness_column: Optional[str] = "_etl_loaded_at"
+    min_rows: int = 1
+    max_null_rate: float = 0.01
+    max_duplicate_rate: float = 0.0
+    max_violation_rate: float = 0.01
+    max_staleness_minutes: int = 24 * 60
+
+
+SILVER_GATES: Dict[str, SilverGateSpec] = {
+    "loans": SilverGateSpec(
+        table="loans_clean",
+        key=["loan_id"],
+        not_null=["loan_id", "borrower_id", "principal_amount", "loan_status"],
+        violations={
+            "principal_amount_not_positive": "principal_amount <= 0",
+            "dpd_days_negative": "dpd_days < 0",
+            "overdue_exceeds_principal": "overdue_amount > principal_amount",
+        },
+    ),
+    "calls": SilverGateSpec(
+        table="calls_analyzed",
+        key=["call_id"],
+        not_null=["call_id", "loan_id", "agent_id", "call_start_time"],
+        violations={
+            "call_duration_out_of_range": "call_duration_sec < 0 OR call_duration_sec > 14400",
+            "call_start_in_future": "call_start_time > now() + INTERVAL 1 HOUR",
+        },
+    ),
+    "payments": SilverGateSpec(
+        table="payments_clean",
+        key=["payment_id"],
+        not_null=["payment_id", "loan_id", "amount", "payment_date"],
+        violations={
+            "amount_negative": "amount < 0",
+            "payment_date_in_future": "payment_date > today() + 1",
+            "orphan_payment": "emi_amount IS NULL",
+        },
+    ),
+}
+
 
 @dataclass
-class ValidationReport:
-    is_valid: bool
+class GateResult:
     source: str
-    total_rows: int
-    errors: List[str]
-    warnings: List[str]
-    null_counts: Dict[str, int]
-    duplicate_count: int
+    table: str
+    passed: bool
+    metrics: Dict[str, Any]
+    failures: List[str]
     checked_at: datetime
 
-def check_nulls(df: pd.DataFrame, required_cols: list) -> List[str]:
-    # Implement null checks
-    return []
 
-def check_duplicates(df: pd.DataFrame, pk_cols: list) -> int:
-    # Implement duplicate checks
-    return 0
+def build_gate_query(spec: SilverGateSpec) -> str:
+    """One aggregate SELECT computing every gate metric in a single scan."""
 
-def check_row_count_variance(source: str, current_count: int) -> Optional[str]:
-    # Implement row count variance check
-    return None
+    key = spec.key[0] if len(spec.key) == 1 else f"tuple({', '.join(spec.key)})"
+    exprs = [
+        "count() AS total_rows",
+        # count(x) skips NULL keys, like uniqExact does
+        f"count({key}) AS keyed_rows",
+        f"uniqExact({key}) AS distinct_keys",
+    ]
+    # Silver tables are built with non-Nullable columns and bronze stores
+    # missing values as '', so blanks count as nulls (as in blank_mask).
+    exprs += [f"countIf(isNull({c}) OR empty(trimBoth(toString({c})))) AS null__{c}" for c in spec.not_null]
+    exprs += [f"countIf({predicate}) AS violation__{name}" for name, predicate in spec.violations.items()]
+    if spec.freshness_column:
+        exprs.append(
+            f"dateDiff('minute', max(parseDateTimeBestEffortOrNull(toString({spec.freshness_column}))), now())"
+            " AS staleness_minutes"
+        )
+    return "SELECT\n    " + ",\n    ".join(exprs) + f"\nFROM {spec.table}"
+
+
+def evaluate_gate(source: str, spec: SilverGateSpec, metrics: Dict[str, Any]) -> GateResult:
+
+    failures = []
+    total = int(metrics.get("total_rows") or 0)
+
+    if total < spec.min_rows:
+        failures.append(f"{spec.table} has {total} rows (min {spec.min_rows})")
+
+    if total:
+        duplicates = int(metrics.get("keyed_rows") or 0) - int(metrics.get("distinct_keys") or 0)
+        if duplicates / total > spec.max_duplicate_rate:
+            failures.append(f"{spec.table}: {duplicates} duplicate {'/'.join(spec.key)} values")
+
+        for name, value in metrics.items():
+            count = int(value or 0)
+            if name.startswith("null__") and count / total > spec.max_null_rate:
+                failures.append(f"{spec.table}.{name[6:]} null rate {count / total:.2%} > {spec.max_null_rate:.2%}")
+            elif name.startswith("violation__") and count / total > spec.max_violation_rate:
+                failures.append(f"{spec.table}: {name[11:]} on {count / total:.2%} of rows > {spec.max_violation_rate:.2%}")
+
+    if spec.freshness_column:
+        staleness = metrics.get("staleness_minutes")
+        if staleness is None or staleness > spec.max_staleness_minutes:
+            failures.append(f"{spec.table} last loaded {staleness} minutes ago (max {spec.max_staleness_minutes})")
+
+    return GateResult(
+        source=source,
+        table=spec.table,
+        passed=not failures,
+        metrics=metrics,
+        failures=failures,
+        checked_at=datetime.now(timezone.utc),
+    )
+
+
+def run_silver_gate(source: str, client, thresholds: Optional[Dict[str, Any]] = None) -> GateResult:
+    """Probe one silver table; `thresholds` overrides SilverGateSpec fields (e.g. max_null_rate)."""
+
+    spec = SILVER_GATES[source]
+    if thresholds:
+        spec = replace(spec, **thresholds)
+
+    rows, columns = client.execute(build_gate_query(spec), with_column_types=True)
+    metrics = dict(zip([name for name, _ in columns], rows[0])) if rows else {}
+    return evaluate_gate(source, spec, metrics)
+
+
+def check_silver_to_gold_gate(source: str, client, thresholds: Optional[Dict[str, Any]] = None) -> bool:
+    result = run_silver_gate(source, client, thresholds)
+    if result.passed:
+        LOGGER.info("Silver gate passed for %s: %s", result.table, result.metrics)
+    else:
+        LOGGER.error("Silver gate failed for %s: %s", result.table, "; ".join(result.failures))
+    return result.passed
+
+
+# ===========================================================
+# INGESTION REPORT
+# ===========================================================
+
+def flag_required(report: ValidationReport, df: pd.DataFrame, required_cols: Sequence[str]) -> None:
+    """Missing required columns fail the file; null/blank values flag the row."""
+    for column in required_cols:
+        if column not in df.columns:
+            report.fail(f"Missing required column: {column}")
+        else:
+            report.flag(f"null:{column}", blank_mask(df[column]), f"Null/empty {column}")
+
+
+def build_validation_report(
+    df: pd.DataFrame,
+    source: str,
+    required_cols: Sequence[str],
+    pk_cols: Sequence[str],
+    history: Optional[RowCountHistory] = None,
+) -> ValidationReport:
+
+    report = ValidationReport.for_rows(source, len(df.index))
+    flag_required(report, df, required_cols)
+
+    if all(c in df.columns for c in pk_cols):
+        duplicates = duplicate_mask(df, list(pk_cols))
+        key = "/".join(pk_cols)
+        report.flag(f"duplicate:{key}", duplicates, f"Duplicate {key}")
+        report.duplicate_count = int(duplicates.sum())
+
+    variance = check_row_count_variance(source, len(df.index), history=history)
+    if variance:
+        report.warnings.append(variance)
 
-def check_silver_to_gold_gate(source: str) -> bool:
-    # Implement Silver→Gold gate check
-    return True
+    report.null_counts = null_counts(df)
+    return report
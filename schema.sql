@@ -128,18 +128,31 @@ EXECUTE FUNCTION update_updated_at();
 -- ============================================================================
 CREATE INDEX idx_loans_borrower_id ON loans_clean(borrower_id);
 CREATE INDEX idx_loans_status ON loans_clean(loan_status);
-CREATE INDEX idx_loans_updated_at ON loans_clean(updated_at);
+-- (updated_at, pk) matches the keyset cursor in airflow/dags/watermarks.py
+CREATE INDEX idx_loans_updated_at ON loans_clean(updated_at, loan_id);
 
 CREATE INDEX idx_calls_loan_id ON calls_analyzed(loan_id);
 CREATE INDEX idx_calls_start_time ON calls_analyzed(call_start_time);
-CREATE INDEX idx_calls_updated_at ON calls_analyzed(updated_at);
+CREATE INDEX idx_calls_updated_at ON calls_analyzed(updated_at, call_id);
 
 CREATE INDEX idx_payments_loan_id ON payments_clean(loan_id);
 CREATE INDEX idx_payments_date ON payments_clean(payment_date);
-CREATE INDEX idx_payments_updated_at ON payments_clean(updated_at);
+CREATE INDEX idx_payments_updated_at ON payments_clean(updated_at, payment_id);
 
 CREATE INDEX idx_messages_loan_id ON messages_processed(loan_id);
-CREATE INDEX idx_messages_updated_at ON messages_processed(updated_at);
+CREATE INDEX idx_messages_updated_at ON messages_processed(updated_at, message_id);
 
 CREATE INDEX idx_crm_loan_id ON crm_interactions(loan_id);
-CREATE INDEX idx_crm_updated_at ON crm_interactions(updated_at);
+CREATE INDEX idx_crm_updated_at ON crm_interactions(updated_at, crm_id);
+
+-- ============================================================================
+-- ETL Watermarks (keyset cursor per source, see airflow/dags/watermarks.py)
+-- ============================================================================
+CREATE TABLE IF NOT EXISTS etl_watermark (
+  source TEXT PRIMARY KEY,
+  updated_at TEXT NOT NULL,
+  pk TEXT,
+  rows_loaded BIGINT NOT NULL DEFAULT 0,
+  batches BIGINT NOT NULL DEFAULT 0,
+  advanced_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);